@@ -8,9 +8,12 @@ from langchain.agents import ZeroShotAgent, AgentExecutor
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain.tools import BaseTool
-import os, yaml
+import os, yaml, asyncio
 
-from utils.vecs import KapwingVectorStore
+from utils.registry import get_config, get_prompts, get_llm, get_vectorstore
+from utils.async_runner import run_blocking, browser_worker, Prefetcher
+from utils.script_engine import get_script_engine
+from utils.layers import get_layers
 from utils.tools import start_driver, close_driver, open_project
 from utils.tools import *
 
@@ -21,10 +24,7 @@ class KapwingAgent:
 
         self.SEPERATE_TOKEN = '£'
         
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
         self.user_data_dir = config['USER_DATA_DIR']
@@ -32,8 +32,7 @@ class KapwingAgent:
         start_driver(self.main_url, user_data_dir=self.user_data_dir)
         open_project(self.project_name)
 
-        with open("config/prompts.yaml", 'r') as stream:
-            prompts = yaml.safe_load(stream)
+        prompts = get_prompts()
 
         self.checker_prompt = prompts['checker_prompt_fewshot']
         self.checker_description = prompts['checker_description']
@@ -45,8 +44,8 @@ class KapwingAgent:
         self.timestamp_query_prompt = prompts['timestamp_query_prompt']
         
 
-        self.llm_ = OpenAIChat(model_name=model_name, temperature=temperature)
-        self.vectorstore = KapwingVectorStore('data/tools_document.txt')
+        self.llm_ = get_llm(model_name, temperature, llm_type="openai_chat")
+        self.vectorstore = get_vectorstore('data/tools_document.txt', model_name=model_name, temperature=temperature)
         self.check_tool_db, self.rec_tool_vec = self.vectorstore.get_faiss()
         
         def checker_(objective):
@@ -55,16 +54,25 @@ class KapwingAgent:
             inputs = [{"context": func.page_content, "objective": objective} for func in relevant_funcs]
             return checker_chain.apply(inputs)
 
+        self.engine = get_script_engine()
+        self.result = None
+
         def executor_(scripts):
-            try:
-                exec(scripts)
+            self.result = self.engine.run(scripts)
+            if self.result.ok:
                 return "Execute successfully!"
-            except Exception as e: 
-                return self.executor_prompt.format(error=e)
-
-        self.checker = Tool(name="checker", func=checker_, description=self.checker_description)
-        self.recommender = Tool(name="recommender", func=self.rec_tool_vec.run, description=self.recommender_description)
-        self.executor = Tool(name="executor", func=executor_, description=self.executor_description)   
+            return self.executor_prompt.format(error=self.result.error)
+
+        async def aexecutor_(scripts):
+            # The scripts drive the browser, so they run in order on the browser worker.
+            return await browser_worker().submit(executor_, scripts)
+
+        self.prefetcher = Prefetcher()
+        self.checker = Tool(name="checker", func=checker_, description=self.checker_description,
+                            coroutine=lambda objective: self.prefetcher.run(checker_, objective))
+        self.recommender = Tool(name="recommender", func=self.rec_tool_vec.run, description=self.recommender_description,
+                                coroutine=lambda objective: self.prefetcher.run(self.rec_tool_vec.run, objective))
+        self.executor = Tool(name="executor", func=executor_, description=self.executor_description, coroutine=aexecutor_)
     
         self.tools = [self.checker, self.recommender, self.executor]
         self.main_prompt = ZeroShotAgent.create_prompt(self.tools, prefix=self.main_agent_prefix_prompt, 
@@ -88,6 +96,35 @@ class KapwingAgent:
         else:    
             self.agent_chain.run(input=query)
 
+    async def arun(self, query):
+        """Async version of run, the same ReAct loop on the agent executor's async API.
+        The checker and the recommender do not depend on each other, so both run on the query at once with the page
+        state prefetch, and the agent's calls of them with the query get these results. When the checker answer of the
+        best matching function asks the user for more, it is returned without starting the agent."""
+
+        if self.SEPERATE_TOKEN in query:
+            content, timestamp = query[:query.index(self.SEPERATE_TOKEN)], query[query.index(self.SEPERATE_TOKEN)+1:]
+            query = self.timestamp_query_prompt.format(content=content, timestamp=timestamp)
+
+        browser = browser_worker()
+        if query == 'quit':
+            res_url = await browser.submit(close_driver)
+            print(f"Exiting. Visit url {res_url}.")
+            return
+
+        browser.prefetch(get_layers)
+        self.prefetcher.start(self.recommender.func, query)
+        try:
+            checks = await self.prefetcher.result(self.checker.func, query)
+            # The checker answers for the most similar function first.
+            answer = str(checks[0].get("text", checks[0])).strip() if checks else ""
+            if answer and not answer.lower().startswith("the objective"):
+                self.memory.save_context({"input": query}, {"output": answer})
+                return answer
+            return await self.agent_chain.arun(input=query)
+        finally:
+            self.prefetcher.clear()
+
 def main():
     agent = KapwingAgent(model_name="gpt-3.5-turbo")
     while True:
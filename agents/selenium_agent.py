@@ -11,9 +11,14 @@ from langchain.memory import ConversationBufferMemory
 from langchain.schema import AgentAction, AgentFinish, HumanMessage
 from typing import List, Union
 import pandas as pd
-import os, yaml, re
-
-from utils.vecs import KapwingVectorStore
+import os, yaml, re, asyncio
+
+from utils.registry import get_config, get_prompts, get_llm, get_vectorstore
+from utils.async_runner import run_blocking, browser_worker, Prefetcher
+from utils.script_engine import get_script_engine, normalize
+from utils.dispatch import get_dispatcher
+from utils.stream_parser import ActionParser, CandidateListParser, LineParser
+from utils.layers import get_layers
 from utils.tools import start_driver, close_driver, open_project
 from utils.tools import *
 
@@ -42,59 +47,88 @@ class CustomOutputParser(AgentOutputParser):
     """parsing the LLM output into AgentAction and AgentFinish."""
 
     def parse(self, llm_output: str) -> Union[AgentAction, AgentFinish]:
-        if "Final Answer:" in llm_output:
-            return AgentFinish(
-                return_values={"output": llm_output.split("Final Answer:")[-1].strip()},
-                log=llm_output,
-            )
-
-        regex = r"Action\s*\d*\s*:(.*?)\nAction\s*\d*\s*Input\s*\d*\s*:[\s]*(.*)"
-        match = re.search(regex, llm_output, re.DOTALL)
-
-        if not match:
-            raise ValueError(f"Could not parse LLM output: `{llm_output}`")
-
-        action = match.group(1).strip()
-        action_input = match.group(2)
-
-        return AgentAction(tool=action, tool_input=action_input.strip(" ").strip('"'), log=llm_output)
+        return ActionParser().parse(llm_output)
 
 class FastAgent:
-    """Agent that under 5 seconds. Only fast agent supports testing now."""
+    """Agent that under 5 seconds. Only fast agent supports testing now.
+    With retrieval_only, functions are ranked by the vectorstore directly and LLM is used only when the top score is below score_threshold.
+    input_fn answers the option and placeholder prompts, input() by default, or a scripted oracle in benchmarks."""
 
     def __init__(self, model_name="gpt-4", 
                        temperature=0,
                        vectorstore_type="gpt-index",
-                       use_chromedriver=True):
+                       use_chromedriver=True,
+                       retrieval_only=True,
+                       score_threshold=None,
+                       input_fn=input):
 
         self.SEPERATE_TOKEN = '£'
-        self.vectorstore = KapwingVectorStore(model_name=model_name,
-                                                temperature=temperature,
-                                                filepath='data/functions.txt'
-                                            )
+        self.input_fn = input_fn
+        self.vectorstore = get_vectorstore('data/functions.txt', model_name=model_name, temperature=temperature)
         self.vectorstore_type = vectorstore_type
         self.use_chromedriver = use_chromedriver
 
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
+        self.retrieval_only = retrieval_only
+        self.score_threshold = config.get('FAST_SCORE_THRESHOLD', 0.75) if score_threshold is None else score_threshold
 
         if self.use_chromedriver:
             start_driver(self.main_url)
             # open_project(self.project_name)
 
+        # With retrieval_only the LLM index is only needed for the fallback, so it is built on the first one.
+        self.vec_query = None
+        if self.retrieval_only:
+            self.vectorstore.set_func_index()
+        else:
+            self.vec_query = self.get_vec_query()
+
+        self.candidates = []
+        self.dispatcher = get_dispatcher()
+
+    def get_vec_query(self):
+        """Builds the LLM index of the vectorstore and returns its query function."""
+
         if self.vectorstore_type == "faiss":
             self.vectorstore.get_faiss()
-            self.vec_query = self.vectorstore.faiss_query
+            return lambda query: self.vectorstore.faiss_query(query, parser=LineParser(limit=3, skip=["Answer"]))
         if self.vectorstore_type == 'gpt-index':
             self.vectorstore.set_gpt_index()
-            self.vec_query = self.vectorstore.gpt_index_funcs
+            return self.vectorstore.gpt_index_funcs
+
+    def recommend(self, query):
+        """Returns top 3 function calls with <NULL> placeholders for arguments."""
 
-        self.exec = False
+        if self.retrieval_only:
+            self.candidates = self.vectorstore.rank_funcs(query, k=3)
+            if self.candidates and self.candidates[0]["score"] >= self.score_threshold:
+                return [candidate["call"] for candidate in self.candidates]
+
+        self.candidates = []
+        if self.vec_query is None:
+            self.vec_query = self.get_vec_query()
+        res = str(self.vec_query(query))
+        return LineParser(limit=3, skip=["Answer"]).parse(res)
             
+    def select(self, func_list):
+        """Asks the user to pick one of func_list and fill its placeholders.
+        Returns (index, (function, kwargs)), index is -1 if no option fits."""
+
+        index = int(self.input_fn("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. IF NO SUITABLE OPTION, INPUT 0. \nYOUR CHOICE: ")) - 1
+        if index == -1:
+            return index, None
+
+        name, kwargs = self.dispatcher.parse(func_list[index])
+        for i, (param, annotation) in enumerate(self.dispatcher.missing(name, kwargs)):
+            kwargs[param] = self.input_fn(f"PLACEHOLDER{i+1} ({param}) SHOULD BE: ")
+        return index, (name, kwargs)
+
+    def execute(self, func):
+        """Calls the selected function through the dispatcher, or prints it without chromedriver."""
+        return self.dispatcher.call(*func, dry_run=not self.use_chromedriver)
+
     def run(self, query, url):
         if self.use_chromedriver:
             start_driver(url)
@@ -107,41 +141,56 @@ class FastAgent:
 
         else:  
             start_time = time.time()
-            res = self.vec_query(query)
+            func_list = self.recommend(query)
             end_time = time.time()
             latency = end_time - start_time
-
-            res = str(res)
-            func_list = [line for line in res.split("\n") if not line.startswith("Answer")]
-            func_list = list(filter(bool, func_list))[:3]
         
             print("RECOMMEND FUNCTIONS ARE: \n", func_list)
-            index = int(input("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. IF NO SUITABLE OPTION, INPUT 0. \nYOUR CHOICE: ")) - 1
+            index, func = self.select(func_list)
 
             if index != -1:
-                func = func_list[index]
-                i = 1
-                while "<NULL>" in func:
-                    content = input(f"PLACEHOLDER{i} SHOULD BE: ")
-                    func = func.replace("<NULL>", content)
-                    i += 1
-                
-                while '""' in func:
-                    content = input(f"EMPTY PLACEHOLDER SHOULD BE: ")
-                    func = func.replace('""', content)
-
                 try: 
-                    if self.use_chromedriver: 
-                        exec(func)
-                    else: print(func)
-                    self.exec = True
+                    self.execute(func)
                 except Exception as e:
                     print("ERROR: ", e)
                     return latency, False, True, index+1, func_list
+                return latency, True, True, index+1, func_list 
+            else:
+                return latency, False, False, 0, func_list
+
+    async def arun(self, query, url):
+        """Async version of run. Recommendation runs on the shared thread pool and the selected function on the browser worker,
+        so several conversations can be served by one process."""
+
+        browser = browser_worker() if self.use_chromedriver else None
+        if self.use_chromedriver:
+            await browser.submit(start_driver, url)
+
+        if query == 'quit':
+            if self.use_chromedriver:
+                res_url = await browser.submit(close_driver)
+                print(f"Exiting. Visit url {res_url}.")
+            else: print("Exiting.")
+
+        else:
+            start_time = time.time()
+            func_list = await run_blocking(self.recommend, query)
+            end_time = time.time()
+            latency = end_time - start_time
+
+            print("RECOMMEND FUNCTIONS ARE: \n", func_list)
+            index, func = await run_blocking(self.select, func_list)
 
-                is_exec = self.exec
-                self.exec = False
-                return latency, is_exec, True, index+1, func_list 
+            if index != -1:
+                try:
+                    if self.use_chromedriver:
+                        await browser.submit(self.execute, func)
+                        browser.prefetch(get_layers)
+                    else: self.execute(func)
+                except Exception as e:
+                    print("ERROR: ", e)
+                    return latency, False, True, index+1, func_list
+                return latency, True, True, index+1, func_list
             else:
                 return latency, False, False, 0, func_list
 
@@ -151,19 +200,16 @@ class FastAgent_Table:
     def __init__(self, model_name="gpt-4", 
                        temperature=0,
                        vectorstore_type="gpt-index",
-                       use_chromedriver=True):
+                       use_chromedriver=True,
+                       input_fn=input):
 
         self.SEPERATE_TOKEN = '£'
-        self.vectorstore = KapwingVectorStore(model_name=model_name,
-                                                temperature=temperature,
-                                                filepath='data/queries.txt')
+        self.input_fn = input_fn
+        self.vectorstore = get_vectorstore('data/queries.txt', model_name=model_name, temperature=temperature)
         self.vectorstore_type = vectorstore_type
         self.use_chromedriver = use_chromedriver
 
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
 
@@ -173,7 +219,7 @@ class FastAgent_Table:
 
         if self.vectorstore_type == "faiss":
             self.vectorstore.get_faiss()
-            self.vec_query = self.vectorstore.faiss_query
+            self.vec_query = lambda query: self.vectorstore.faiss_query(query, parser=CandidateListParser(limit=3))
         if self.vectorstore_type == 'gpt-index':
             self.vectorstore.set_gpt_index()
             self.vec_query = self.vectorstore.gpt_index_query
@@ -182,7 +228,8 @@ class FastAgent_Table:
         self.user_query = self.df['USER_QUERY']
         self.scripts = self.df['SCRIPTS']
 
-        self.exec = False
+        self.engine = get_script_engine()
+        self.result = None
             
     def run(self, query):
         start_time = time.time()
@@ -190,14 +237,13 @@ class FastAgent_Table:
         end_time = time.time()
         latency = end_time - start_time
 
-        res = str(res)
-        res = eval(res[res.find("["):])
+        res = CandidateListParser(limit=3).parse(str(res))
         res_user_query = [res_dict["USER_QUERY"] for res_dict in res]
         res_masks = [res_dict["MASK"] for res_dict in res]
 
         print("RECOMMEND QUERIES ARE: \n", res_user_query)
         print("MASKS ARE: \n", res_masks)
-        index = int(input("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. \nYOUR CHOICE: ")) - 1
+        index = int(self.input_fn("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. \nYOUR CHOICE: ")) - 1
 
         objective_user_query = res_user_query[index]
         objective_masks = res_masks[index]
@@ -209,7 +255,7 @@ class FastAgent_Table:
                 masks = re.findall('<(.*?)>', objective_user_query)
                 for mask in masks:
                     mask = "<"+mask+">"
-                    mask_content = input(f"THE {mask} SHOULD BE:")
+                    mask_content = self.input_fn(f"THE {mask} SHOULD BE:")
                     objective_masks[objective_masks.index("NONE")] = mask_content
             
             script_ = self.df['SCRIPTS'][index_]
@@ -219,20 +265,18 @@ class FastAgent_Table:
                 mask = "<"+mask+">"
                 script_ = script_.replace(mask, obj_mask)
 
-            try: 
-                if self.use_chromedriver: 
-                    exec(script_)
-                else: print(script_)
-                self.exec = True
-            except Exception as e:
+            self.result = self.engine.run(script_, dry_run=not self.use_chromedriver)
+            if not self.result.ok:
                 return "Execution Failed. Stop Now."
                 
         else:
             return latency, False
 
-        is_exec = self.exec
-        self.exec = False
-        return latency, is_exec
+        return latency, self.result.ok
+
+    async def arun(self, query):
+        """Async version of run on the shared thread pool. Query lookup and script filling are one stage, so nothing overlaps within a request."""
+        return await run_blocking(self.run, query)
 
 class RecommendAgent:
     """Agent recommending three queries."""
@@ -240,30 +284,27 @@ class RecommendAgent:
     def __init__(self, model_name="gpt-4", 
                        temperature=0,
                        vectorstore_type="gpt-index",
-                       use_chromedriver=True):
+                       use_chromedriver=True,
+                       input_fn=input):
 
-        self.vectorstore = KapwingVectorStore(model_name=model_name,
-                                                temperature=temperature,
-                                                filepath='data/queries.txt')
+        self.input_fn = input_fn
+        self.vectorstore = get_vectorstore('data/queries.txt', model_name=model_name, temperature=temperature)
         self.vectorstore_type = vectorstore_type
         self.use_chromedriver = use_chromedriver
 
         if self.vectorstore_type == "faiss":
             self.vectorstore.get_faiss()
-            self.vec_query = self.vectorstore.faiss_query
+            self.vec_query = lambda query: self.vectorstore.faiss_query(query, parser=CandidateListParser(limit=3))
         if self.vectorstore_type == 'gpt-index':
             self.vectorstore.set_gpt_index()
             self.vec_query = self.vectorstore.gpt_index_query
             
-    def run(self, query):
-        start_time = time.time()
-        res = self.vec_query(query)
-        end_time = time.time()
-        latency = end_time - start_time
+    def select(self, res):
+        """Asks the user to pick one of the recommended queries and fill its masks."""
 
-        res_list = eval(str(res))
-        res_list = [s.strip() for s in res_list]
-        index = int(input("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. \nYOUR CHOICE: ")) - 1
+        res_list = CandidateListParser(limit=3).parse(str(res))
+        res_list = [str(s).strip() for s in res_list]
+        index = int(self.input_fn("PLEASE SELECT YOUR FAVORITE OPTION. YOU SHOULD INPUT 1 / 2 / 3. \nYOUR CHOICE: ")) - 1
 
         objective = res_list[index]
 
@@ -271,9 +312,26 @@ class RecommendAgent:
             masks = re.findall('<(.*?)>', objective)
             for mask in masks:
                 mask = "<"+mask+">"
-                mask_content = input(f"THE {mask} SHOULD BE:")
+                mask_content = self.input_fn(f"THE {mask} SHOULD BE:")
                 objective = objective.replace(mask, mask_content)
-        
+        return objective
+
+    def run(self, query):
+        start_time = time.time()
+        res = self.vec_query(query)
+        end_time = time.time()
+        latency = end_time - start_time
+
+        objective = self.select(res)
+        return objective, latency
+
+    async def arun(self, query):
+        start_time = time.time()
+        res = await run_blocking(self.vec_query, query)
+        end_time = time.time()
+        latency = end_time - start_time
+
+        objective = await run_blocking(self.select, res)
         return objective, latency
 
 class ExecuteAgent:
@@ -285,9 +343,8 @@ class ExecuteAgent:
                        use_chromedriver=True):
 
         self.SEPERATE_TOKEN = '£'
-        self.vectorstore = KapwingVectorStore(model_name=model_name,
-                                                temperature=temperature,
-                                                filepath='data/instructions_scripts.txt')
+        self.timestamp_query_prompt = get_prompts()['timestamp_query_prompt']
+        self.vectorstore = get_vectorstore('data/instructions_scripts.txt', model_name=model_name, temperature=temperature)
         self.vectorstore_type = vectorstore_type
         self.use_chromedriver = use_chromedriver
 
@@ -299,7 +356,8 @@ class ExecuteAgent:
             self.vec_query = self.vectorstore.gpt_index_scripts_query
         
         self.count = 0
-        self.exec = False
+        self.engine = get_script_engine()
+        self.result = None
 
     def run(self, query):
         if self.SEPERATE_TOKEN in query:
@@ -314,25 +372,49 @@ class ExecuteAgent:
         else:    
             query = self.vec_query(query)
             query = str(query)
-            self.scripts = [line for line in query.split("\n") if not line.startswith("```")]
+            self.scripts = normalize(query).split("\n")
             print('\n')
-            for script in self.scripts:
-                try: 
-                    if self.use_chromedriver: 
-                        exec(script)
-                    else: print(script)
-                    self.exec = True
-                except Exception as e:
-                    if self.count < 3:
-                        self.count += 1
-                        return "Retry. The error is {error}".format(error=e)
-                    else:
-                        self.count = 0
-                        return "Execution Failed. Stop Now."
-
-            is_exec = self.exec
-            self.exec = False
-            return is_exec
+            self.result = self.execute(query)
+            if not self.result.ok:
+                return self.retry(self.result.error)
+            return True
+
+    def execute(self, scripts):
+        """Runs the scripts with the script engine, or prints them without chromedriver. Returns a ScriptResult."""
+        return self.engine.run(scripts, dry_run=not self.use_chromedriver)
+
+    def retry(self, e):
+        if self.count < 3:
+            self.count += 1
+            return "Retry. The error is {error}".format(error=e)
+        else:
+            self.count = 0
+            return "Execution Failed. Stop Now."
+
+    async def arun(self, query):
+        """Async version of run. The scripts are generated on the shared thread pool and run on the browser worker."""
+
+        if self.SEPERATE_TOKEN in query:
+            content, timestamp = query[:query.index(self.SEPERATE_TOKEN)], query[query.index(self.SEPERATE_TOKEN)+1:]
+            query = self.timestamp_query_prompt.format(content=content, timestamp=timestamp)
+
+        browser = browser_worker() if self.use_chromedriver else None
+        if query == 'quit':
+            if self.use_chromedriver:
+                res_url = await browser.submit(close_driver)
+                print(f"Exiting. Visit url {res_url}.")
+            else: print("Exiting.")
+        else:
+            query = str(await run_blocking(self.vec_query, query))
+            self.scripts = normalize(query).split("\n")
+            print('\n')
+            self.result = await browser.submit(self.execute, query) if self.use_chromedriver else self.execute(query)
+            if not self.result.ok:
+                return self.retry(self.result.error)
+
+            if self.use_chromedriver:
+                browser.prefetch(get_layers)
+            return True
         
 
 class SimpleScriptAgent:
@@ -345,10 +427,7 @@ class SimpleScriptAgent:
 
         self.SEPERATE_TOKEN = '£'
         
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
 
@@ -358,21 +437,21 @@ class SimpleScriptAgent:
             start_driver(self.main_url)
             open_project(self.project_name)
 
-        with open("config/prompts.yaml", 'r') as stream:
-            prompts = yaml.safe_load(stream)
+        prompts = get_prompts()
 
         self.main_agent_template_prompt = prompts['simple_script_main_agent_template_prompt']
         self.executor_description = prompts['simple_script_executor_description']
         self.executor_prompt = prompts['executor_prompt']
+        self.timestamp_query_prompt = prompts['timestamp_query_prompt']
 
         if model_name in ["gpt-4", "gpt-3.5-turbo"]:
-            self.llm_ = ChatOpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="chat")
             self.agent_type = AgentType.CHAT_ZERO_SHOT_REACT_DESCRIPTION
         else:
-            self.llm_ = OpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="completion")
             self.agent_type = AgentType.ZERO_SHOT_REACT_DESCRIPTION
 
-        self.vectorstore = KapwingVectorStore(filepath='data/instructions_scripts.txt')
+        self.vectorstore = get_vectorstore('data/instructions_scripts.txt')
 
         self.vectorstore_type = vectorstore_type
         if self.vectorstore_type == "faiss":
@@ -383,27 +462,22 @@ class SimpleScriptAgent:
             self.vec_query = self.vectorstore.gpt_index_scripts_query
 
         self.count = 0
-        self.exec = False
+        self.engine = get_script_engine()
+        self.result = None
 
         def executor_(query):
             query = self.vec_query(query)
-            self.scripts = [line for line in query.split("\n") if not line.startswith("```")]
+            self.scripts = normalize(query).split("\n")
 
             print('\n')
-            for script in self.scripts:
-                print(script)
-                try: 
-                    if self.use_chromedriver: 
-                        exec(script)
-                    else: print('\n' + script)
-                    self.exec = True
-                except Exception as e:
-                    if self.count < 3:
-                        self.count += 1
-                        return self.executor_prompt.format(error=e)
-                    else:
-                        self.count = 0
-                        return "Execution Failed. Stop Now."
+            self.result = self.engine.run(query, dry_run=not self.use_chromedriver)
+            if not self.result.ok:
+                if self.count < 3:
+                    self.count += 1
+                    return self.executor_prompt.format(error=self.result.error)
+                else:
+                    self.count = 0
+                    return "Execution Failed. Stop Now."
                     
         self.executor = Tool(name="executor", func=executor_, description=self.executor_description)
 
@@ -439,10 +513,14 @@ class SimpleScriptAgent:
                 print(f"Exiting. Visit url {res_url}.")
             else: print("Exiting.")
         else:    
+            self.result = None
             self.agent_executor.run(input=query)
-            is_exec = self.exec
-            self.exec = False
-            return is_exec
+            return bool(self.result)
+
+    async def arun(self, query):
+        """Async version of run on the shared thread pool. The agent decides every step from the last observation,
+        so its loop stays serial, but other conversations run meanwhile."""
+        return await run_blocking(self.run, query)
 
             
 class GPTScriptAgent:
@@ -455,10 +533,7 @@ class GPTScriptAgent:
 
         self.SEPERATE_TOKEN = '£'
         
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
 
@@ -468,8 +543,7 @@ class GPTScriptAgent:
             start_driver(self.main_url)
             open_project(self.project_name)
 
-        with open("config/prompts.yaml", 'r') as stream:
-            prompts = yaml.safe_load(stream)
+        prompts = get_prompts()
 
         self.main_agent_template_prompt = prompts['script_main_agent_template_prompt']
         self.mask_prompt = prompts['mask_prompt']
@@ -477,16 +551,17 @@ class GPTScriptAgent:
         self.script_generator_prompt = prompts['script_generator_prompt']
         self.executor_description = prompts['script_executor_description']
         self.executor_prompt = prompts['executor_prompt']
+        self.timestamp_query_prompt = prompts['timestamp_query_prompt']
 
         if model_name in ["gpt-4", "gpt-3.5-turbo"]:
-            self.llm_ = ChatOpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="chat")
             self.agent_type = AgentType.CHAT_ZERO_SHOT_REACT_DESCRIPTION
         else:
-            self.llm_ = OpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="completion")
             self.agent_type = AgentType.ZERO_SHOT_REACT_DESCRIPTION
 
-        self.vectorstore_1 = KapwingVectorStore(filepath='data/query_instructions.txt')
-        self.vectorstore_2 = KapwingVectorStore(filepath='data/instructions_scripts.txt')
+        self.vectorstore_1 = get_vectorstore('data/query_instructions.txt')
+        self.vectorstore_2 = get_vectorstore('data/instructions_scripts.txt')
 
         if vectorstore_type == "faiss":
             _, self.rec_tool_vec_1 = self.vectorstore_1.get_faiss()
@@ -496,27 +571,35 @@ class GPTScriptAgent:
             self.vectorstore_2.set_gpt_index()
 
         self.count = 0
-        self.exec = False
+        self.engine = get_script_engine()
+        self.result = None
 
         def executor_(query):
-            self.scripts = [line for line in query.split("\n") if not line.startswith("```")]
-            for script in self.scripts:
-                try: 
-                    if self.use_chromedriver: exec(script)
-                    else: print('\n' + script)
-                    self.exec = True
-                except Exception as e:
-                    if self.count < 3:
-                        self.count += 1
-                        return self.executor_prompt.format(error=e)
-                    else:
-                        self.count = 0
-                        return "Execution Failed. Stop Now."
+            self.scripts = normalize(query).split("\n")
+            self.result = self.engine.run(query, dry_run=not self.use_chromedriver)
+            if not self.result.ok:
+                if self.count < 3:
+                    self.count += 1
+                    return self.executor_prompt.format(error=self.result.error)
+                else:
+                    self.count = 0
+                    return "Execution Failed. Stop Now."
                     
-        self.steps_generator = Tool(name="steps_generator", func=self.rec_tool_vec_1.run, description=self.steps_generator_prompt+self.mask_prompt)
-        self.script_generator = Tool(name="script_generator", func=self.rec_tool_vec_2.run, description=self.script_generator_prompt+self.mask_prompt)
-        self.executor = Tool(name="executor", func=executor_, description=self.executor_description)
-        self.human_tool = load_tools(["human"])[0]
+        async def aexecutor_(query):
+            # The scripts drive the browser, so they run in order on the browser worker.
+            if self.use_chromedriver:
+                return await browser_worker().submit(executor_, query)
+            return executor_(query)
+
+        self.prefetcher = Prefetcher()
+        self.steps_generator = Tool(name="steps_generator", func=self.rec_tool_vec_1.run, description=self.steps_generator_prompt+self.mask_prompt,
+                                    coroutine=lambda query: self.prefetcher.run(self.rec_tool_vec_1.run, query))
+        self.script_generator = Tool(name="script_generator", func=self.rec_tool_vec_2.run, description=self.script_generator_prompt+self.mask_prompt,
+                                     coroutine=lambda query: self.prefetcher.run(self.rec_tool_vec_2.run, query))
+        self.executor = Tool(name="executor", func=executor_, description=self.executor_description, coroutine=aexecutor_)
+        human_tool = load_tools(["human"])[0]
+        self.human_tool = Tool(name=human_tool.name, func=human_tool.run, description=human_tool.description,
+                               coroutine=lambda query: run_blocking(human_tool.run, query))
 
         self.tools = [self.steps_generator, self.script_generator, self.executor, self.human_tool]
         self.main_prompt = CustomPromptTemplate(template=self.main_agent_template_prompt, 
@@ -550,10 +633,36 @@ class GPTScriptAgent:
                 print(f"Exiting. Visit url {res_url}.")
             else: print("Exiting.")
         else:    
+            self.result = None
             self.agent_executor.run(input=query)
-            is_exec = self.exec
-            self.exec = False
-            return is_exec
+            return bool(self.result)
+
+    async def arun(self, query):
+        """Async version of run, the same ReAct loop on the agent executor's async API. The steps of the query are
+        generated and the next page state read while the agent's first LLM call runs, and the scripts run on the
+        browser worker, leaving the event loop free for other conversations."""
+
+        if self.SEPERATE_TOKEN in query:
+            content, timestamp = query[:query.index(self.SEPERATE_TOKEN)], query[query.index(self.SEPERATE_TOKEN)+1:]
+            query = self.timestamp_query_prompt.format(content=content, timestamp=timestamp)
+
+        browser = browser_worker() if self.use_chromedriver else None
+        if query == 'quit':
+            if self.use_chromedriver:
+                res_url = await browser.submit(close_driver)
+                print(f"Exiting. Visit url {res_url}.")
+            else: print("Exiting.")
+            return
+
+        self.result = None
+        if self.use_chromedriver:
+            browser.prefetch(get_layers)
+        self.prefetcher.start(self.rec_tool_vec_1.run, query)
+        try:
+            await self.agent_executor.arun(input=query)
+        finally:
+            self.prefetcher.clear()
+        return bool(self.result)
 
 
 class MemoryGPTScriptAgent:
@@ -566,10 +675,7 @@ class MemoryGPTScriptAgent:
 
         self.SEPERATE_TOKEN = '£'
         
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
-
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.main_url = config['KAPWING_URL']
         self.project_name = config['KAPWING_PROJECT_NAME']
 
@@ -579,8 +685,7 @@ class MemoryGPTScriptAgent:
             start_driver(self.main_url)
             open_project(self.project_name)
 
-        with open("config/prompts.yaml", 'r') as stream:
-            prompts = yaml.safe_load(stream)
+        prompts = get_prompts()
 
         self.main_agent_prefix_prompt = prompts['script_main_agent_prefix_prompt_memory']
         self.main_agent_suffix_prompt = prompts['script_main_agent_suffix_prompt_memory']
@@ -589,14 +694,15 @@ class MemoryGPTScriptAgent:
         self.script_generator_prompt = prompts['script_generator_prompt']
         self.executor_description = prompts['script_executor_description']
         self.executor_prompt = prompts['executor_prompt']
+        self.timestamp_query_prompt = prompts['timestamp_query_prompt']
 
         if model_name in ["gpt-4", "gpt-3.5-turbo"]:
-            self.llm_ = ChatOpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="chat")
         else:
-            self.llm_ = OpenAI(model_name=model_name, temperature=temperature)
+            self.llm_ = get_llm(model_name, temperature, llm_type="completion")
 
-        self.vectorstore_1 = KapwingVectorStore(filepath='data/query_instructions.txt')
-        self.vectorstore_2 = KapwingVectorStore(filepath='data/instructions_scripts.txt')
+        self.vectorstore_1 = get_vectorstore('data/query_instructions.txt')
+        self.vectorstore_2 = get_vectorstore('data/instructions_scripts.txt')
 
         if vectorstore_type == "faiss":
             _, self.rec_tool_vec_1 = self.vectorstore_1.get_faiss()
@@ -606,27 +712,35 @@ class MemoryGPTScriptAgent:
             _, self.rec_tool_vec_2 = self.vectorstore_2.get_faiss()
 
         self.count = 0
-        self.exec = False
+        self.engine = get_script_engine()
+        self.result = None
 
         def executor_(query):
-            self.scripts = [line for line in query.split("\n") if not line.startswith("```")]
-            for script in self.scripts:
-                try: 
-                    if self.use_chromedriver: exec(script)
-                    else: print('\n' + script)
-                    self.exec = True
-                except Exception as e:
-                    if self.count < 3:
-                        self.count += 1
-                        return self.executor_prompt.format(error=e)
-                    else:
-                        self.count = 0
-                        return "Execution Failed. Stop Now."
-
-        self.steps_generator = Tool(name="steps_generator", func=self.rec_tool_vec_1.run, description=self.steps_generator_prompt+self.mask_prompt)
-        self.script_generator = Tool(name="script_generator", func=self.rec_tool_vec_2.run, description=self.script_generator_prompt+self.mask_prompt)
-        self.executor = Tool(name="executor", func=executor_, description=self.executor_description)
-        self.human_tool = load_tools(["human"])[0]
+            self.scripts = normalize(query).split("\n")
+            self.result = self.engine.run(query, dry_run=not self.use_chromedriver)
+            if not self.result.ok:
+                if self.count < 3:
+                    self.count += 1
+                    return self.executor_prompt.format(error=self.result.error)
+                else:
+                    self.count = 0
+                    return "Execution Failed. Stop Now."
+
+        async def aexecutor_(query):
+            # The scripts drive the browser, so they run in order on the browser worker.
+            if self.use_chromedriver:
+                return await browser_worker().submit(executor_, query)
+            return executor_(query)
+
+        self.prefetcher = Prefetcher()
+        self.steps_generator = Tool(name="steps_generator", func=self.rec_tool_vec_1.run, description=self.steps_generator_prompt+self.mask_prompt,
+                                    coroutine=lambda query: self.prefetcher.run(self.rec_tool_vec_1.run, query))
+        self.script_generator = Tool(name="script_generator", func=self.rec_tool_vec_2.run, description=self.script_generator_prompt+self.mask_prompt,
+                                     coroutine=lambda query: self.prefetcher.run(self.rec_tool_vec_2.run, query))
+        self.executor = Tool(name="executor", func=executor_, description=self.executor_description, coroutine=aexecutor_)
+        human_tool = load_tools(["human"])[0]
+        self.human_tool = Tool(name=human_tool.name, func=human_tool.run, description=human_tool.description,
+                               coroutine=lambda query: run_blocking(human_tool.run, query))
 
         self.tools = [self.steps_generator, self.script_generator, self.executor, self.human_tool] 
         self.memory = ConversationBufferMemory(memory_key="chat_history")
@@ -655,10 +769,36 @@ class MemoryGPTScriptAgent:
                 print(f"Exiting. Visit url {res_url}.")
             else: print("Exiting.")
         else:    
-            self.agent_executor.run(input=query)
-            is_exec = self.exec
-            self.exec = False
-            return is_exec
+            self.result = None
+            self.agent_chain.run(input=query)
+            return bool(self.result)
+
+    async def arun(self, query):
+        """Async version of run, the same ReAct loop on the agent executor's async API. The steps of the query are
+        generated and the next page state read while the agent's first LLM call runs, and the scripts run on the
+        browser worker, leaving the event loop free for other conversations."""
+
+        if self.SEPERATE_TOKEN in query:
+            content, timestamp = query[:query.index(self.SEPERATE_TOKEN)], query[query.index(self.SEPERATE_TOKEN)+1:]
+            query = self.timestamp_query_prompt.format(content=content, timestamp=timestamp)
+
+        browser = browser_worker() if self.use_chromedriver else None
+        if query == 'quit':
+            if self.use_chromedriver:
+                res_url = await browser.submit(close_driver)
+                print(f"Exiting. Visit url {res_url}.")
+            else: print("Exiting.")
+            return
+
+        self.result = None
+        if self.use_chromedriver:
+            browser.prefetch(get_layers)
+        self.prefetcher.start(self.rec_tool_vec_1.run, query)
+        try:
+            await self.agent_chain.arun(input=query)
+        finally:
+            self.prefetcher.clear()
+        return bool(self.result)
 
 
 def main():
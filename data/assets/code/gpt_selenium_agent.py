@@ -7,7 +7,6 @@ import time
 import datetime
 import traceback
 import html2text
-from bs4 import BeautifulSoup
 from bs4.element import NavigableString
 from bs4.element import Tag
 
@@ -22,6 +21,7 @@ from selenium.webdriver.support.relative_locator import locate_with
 from langchain.chat_models import ChatOpenAI
 from utils.instruction_compiler import InstructionCompiler
 from utils.memories import Memory
+from utils.html_cleaner import HTMLCleaner
 
 TIME_BETWEEN_ACTIONS = 0.01
 
@@ -33,6 +33,11 @@ logger = logging.getLogger(__name__)
 
 NO_RESPONSE_TOKEN = "<NONE>"  # To denote that empty response from model.
 CHATGPT_KWARGS = kwargs = {"temperature": 0, "model_name": "gpt-3.5-turbo"}
+ELEMENT_CLEANER = HTMLCleaner(
+    drop_tags=["head", "title", "meta", "script", "style", "path", "svg", "br"],
+    # Prefixes, as the regexes these were matched with: "src" also dropped srcset and "data-*" also dataset.
+    drop_attributes=["style*", "ping*", "src*", "item*", "aria*", "js*", "data*"],
+)
 
 
 class GPTWebElement(webdriver.remote.webelement.WebElement):
@@ -171,62 +176,22 @@ class GPTSeleniumAgent:
 
         return False
 
-    def _remove_blacklisted_elements_and_attributes(self) -> BeautifulSoup:
+    def _remove_blacklisted_elements_and_attributes(self) -> str:
         """Clean HTML to remove blacklisted elements and attributes. Returns
-        BeautifulSoup object."""
-        blacklisted_elements = set(
-            [
-                "head",
-                "title",
-                "meta",
-                "script",
-                "style",
-                "path",
-                "svg",
-                "br",
-                "::marker",
-            ]
-        )
-        blacklisted_attributes = set(
-            ["style", "ping", "src", "item*", "aria*", "js*", "data-*"]
-        )
-
-        # Get the HTML tag for the entire page, convert into BeautifulSoup.
+        the cleaned HTML string."""
+        # Get the HTML tag for the entire page and clean it in one pass.
         html = self.driver.find_element(By.TAG_NAME, "html")
-        html_string = html.get_attribute("outerHTML")
-        soup = BeautifulSoup(html_string, "lxml")
-
-        # Remove blacklisted items and attributes in it.
-        for blacklisted in blacklisted_elements:
-            for tag in soup.find_all(blacklisted):
-                tag.decompose()
-
-        # Set up a helper function to delete the blacklisted attributes from
-        # a tag, as long as the attribute name matches the regex.
-        def remove_blacklisted_attributes(tag, blacklisted_attributes):
-            for attr in tag.attrs.copy():
-                for pattern in blacklisted_attributes:
-                    if re.match(pattern, attr):
-                        del tag[attr]
-
-        for tag in soup.find_all(True):
-            remove_blacklisted_attributes(tag, blacklisted_attributes)
-
-        return soup
+        return ELEMENT_CLEANER.clean(html.get_attribute("outerHTML"))
 
     def __get_html_elements_for_llm(self):
-        """Returns list of BeautifulSoup elements for use in GPT Index.
+        """Returns list of element strings for use in GPT Index.
 
-        First removes blacklisted elements and attributes, then removes any
-        children of elements. Finally, removes any elements with no attrs.
+        Each element is its start tag and own text, without its children,
+        after removing blacklisted elements and attributes. Elements with no
+        attrs, e.g., <p></p>, are left out.
         """
-        soup = self._remove_blacklisted_elements_and_attributes()
-        # Remove children of elements that have children.
-        elements = soup.find_all()
-        [ele.clear() if ele.contents else ele for ele in elements if ele.contents]
-        # Then remove any elements that do not have attributes, e.g., <p></p>.
-        elements = [ele for ele in elements if ele.attrs]
-        return elements
+        html = self.driver.find_element(By.TAG_NAME, "html")
+        return ELEMENT_CLEANER.elements(html.get_attribute("outerHTML"), require_attributes=True)
 
     def __complete(self):
         """What to run when the agent is done."""
@@ -627,7 +592,7 @@ class GPTSeleniumAgent:
         # First, get and clean elements from the main page.
         elements = self.__get_html_elements_for_llm()
         elements_tagged_by_iframe.update(
-            {ele.prettify(): {"iframe": None, "element": ele} for ele in elements}
+            {ele: {"iframe": None, "element": ele} for ele in elements}
         )
         # Then do it for the iframes.
         iframes = self.driver.find_elements(by=By.TAG_NAME, value="iframe")
@@ -635,12 +600,12 @@ class GPTSeleniumAgent:
             self.driver.switch_to.frame(iframe)
             elements = self.__get_html_elements_for_llm()
             elements_tagged_by_iframe.update(
-                {ele.prettify(): {"iframe": iframe, "element": ele} for ele in elements}
+                {ele: {"iframe": iframe, "element": ele} for ele in elements}
             )
 
         # Create the docs and a dict of doc_id to element, which will help
         # us find the element that GPT Index returns.
-        docs = [Document(element.prettify()) for element in elements]
+        docs = [Document(element) for element in elements]
         doc_id_to_element = {doc.get_doc_id(): doc.get_text() for doc in docs}
 
         # Construct and query index.
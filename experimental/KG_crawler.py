@@ -0,0 +1,225 @@
+import os
+import sys
+import ast
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from KG_graph import DATA_DIR
+from html_chunker import HTMLChunker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # utils of the repository
+from utils.html_cleaner import clean_html as html_cleaner
+
+
+SIDEBAR_NODES = ["accounts", "campaigns", "analytics", "unibox", "settings", "accelerator"] # all sidebar elements
+STATE_FILE = os.path.join(DATA_DIR, "crawl_state.json")
+
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+"""Browser sessions and LLM calls."""
+
+class RateLimiter:
+    """Token bucket shared by threads, allowing rate calls per second on average and bursts of burst calls."""
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def login_driver(config, headless=True):
+    """Starts Chrome and logs in to MAIN_URL with WEBSITE_USERNAME and WEBSITE_PASSWORD. Every crawler session logs in
+    on its own, as Chrome locks the user data dir to one browser."""
+
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    driver = webdriver.Chrome(options=options)
+    driver.implicitly_wait(2)
+    driver.get(config['MAIN_URL'])
+
+    driver.find_element(By.CSS_SELECTOR, 'a.nav-link.login.w-nav-link').click()
+    driver.find_element(By.CSS_SELECTOR, "input[name='email']").clear()
+    driver.find_element(By.CSS_SELECTOR, "input[name='email']").send_keys(config['WEBSITE_USERNAME'])
+    driver.find_element(By.CSS_SELECTOR, "input[name='password']").send_keys(config['WEBSITE_PASSWORD'])
+    driver.find_element(By.CSS_SELECTOR, 'button.btn.btn-success').click()
+    WebDriverWait(driver, 20).until(lambda d: d.find_elements(By.CSS_SELECTOR, 'li[id^="sidebar_wrapper_"]'))
+    return driver
+
+
+class KGCrawler:
+    """Crawls the sidebar pages into the <page>_KG.xlsx sheets with workers browser sessions in parallel, and extracts
+    the elements of the HTML chunks with the LLM chain on llm_workers threads, at most rate calls per second.
+    The hashes of the cleaned pages and the elements of every chunk are kept in state_file, so a page that did not change
+    is skipped, and only the changed chunks of a changed page are sent to the LLM.
+    For example, with the chain of building_KG:
+        crawler = KGCrawler(chain, lambda: login_driver(config), workers=3)
+        crawler.crawl()
+    """
+
+    def __init__(self, chain, driver_factory,
+                       workers=3,
+                       llm_workers=4,
+                       rate=1.0,
+                       model_name="gpt-4",
+                       max_tokens=4000,
+                       data_dir=DATA_DIR,
+                       state_file=STATE_FILE):
+
+        self.chain = chain
+        self.driver_factory = driver_factory
+        self.workers = workers
+        self.llm_workers = llm_workers
+        self.limiter = RateLimiter(rate=rate, burst=llm_workers)
+        # Content defined boundaries keep the chunks of the unchanged parts of a page, and so their cached elements.
+        self.chunker = HTMLChunker(model_name=model_name, max_tokens=max_tokens, boundary=16)
+        self.data_dir = data_dir
+        self.state_file = state_file
+
+        self.local = threading.local()
+        self.drivers = []
+        self.lock = threading.Lock()
+        self.state = {"pages": {}, "chunks": {}}
+        self.stats = {"pages": 0, "skipped_pages": 0, "chunks": 0, "cached_chunks": 0, "llm_calls": 0, "llm_errors": 0}
+        self.load_state()
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                self.state = json.load(f)
+
+    def save_state(self):
+        with open(self.state_file + ".tmp", 'w') as f:
+            json.dump(self.state, f)
+        os.replace(self.state_file + ".tmp", self.state_file)
+
+    def get_driver(self):
+        if getattr(self.local, "driver", None) is None:
+            self.local.driver = self.driver_factory()
+            with self.lock:
+                self.drivers.append(self.local.driver)
+        return self.local.driver
+
+    def sheet_path(self, page):
+        return os.path.join(self.data_dir, f"{page}_KG.xlsx")
+
+    def fetch(self, page):
+        """Opens the page from the sidebar of this thread's browser, and returns its URL and cleaned HTML."""
+
+        driver = self.get_driver()
+        previous_url = driver.current_url
+        driver.find_element(By.CSS_SELECTOR, f'li#sidebar_wrapper_{page}').click()
+        try:
+            WebDriverWait(driver, 10).until(lambda d: d.current_url != previous_url
+                                            and d.execute_script("return document.readyState") == "complete")
+        except TimeoutException:
+            # The browser was on this page already.
+            pass
+        return driver.current_url, html_cleaner(driver.page_source)
+
+    def extract(self, chunk):
+        """Elements of one chunk, from the LLM chain. A failed chunk gets no elements and is not cached."""
+
+        self.limiter.acquire()
+        with self.lock:
+            self.stats["llm_calls"] += 1
+        try:
+            nodes = ast.literal_eval(self.chain.run(chunk).strip())
+            return [dict(node) for node in nodes]
+        except Exception as e:
+            print(e)
+            with self.lock:
+                self.stats["llm_errors"] += 1
+            return None
+
+    def crawl_page(self, page, llm_executor):
+        url, html = self.fetch(page)
+        page_hash = digest(html)
+        if self.state["pages"].get(page, {}).get("hash") == page_hash and os.path.exists(self.sheet_path(page)):
+            with self.lock:
+                self.stats["skipped_pages"] += 1
+            return page, False
+
+        chunks = self.chunker.split(html)
+        chunk_hashes = [digest(chunk) for chunk in chunks]
+        futures = {chunk_hash: llm_executor.submit(self.extract, chunk)
+                   for chunk_hash, chunk in zip(chunk_hashes, chunks) if chunk_hash not in self.state["chunks"]}
+        with self.lock:
+            self.stats["chunks"] += len(chunks)
+            self.stats["cached_chunks"] += len(chunks) - len(futures)
+
+        for chunk_hash, future in futures.items():
+            nodes = future.result()
+            if nodes is not None:
+                with self.lock:
+                    self.state["chunks"][chunk_hash] = nodes
+
+        all_node = []
+        for chunk_hash in chunk_hashes:
+            for node in self.state["chunks"].get(chunk_hash, []):
+                new_node = dict(node, child_element="", element_url=url)
+                if new_node not in all_node:
+                    all_node.append(new_node)
+        pd.DataFrame(all_node).to_excel(self.sheet_path(page), index=False)
+
+        with self.lock:
+            complete = all(chunk_hash in self.state["chunks"] for chunk_hash in chunk_hashes)
+            # A page with failed chunks is crawled again next time.
+            self.state["pages"][page] = {"hash": page_hash if complete else None, "url": url, "chunks": chunk_hashes}
+            self.stats["pages"] += 1
+            self.save_state()
+        return page, True
+
+    def crawl(self, pages=SIDEBAR_NODES):
+        """Crawls the pages and returns the pages whose sheet was rewritten."""
+
+        changed = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.llm_workers) as llm_executor, \
+                 ThreadPoolExecutor(max_workers=self.workers) as page_executor:
+                futures = [page_executor.submit(self.crawl_page, page, llm_executor) for page in pages]
+                for future in as_completed(futures):
+                    page, rewritten = future.result()
+                    print(f"{page}: {'rewritten' if rewritten else 'unchanged'}")
+                    if rewritten:
+                        changed.append(page)
+        finally:
+            self.close()
+
+        used = {chunk_hash for page in self.state["pages"].values() for chunk_hash in page.get("chunks", [])}
+        self.state["chunks"] = {chunk_hash: nodes for chunk_hash, nodes in self.state["chunks"].items() if chunk_hash in used}
+        self.save_state()
+        return changed
+
+    def close(self):
+        with self.lock:
+            drivers, self.drivers = self.drivers, []
+        for driver in drivers:
+            driver.quit()
+        self.local = threading.local()
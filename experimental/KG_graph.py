@@ -0,0 +1,162 @@
+import os
+import glob
+import pickle
+import pandas as pd
+
+import KG_tools
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GRAPH_FILE = os.path.join(DATA_DIR, "KG.pkl")
+
+
+"""Knowledge graph of the web elements, loaded once from the Excel sheets into dicts.
+KG.xlsx holds the navigation graph (node, description, func, args, next_node), and every <page>_KG.xlsx the elements
+building_KG extracted from one page (element_name, element_description, element_css, child_element, element_url).
+Elements of a page are the children of a node named after the page, and get the id <page>/<element_name>."""
+
+def split_names(value):
+    if pd.isna(value) or not str(value).strip():
+        return ()
+    return tuple(name.strip() for name in str(value).split(",") if name.strip())
+
+
+def text(value):
+    return None if pd.isna(value) else str(value)
+
+
+class KnowledgeGraph:
+    """Adjacency list graph of the KG sheets. Nodes are dicts keyed by name, the children of a node are a tuple of names,
+    and the child descriptions the navigator prompts with are built once for every node."""
+
+    def __init__(self, nodes=None, sources=None):
+        self.nodes = nodes or {}
+        self.sources = sources or {}
+        self.child_descriptions = {}
+        self.build_descriptions()
+
+    @classmethod
+    def from_sheets(cls, filepath=os.path.join(DATA_DIR, "KG.xlsx"), pattern=os.path.join(DATA_DIR, "*_KG.xlsx")):
+        nodes = {}
+        page_files = sorted(glob.glob(pattern))
+        if os.path.exists(filepath):
+            for row in pd.read_excel(filepath).itertuples(index=False):
+                nodes[str(row.node)] = {"name": str(row.node), "description": text(row.description) or "",
+                                        "func": text(row.func) or str(row.node), "args": text(row.args),
+                                        "children": split_names(row.next_node), "page": None, "css": None, "url": None}
+
+        for page_file in page_files:
+            page = os.path.basename(page_file)[:-len("_KG.xlsx")]
+            df = pd.read_excel(page_file)
+            element_ids, child_names = [], []
+            for row in df.itertuples(index=False):
+                element_id, n = f"{page}/{row.element_name}", 2
+                while element_id in nodes:
+                    # The extraction names different elements alike, e.g. the rows of a table.
+                    element_id, n = f"{page}/{row.element_name} ({n})", n + 1
+                nodes[element_id] = {"name": element_id, "description": text(row.element_description) or "",
+                                     "func": None, "args": None, "children": (), "page": page,
+                                     "css": text(row.element_css), "url": text(row.element_url)}
+                element_ids.append(element_id)
+                child_names.append(split_names(row.child_element))
+
+            for element_id, names in zip(element_ids, child_names):
+                nodes[element_id]["children"] = tuple(f"{page}/{name}" if f"{page}/{name}" in nodes else name for name in names)
+            url = next((nodes[element_id]["url"] for element_id in element_ids if nodes[element_id]["url"]), None)
+            nodes.setdefault(page, {"name": page, "description": f"The {page} page.", "func": None, "args": None,
+                                    "children": tuple(element_ids), "page": page, "css": None, "url": url})
+
+        return cls(nodes, sources=source_stamps([filepath] + page_files))
+
+    @classmethod
+    def load(cls, filepath=GRAPH_FILE, sheet_filepath=os.path.join(DATA_DIR, "KG.xlsx"),
+             pattern=os.path.join(DATA_DIR, "*_KG.xlsx")):
+        """Loads the pickled graph, or builds it from the sheets and pickles it when missing or older than the sheets."""
+
+        sources = source_stamps([sheet_filepath] + sorted(glob.glob(pattern)))
+        if filepath and os.path.exists(filepath):
+            with open(filepath, 'rb') as f:
+                graph = pickle.load(f)
+            if graph.sources == sources:
+                return graph
+
+        graph = cls.from_sheets(sheet_filepath, pattern)
+        if filepath:
+            graph.save(filepath)
+        return graph
+
+    def save(self, filepath=GRAPH_FILE):
+        with open(filepath + ".tmp", 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filepath + ".tmp", filepath)
+
+    def build_descriptions(self):
+        """Describes every child with its own children, as the navigator prompt lists them."""
+
+        for name, node in self.nodes.items():
+            self.child_descriptions[name] = tuple((child, self.describe(child)) for child in node["children"] if child in self.nodes)
+
+    def describe(self, name):
+        node = self.nodes[name]
+        description = node["description"] + " If you select this element, then the element interactable in the next webpage is: "
+        children = [child for child in node["children"] if child in self.nodes]
+        if not children:
+            return description + "Nothing."
+        for child in children:
+            description += '\n  Element Name: ' + child + ' Element Description: ' + self.nodes[child]["description"]
+        return description
+
+    def __contains__(self, name):
+        return name in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node(self, name):
+        return self.nodes.get(name)
+
+    def children(self, name):
+        node = self.nodes.get(name)
+        return node["children"] if node else ()
+
+    def describe_children(self, name):
+        return self.child_descriptions.get(name, ())
+
+
+def source_stamps(filepaths):
+    return {filepath: (os.path.getsize(filepath), os.path.getmtime(filepath)) for filepath in filepaths if os.path.exists(filepath)}
+
+
+_graph = None
+
+def get_graph():
+    """The process wide graph, loaded on first use."""
+
+    global _graph
+    if _graph is None:
+        _graph = KnowledgeGraph.load()
+    return _graph
+
+
+def get_tool_func(node):
+    func = getattr(KG_tools, node["func"] or "", None)
+    if func is not None:
+        return func
+
+    def perform(*args, **kwargs):
+        print(f"I am performing {node['name']}")
+        return None
+    return perform
+
+
+def get_node(current_node, graph=None):
+    """Returns the children of current_node as tools for the navigator, without reading the sheets again."""
+
+    from langchain.agents import Tool
+
+    graph = graph or get_graph()
+    if current_node not in graph:
+        print("NO CURRENT NODE")
+        return []
+    return [Tool(name=child, func=get_tool_func(graph.node(child)), description=description, return_direct=True)
+            for child, description in graph.describe_children(current_node)]
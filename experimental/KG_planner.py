@@ -0,0 +1,169 @@
+import re
+import numpy as np
+from collections import deque
+
+from KG_graph import get_graph, get_tool_func
+
+
+CHOICE_PROMPT = """You are a web interaction AI and you navigate a web page step by step by selecting web elements.
+USER GOAL is the web interaction that the user wants to achieve, and HISTORY are the elements you have selected so far.
+Given USER GOAL and HISTORY, you need to choose the element from ELEMENTS that is most likely to achieve the USER GOAL.
+
+The USER GOAL is:
+{goal}
+
+The HISTORY is: {history}
+
+The ELEMENTS:
+{elements}
+
+You should only output the selected element name. Your Output:
+ELEMENT NAME:
+"""
+
+
+"""Planner routing a goal over the KG by embedding similarity, so known navigation routes need no LLM call.
+A goal usually names several nodes of its route, like the email address and the reply_to of "set the reply to email of
+adrianna@creatorfuel.co", so the target is the node whose shortest route from start collects the most similarity above
+the median node. The route follows the shortest paths to the target, and the LLM is only asked where the goal does not
+separate the candidates, that is when the best two are within margin."""
+
+class KGPlanner:
+    """Plans and runs the route of a goal over a KnowledgeGraph. embeddings is any langchain Embeddings (OpenAIEmbeddings
+    by default), llm an optional chat model or LLM for ambiguous branches, without it the most similar option is taken."""
+
+    def __init__(self, graph=None, embeddings=None, llm=None, start="start", margin=0.02, max_choices=5):
+        self.graph = graph or get_graph()
+        if embeddings is None:
+            from langchain.embeddings import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings()
+        self.embeddings = embeddings
+        self.llm = llm
+        self.start = start
+        self.margin = margin
+        self.max_choices = max_choices
+
+        self.names = list(self.graph.nodes)
+        vectors = np.asarray(self.embeddings.embed_documents([self.node_text(name) for name in self.names]), dtype=np.float32)
+        self.vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.llm_calls = 0
+
+    def node_text(self, name):
+        return f"{name.split('/')[-1].replace('_', ' ')}: {self.graph.node(name)['description']}"
+
+    def score(self, goal):
+        """Cosine similarity of the goal to every node, keyed by node name."""
+
+        query_vector = np.asarray(self.embeddings.embed_query(goal), dtype=np.float32)
+        scores = self.vectors @ (query_vector / max(np.linalg.norm(query_vector), 1e-12))
+        return dict(zip(self.names, scores.tolist()))
+
+    def distances_from(self, source):
+        """BFS hop counts from source over the children."""
+
+        distances, queue = {source: 0}, deque([source])
+        while queue:
+            name = queue.popleft()
+            for child in self.graph.children(name):
+                if child not in distances and child in self.graph:
+                    distances[child] = distances[name] + 1
+                    queue.append(child)
+        return distances
+
+    def distances_to(self, target, nodes):
+        """BFS hop counts to target, over the reversed edges between the given nodes."""
+
+        parents = {}
+        for name in nodes:
+            for child in self.graph.children(name):
+                parents.setdefault(child, []).append(name)
+
+        distances, queue = {target: 0}, deque([target])
+        while queue:
+            name = queue.popleft()
+            for parent in parents.get(name, ()):
+                if parent not in distances:
+                    distances[parent] = distances[name] + 1
+                    queue.append(parent)
+        return distances
+
+    def relevance(self, scores, distances):
+        """Similarity above the median collected by the best shortest route from start to every node."""
+
+        baseline = float(np.median([scores[name] for name in distances]))
+        relevance = {}
+        for name in sorted(distances, key=distances.get):
+            relevance.setdefault(name, 0.0)
+            for child in self.graph.children(name):
+                if distances.get(child) == distances[name] + 1:
+                    relevance[child] = max(relevance.get(child, -np.inf), relevance[name] + scores[child] - baseline)
+        return relevance
+
+    def ambiguous(self, options, values):
+        """The options too close to the best one to pick by values, best first."""
+
+        options = sorted(options, key=lambda name: -values[name])[:self.max_choices]
+        return options[:1] + [name for name in options[1:] if values[options[0]] - values[name] < self.margin]
+
+    def choose(self, goal, history, options, scores):
+        """Asks the LLM to pick one of options, and falls back to the most similar one."""
+
+        if self.llm is None or len(options) < 2:
+            return options[0]
+
+        prompt = CHOICE_PROMPT.format(goal=goal,
+                                      history=", ".join(history) or "Start.",
+                                      elements="\n".join(f"{name}: {self.graph.describe(name)}" for name in options))
+        self.llm_calls += 1
+        output = self.call_llm(prompt)
+        match = re.search(r"ELEMENT\s*NAME\s*:\s*(.+)", output)
+        answer = (match.group(1) if match else output).strip().strip('"')
+        chosen = [name for name in options if name == answer] or [name for name in options if name in output]
+        return max(chosen, key=lambda name: scores[name]) if chosen else options[0]
+
+    def call_llm(self, prompt):
+        from langchain.chat_models.base import BaseChatModel
+        from langchain.schema import HumanMessage
+
+        if isinstance(self.llm, BaseChatModel):
+            return self.llm([HumanMessage(content=prompt)]).content
+        return self.llm(prompt)
+
+    def plan(self, goal, start=None):
+        """Returns {"goal", "target", "steps", "llm_calls"}. steps are the node names to select after start,
+        ending with the forced continuation of the target, i.e. its chain of only children such as save."""
+
+        start = start or self.start
+        llm_calls = self.llm_calls
+        scores = self.score(goal)
+        reachable = self.distances_from(start)
+        candidates = [name for name in reachable if name != start]
+        if not candidates:
+            return {"goal": goal, "target": None, "steps": [], "llm_calls": 0}
+
+        relevance = self.relevance(scores, reachable)
+        target = self.choose(goal, [], self.ambiguous(candidates, relevance), relevance)
+        to_target = self.distances_to(target, reachable)
+
+        steps, name = [], start
+        while name != target:
+            options = [child for child in self.graph.children(name) if to_target.get(child) == to_target[name] - 1]
+            name = self.choose(goal, steps, self.ambiguous(options, scores), scores)
+            steps.append(name)
+
+        children = self.graph.children(name)
+        while len(children) == 1 and children[0] not in steps and len(self.graph.children(children[0])) <= 1:
+            name = children[0]
+            steps.append(name)
+            children = self.graph.children(name)
+
+        return {"goal": goal, "target": target, "steps": steps, "llm_calls": self.llm_calls - llm_calls}
+
+    def run(self, goal, start=None):
+        """Plans the goal and performs every step with its KG_tools function."""
+
+        plan = self.plan(goal, start)
+        for name in plan["steps"]:
+            get_tool_func(self.graph.node(name))()
+        return plan
@@ -0,0 +1,119 @@
+import hashlib
+from html import escape
+from functools import lru_cache
+import lxml.html
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name):
+    """The tiktoken encoding of model_name, loaded once per process."""
+
+    import tiktoken
+    return tiktoken.encoding_for_model(model_name)
+
+
+def num_tokens_from_string(string: str, model_name: str) -> int:
+    """Returns the number of tokens in a text string."""
+    return len(get_encoding(model_name).encode(string))
+
+
+def start_tag(element):
+    attrs = "".join(f' {name}="{escape(str(value))}"' for name, value in element.attrib.items())
+    return f"<{element.tag}{attrs}>"
+
+
+class HTMLChunker:
+    """Splits HTML into chunks of at most max_tokens tokens along the DOM. An element that fits is kept whole in one chunk,
+    and the children of one that does not are packed in document order. An element that cannot be split, such as a big
+    img without children or text, makes a chunk of its own even over max_tokens. Only the elements split over several chunks
+    are repeated, as the start tags opening every chunk they continue in.
+    With boundary, a chunk past half of max_tokens also ends after an element whose hash is divisible by boundary,
+    so the chunk boundaries depend on the content, and a change in one part of a page only changes the chunks around it.
+    For example:
+        chunks = HTMLChunker(model_name="gpt-4", max_tokens=4000).split(html)
+    """
+
+    def __init__(self, model_name="gpt-4", max_tokens=4000, boundary=None):
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.boundary = boundary
+        self.encoding = get_encoding(model_name)
+
+    def count(self, text):
+        return len(self.encoding.encode(text))
+
+    def units(self, element, path):
+        """Yields (path, html, tokens) of the whole elements and texts to pack. path holds (start tag, end tag, tokens)
+        of the open ancestors, whose tokens also count against max_tokens."""
+
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions.
+            return
+        html = lxml.html.tostring(element, encoding="unicode", with_tail=False)
+        budget = self.max_tokens - sum(tokens for _, _, tokens in path)
+        tokens = self.count(html)
+        if tokens <= budget:
+            yield path, html, tokens
+            return
+
+        open_tag, close_tag = start_tag(element), f"</{element.tag}>"
+        tag_tokens = self.count(open_tag) + self.count(close_tag)
+        if tag_tokens >= budget or (len(element) == 0 and not (element.text or "").strip()):
+            # Nothing to split it into, e.g. a big img or input, so it makes a chunk of its own.
+            yield path, html, tokens
+            return
+        child_path = path + ((open_tag, close_tag, tag_tokens),)
+        yield from self.text_units(element.text, child_path)
+        for child in element:
+            yield from self.units(child, child_path)
+            yield from self.text_units(child.tail, child_path)
+
+    def text_units(self, text, path):
+        if not text or not text.strip():
+            return
+        text = escape(text, quote=False)
+        budget = max(self.max_tokens - sum(tokens for _, _, tokens in path), 16)
+        tokens = self.encoding.encode(text)
+        for i in range(0, len(tokens), budget):
+            piece = tokens[i:i+budget]
+            yield path, self.encoding.decode(piece), len(piece)
+
+    def split(self, html):
+        if not html.strip():
+            return []
+        root = lxml.html.fromstring(html)
+        chunks, pieces, stack, used = [], [], (), 0
+
+        def finish():
+            pieces.extend(close_tag for _, close_tag, _ in reversed(stack))
+            chunks.append("".join(pieces))
+
+        for path, unit, tokens in self.units(root, ()):
+            common = 0
+            while common < min(len(stack), len(path)) and stack[common] is path[common]:
+                common += 1
+            opened = sum(path_tokens for _, _, path_tokens in path[common:])
+            if pieces and used + opened + tokens > self.max_tokens:
+                finish()
+                pieces, stack, used, common = [], (), 0, 0
+                opened = sum(path_tokens for _, _, path_tokens in path)
+
+            # A tag counts its end tag when opened, so used is what the chunk takes once finished.
+            pieces.extend(close_tag for _, close_tag, _ in reversed(stack[common:]))
+            pieces.extend(open_tag for open_tag, _, _ in path[common:])
+            pieces.append(unit)
+            used += opened + tokens
+            stack = path
+
+            if self.boundary and used >= self.max_tokens // 2 \
+                    and int(hashlib.sha256(unit.encode("utf-8")).hexdigest()[:8], 16) % self.boundary == 0:
+                finish()
+                pieces, stack, used = [], (), 0
+
+        if pieces:
+            finish()
+        return chunks
+
+
+def chunk_html(html, model_name="gpt-4", max_tokens=4000, boundary=None):
+    return HTMLChunker(model_name=model_name, max_tokens=max_tokens, boundary=boundary).split(html)
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import threading
+import argparse
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import calculate_accuracy, calculate_topk, calculate_percentiles, calculate_cache_hit_ratio
+from agents.selenium_agent import RecommendAgent, SimpleScriptAgent, FastAgent
+from utils.driver_pool import DriverPool
+from utils.registry import get_config
+from utils.replay import recorder, configure_replay
+from utils.tools import start_driver
+from utils.tracing import tracer
+
+
+class ScriptedOracle:
+    """Answers the input() prompts of an agent instead of a person.
+    The option prompt gets choice, placeholder and mask prompts get placeholders in order, then default_placeholder."""
+
+    def __init__(self, choice=1, placeholders=(), default_placeholder="test"):
+        self.choice = choice
+        self.placeholders = list(placeholders)
+        self.default_placeholder = default_placeholder
+        self.prompts = []
+
+    def __call__(self, prompt=""):
+        self.prompts.append(prompt)
+        if "YOUR CHOICE" in prompt:
+            return str(self.choice)
+        return self.placeholders.pop(0) if self.placeholders else self.default_placeholder
+
+
+def load_queries(xlsx_file, start_pos=0, end_pos=None):
+    """Returns the rows of the dataset from start_pos to end_pos as dicts.
+    The optional columns Choice and Placeholders ('|' separated) script the oracle of each row."""
+
+    df = pd.read_excel(xlsx_file)
+    rows = []
+    for idx in range(start_pos, len(df) if end_pos is None else min(end_pos, len(df))):
+        row = df.iloc[idx]
+        rows.append({"id": int(idx),
+                     "query": str(row['Query']),
+                     "url": str(row['Link']),
+                     "label": str(row['Label']) if 'Label' in df and not pd.isna(row['Label']) else None,
+                     "choice": int(row['Choice']) if 'Choice' in df and not pd.isna(row['Choice']) else 1,
+                     "placeholders": str(row['Placeholders']).split("|") if 'Placeholders' in df and not pd.isna(row['Placeholders']) else []})
+    return rows
+
+
+class BenchmarkRunner:
+    """Runs the dataset over a pool of workers with one agent per worker, and appends every result to a JSONL checkpoint
+    as soon as it is done. Rows already in the checkpoint are skipped, so a crashed run resumes where it stopped."""
+
+    def __init__(self, checkpoint,
+                       model_name="gpt-4",
+                       temperature=0,
+                       fast=True,
+                       vectorstore_type="gpt-index",
+                       use_chromedriver=True,
+                       workers=2):
+
+        self.checkpoint = checkpoint
+        self.model_name = model_name
+        self.temperature = temperature
+        self.fast = fast
+        self.vectorstore_type = vectorstore_type
+        self.use_chromedriver = use_chromedriver
+        self.workers = workers
+
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pool = DriverPool(size=workers, max_waiting=workers) if use_chromedriver else None
+        self.logger = logging.getLogger('BenchmarkLogger')
+
+    def load_results(self):
+        if not os.path.exists(self.checkpoint):
+            return []
+        with open(self.checkpoint, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def save_result(self, result_dict):
+        with self.lock:
+            with open(self.checkpoint, 'a') as f:
+                f.write(json.dumps(result_dict, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get_agents(self):
+        """Returns the (agent, rec_agent) of the current worker, created on its first query."""
+
+        if not hasattr(self.local, "agents"):
+            if self.fast:
+                agent = FastAgent(model_name=self.model_name,
+                                  temperature=self.temperature,
+                                  vectorstore_type=self.vectorstore_type,
+                                  use_chromedriver=self.use_chromedriver)
+                self.local.agents = (agent, None)
+            else:
+                rec_agent = RecommendAgent(vectorstore_type=self.vectorstore_type)
+                agent = SimpleScriptAgent(model_name=self.model_name,
+                                          temperature=self.temperature,
+                                          vectorstore_type="faiss",
+                                          use_chromedriver=self.use_chromedriver)
+                self.local.agents = (agent, rec_agent)
+        return self.local.agents
+
+    def run_query(self, row):
+        oracle = ScriptedOracle(choice=row["choice"], placeholders=row["placeholders"])
+        result_dict = {"id": row["id"], "query": row["query"], "url": row["url"], "label": row["label"], "error": None}
+        start_time = time.time()
+        try:
+            agent, rec_agent = self.get_agents()
+            agent.input_fn = oracle
+            if self.fast:
+                latency, done, top3, index, rec_list = agent.run(row["query"], row["url"])
+                result_dict.update({"time": latency, "done": done, "top@3": top3, "rec_picked": index})
+                for i, rec in enumerate(rec_list[:3]):
+                    result_dict[f"rec_list_{i+1}"] = rec
+            else:
+                rec_agent.input_fn = oracle
+                if self.use_chromedriver:
+                    start_driver(row["url"])
+                objective, rec_latency = rec_agent.run(row["query"])
+                exec_start_time = time.time()
+                done = agent.run(objective)
+                result_dict.update({"rec_time": rec_latency, "exec_time": time.time() - exec_start_time, "done": done is True})
+        except Exception as e:
+            self.logger.info(f"RUNNING {row['query']} FAILED. ERROR REPORT IS {e}.")
+            result_dict.update({"done": False, "error": repr(e)})
+            if self.fast:
+                result_dict["top@3"] = False
+        result_dict["total_time"] = time.time() - start_time
+        if self.fast and result_dict.get("time") is not None:
+            result_dict["exec_time"] = max(0.0, result_dict["total_time"] - result_dict["time"])
+        result_dict["prompts"] = oracle.prompts
+        if tracer.enabled:
+            result_dict.update(self.count_cache_hits(start_time))
+        return result_dict
+
+    def count_cache_hits(self, start_time):
+        """Counts the semantic cache hits of the vector.query spans this thread traced since start_time."""
+
+        thread = threading.get_ident()
+        with tracer.lock:
+            queries = [record for record in tracer.records
+                       if record["name"] == "vector.query" and record["thread"] == thread and record["start"] >= start_time]
+        return {"cache_hits": sum(bool(record["attrs"].get("cache_hit")) for record in queries), "cache_queries": len(queries)}
+
+    def run_leased(self, row):
+        if self.pool is None:
+            return self.run_query(row)
+        with self.pool.lease():
+            return self.run_query(row)
+
+    def run(self, rows):
+        """Runs the rows not in the checkpoint yet and returns all results of the checkpoint."""
+
+        done_ids = {result_dict["id"] for result_dict in self.load_results()}
+        pending = [row for row in rows if row["id"] not in done_ids]
+        self.logger.info(f"{len(done_ids)} QUERIES IN CHECKPOINT, RUNNING {len(pending)}.")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.run_leased, row): row for row in pending}
+            for future in as_completed(futures):
+                result_dict = future.result()
+                self.save_result(result_dict)
+                self.logger.info(f"DONE {result_dict['query']} - {result_dict['done']} IN {result_dict['total_time']:.2f}s.")
+
+        if self.pool is not None:
+            self.pool.close()
+        return self.load_results()
+
+
+def report(result_dict_list, fast=True):
+    """Returns accuracy, top@1, top@3, cache hit ratio and p50 / p90 / p99 latency of every stage."""
+
+    stages = ["time", "exec_time", "total_time"] if fast else ["rec_time", "exec_time", "total_time"]
+    summary = {"count": len(result_dict_list), "accuracy": calculate_accuracy(result_dict_list)}
+    if fast:
+        summary["top@1"] = calculate_topk(result_dict_list, k=1)
+        summary["top@3"] = calculate_topk(result_dict_list, k=3)
+    summary["cache_hit_ratio"] = calculate_cache_hit_ratio(result_dict_list)
+    for stage in stages:
+        summary[stage] = calculate_percentiles(result_dict_list, key=stage)
+    if recorder.mode is not None:
+        summary["replay"] = recorder.get_stats()
+    return summary
+
+
+def parse_latency(value):
+    """Parses --replay_latency, a JSON value such as 0.5, '"recorded"' or '{"llm": ["lognormvariate", 0, 0.5]}'."""
+
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.replay_mode is not None:
+        configure_replay({**get_config(), "REPLAY_MODE": args.replay_mode, "REPLAY_FILE": args.replay_file,
+                          "REPLAY_LATENCY": parse_latency(args.replay_latency)})
+    rows = load_queries(args.dataset, start_pos=args.start_pos, end_pos=args.end_pos)
+    runner = BenchmarkRunner(checkpoint=args.checkpoint,
+                             model_name=args.model_name,
+                             temperature=args.temperature,
+                             fast=args.fast,
+                             vectorstore_type=args.vectorstore_type,
+                             use_chromedriver=args.use_chromedriver,
+                             workers=args.workers)
+    result_dict_list = runner.run(rows)
+    summary = report(result_dict_list, fast=args.fast)
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+def str2bool(value):
+    return str(value).lower() in ["true", "1", "yes"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel, resumable benchmark of Kapwing Agent.')
+    parser.add_argument('--dataset', type=str, default='data/kapwing_dataset.xlsx')
+    parser.add_argument('--checkpoint', type=str, default='logs/benchmark.jsonl')
+    parser.add_argument('--model_name', type=str, default='gpt-4')
+    parser.add_argument('--temperature', type=float, default=0)
+    parser.add_argument('--fast', type=str2bool, default=True)
+    parser.add_argument('--vectorstore_type', type=str, default='gpt-index')
+    parser.add_argument('--start_pos', type=int, default=0)
+    parser.add_argument('--end_pos', type=int, default=None)
+    parser.add_argument('--use_chromedriver', type=str2bool, default=True)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--replay_mode', type=str, default=None) # record / replay
+    parser.add_argument('--replay_file', type=str, default='logs/recording.jsonl')
+    parser.add_argument('--replay_latency', type=str, default=None)
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,416 @@
+import os, re, time, itertools, threading, functools
+from collections import Counter
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.request import urlopen
+
+from lxml import etree, html
+from selenium import webdriver
+from selenium.webdriver.remote.command import Command
+
+from utils.action_plan import PLAN_SCRIPT
+from utils.layers import INVENTORY_SCRIPT, PROBE_SCRIPT, TIME_BOXES_SCRIPT
+from utils.timeline import MEASURE_SCRIPT, SEEK_SCRIPT
+from utils.waits import DOM_OBSERVER_SCRIPT, NETWORK_OBSERVER_SCRIPT
+
+
+"""Stand-in for the Kapwing editor. FixtureServer serves tests/fixtures over HTTP, and FakeExecutor is the command
+executor of an in-process fake browser. It loads the page into an lxml tree, answers WebDriver commands from it and
+counts them. The scripts of utils/ are answered by Python versions of them. Unknown scripts are counted as unsupported."""
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EDITOR_PAGE = "kapwing_editor.html"
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+BACKSPACE, ARROW_UP, ARROW_DOWN = "\ue003", "\ue013", "\ue015"
+SPECIAL_KEYS = re.compile("[\ue000-\uf8ff]")
+ASSIGN_SCRIPT = re.compile(r"^\s*arguments\[0\]\.(style\.)?(\w+)\s*=\s*'(.*)';?\s*$")
+
+
+class FixtureServer:
+    """Serves the fixture pages from a local HTTP server in a daemon thread.
+    For example:
+        with FixtureServer() as server:
+            driver.get(server.url())
+    """
+
+    def __init__(self, directory=FIXTURES_DIR, port=0):
+        self.directory = directory
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        handler = functools.partial(QuietHandler, directory=self.directory)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), handler)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def url(self, page=EDITOR_PAGE):
+        return f"http://127.0.0.1:{self.port}/{page}"
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDriverError(Exception):
+    def __init__(self, error, message):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+
+
+def style_pixels(element, prop, default=0):
+    match = re.search(rf"(?:^|;|\s){prop}\s*:\s*(-?\d+(?:\.\d+)?)px", element.get("style", ""))
+    return float(match.group(1)) if match else default
+
+
+LAYER_KINDS = ["video", "image", "audio", "text"]
+LAYER_EXTENSIONS = {"video": ["mp4", "mov", "webm", "m4v", "avi", "mkv"],
+                    "image": ["jpg", "jpeg", "png", "gif", "webp", "svg", "bmp", "heic"],
+                    "audio": ["mp3", "wav", "m4a", "aac", "ogg", "flac"]}
+HINT_ATTRIBUTES = ["data-testid", "alt", "title", "aria-label"]
+LAYER_CONTROL = "Controls-module_layerControlRight_p7h1D"
+
+
+def layer_name(row):
+    """The text of a layer row without its controls, as INVENTORY_SCRIPT reads it."""
+
+    texts = [row.text or ""]
+    for child in row:
+        if LAYER_CONTROL not in child.get("class", "").split():
+            texts.append(child.text_content())
+        texts.append(child.tail or "")
+    return "".join(texts).strip()
+
+
+def layer_type_hint(row):
+    """The type INVENTORY_SCRIPT tells from a layer row, None where it would probe the edit tab."""
+
+    if row.find(".//video") is not None or row.find(".//audio") is not None:
+        return "video" if row.find(".//video") is not None else "audio"
+    match = re.search(r"\.([a-z0-9]+)$", layer_name(row), re.I)
+    for kind, extensions in LAYER_EXTENSIONS.items():
+        if match and match.group(1).lower() in extensions:
+            return kind
+    hints = [element.get(name) for element in row.iter() if isinstance(element.tag, str)
+             for name in HINT_ATTRIBUTES if element.get(name)]
+    words = re.split("[^a-z]+", " ".join(hints).lower())
+    found = [kind for kind in LAYER_KINDS if kind in words]
+    return found[0] if len(found) == 1 else None
+
+
+def is_input(element):
+    return element.tag in ["input", "textarea", "select"]
+
+
+class FakeExecutor:
+    """Command executor of a remote driver that runs WebDriver commands against an lxml tree of the loaded page.
+    Clicks and typing are logged in events. With latency, every command sleeps that long, like a round trip to a browser."""
+
+    def __init__(self, latency=0.0):
+        try:
+            import cssselect
+        except ImportError:
+            raise ImportError("The fake driver needs cssselect for CSS selectors. Please install it with `pip install cssselect`.")
+
+        self.latency = latency
+        self.tree = None
+        self.url = "about:blank"
+        self.refs, self.ids = {}, {}
+        self.next_id = itertools.count(1)
+        self.commands = Counter()
+        self.unsupported = Counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+        self.handlers = {
+            Command.NEW_SESSION: lambda params: {"sessionId": "fake", "capabilities": {"browserName": "fake-kapwing"}},
+            Command.GET: self.load,
+            Command.GET_CURRENT_URL: lambda params: self.url,
+            Command.GET_TITLE: lambda params: self.tree.findtext(".//title") if self.tree is not None else "",
+            Command.GET_PAGE_SOURCE: lambda params: etree.tostring(self.tree, encoding="unicode", method="html"),
+            Command.SET_TIMEOUTS: lambda params: None,
+            Command.W3C_MAXIMIZE_WINDOW: lambda params: {"x": 0, "y": 0, "width": 1920, "height": 1080},
+            Command.W3C_GET_CURRENT_WINDOW_HANDLE: lambda params: "fake-window",
+            Command.QUIT: lambda params: None,
+            Command.FIND_ELEMENT: lambda params: self.wrap(self.find_one(self.tree, params)),
+            Command.FIND_ELEMENTS: lambda params: self.wrap(self.find(self.tree, params)),
+            Command.FIND_CHILD_ELEMENT: lambda params: self.wrap(self.find_one(self.element(params), params)),
+            Command.FIND_CHILD_ELEMENTS: lambda params: self.wrap(self.find(self.element(params), params)),
+            Command.GET_ELEMENT_TEXT: lambda params: self.text(self.element(params)),
+            Command.GET_ELEMENT_TAG_NAME: lambda params: self.element(params).tag,
+            Command.GET_ELEMENT_RECT: lambda params: self.rect(self.element(params)),
+            Command.GET_ELEMENT_PROPERTY: lambda params: self.property(self.element(params), params["name"]),
+            Command.GET_ELEMENT_ATTRIBUTE: lambda params: self.element(params).get(params["name"]),
+            Command.IS_ELEMENT_ENABLED: lambda params: "disabled" not in self.element(params).attrib,
+            Command.IS_ELEMENT_SELECTED: lambda params: any(key in self.element(params).attrib for key in ["selected", "checked"]),
+            Command.CLICK_ELEMENT: lambda params: self.event("click", self.element(params)),
+            Command.SEND_KEYS_TO_ELEMENT: lambda params: self.type(self.element(params), params["text"]),
+            Command.CLEAR_ELEMENT: lambda params: self.set_value(self.element(params), ""),
+            Command.UPLOAD_FILE: lambda params: "uploaded-file",
+            Command.W3C_EXECUTE_SCRIPT: self.execute_script,
+            Command.W3C_EXECUTE_SCRIPT_ASYNC: self.execute_script,
+            Command.W3C_ACTIONS: lambda params: self.event("actions", None, len(params.get("actions", []))),
+            Command.W3C_CLEAR_ACTIONS: lambda params: None,
+        }
+        self.scripts = {
+            PLAN_SCRIPT: self.plan,
+            INVENTORY_SCRIPT: self.inventory,
+            PROBE_SCRIPT: self.probe,
+            TIME_BOXES_SCRIPT: lambda args: [box.text_content().strip() for box in self.tree.find_class("ExactInputBox-module_containerTimeBox_4sHbQ")],
+            MEASURE_SCRIPT: self.measure,
+            SEEK_SCRIPT: self.seek,
+            DOM_OBSERVER_SCRIPT: lambda args: 1e6,
+            "return document.readyState": lambda args: "complete",
+            NETWORK_OBSERVER_SCRIPT: lambda args: 1e6,
+        }
+
+    """Commands."""
+
+    def execute(self, command, params=None):
+        params = params or {}
+        with self.lock:
+            self.commands[command] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            with self.lock:
+                self.unsupported[command] += 1
+            return {"value": None}
+        try:
+            return {"value": handler(params)}
+        except FakeDriverError as e:
+            return {"status": e.error, "value": {"error": e.error, "message": e.message, "stacktrace": ""}}
+
+    @property
+    def round_trips(self):
+        with self.lock:
+            return sum(self.commands.values())
+
+    def reset_counts(self):
+        with self.lock:
+            self.commands.clear()
+            self.unsupported.clear()
+            del self.events[:]
+
+    def close(self):
+        pass
+
+    def load(self, params):
+        url = params["url"]
+        if re.match(r"^(https?|file)://", url):
+            with urlopen(url) as response:
+                source = response.read()
+        else:
+            with open(url, 'rb') as f:
+                source = f.read()
+        self.tree = html.document_fromstring(source)
+        self.url = url
+        self.refs.clear()
+        self.ids.clear()
+
+    def event(self, kind, element, count=1):
+        self.events.append((kind, None if element is None else element.get("class") or element.tag, count))
+
+    """Elements."""
+
+    def element_id(self, element):
+        if element not in self.ids:
+            self.ids[element] = f"fake-{next(self.next_id)}"
+            self.refs[self.ids[element]] = element
+        return self.ids[element]
+
+    def element(self, params):
+        element = self.refs.get(params["id"])
+        if element is None or element.getroottree().getroot() is not self.tree:
+            raise FakeDriverError("stale element reference", f"Element {params['id']} is not attached to the page.")
+        return element
+
+    def wrap(self, value):
+        if isinstance(value, etree._Element):
+            return {ELEMENT_KEY: self.element_id(value)}
+        if isinstance(value, (list, tuple)):
+            return [self.wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.wrap(item) for key, item in value.items()}
+        return value
+
+    def unwrap(self, value):
+        if isinstance(value, dict) and ELEMENT_KEY in value:
+            return self.element({"id": value[ELEMENT_KEY]})
+        if isinstance(value, list):
+            return [self.unwrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.unwrap(item) for key, item in value.items()}
+        return value
+
+    def find(self, root, params):
+        if root is None:
+            raise FakeDriverError("no such window", "No page is loaded.")
+        if params["using"] == "css selector":
+            # Like querySelectorAll, an element is not part of its own results.
+            return [node for node in root.cssselect(params["value"]) if node is not root or root is self.tree]
+        if params["using"] == "tag name":
+            return ([root] if root is self.tree and root.tag == params["value"] else []) + list(root.iterdescendants(params["value"]))
+        if params["using"] == "xpath":
+            return [node for node in root.xpath(params["value"]) if isinstance(node, etree._Element)]
+        raise FakeDriverError("invalid argument", f"Locator strategy {params['using']} is not supported by the fake driver.")
+
+    def find_one(self, root, params):
+        elements = self.find(root, params)
+        if not elements:
+            raise FakeDriverError("no such element", f"Unable to locate element: {params['value']}")
+        return elements[0]
+
+    def text(self, element):
+        return "" if is_input(element) else " ".join(element.text_content().split())
+
+    def rect(self, element):
+        return {"x": style_pixels(element, "left"), "y": 0, "width": style_pixels(element, "width", 100), "height": 20}
+
+    def property(self, element, name):
+        if name == "value":
+            return element.get("value", "") if is_input(element) else None
+        if name == "outerHTML":
+            return html.tostring(element, encoding="unicode", with_tail=False)
+        return element.get(name)
+
+    def set_value(self, element, value):
+        if is_input(element):
+            element.set("value", value)
+        else:
+            for child in list(element):
+                element.remove(child)
+            element.text = value
+
+    def type(self, element, text):
+        value = element.get("value", "") if is_input(element) else element.text_content()
+        for key in text:
+            if key == BACKSPACE:
+                value = value[:-1]
+            elif key in [ARROW_UP, ARROW_DOWN] and value.isdigit():
+                value = str(max(0, int(value) + (1 if key == ARROW_UP else -1))).zfill(len(value))
+            elif not SPECIAL_KEYS.match(key):
+                value += key
+        self.set_value(element, value)
+        self.event("type", element)
+
+    """Scripts."""
+
+    def execute_script(self, params):
+        script, args = params["script"], self.unwrap(params.get("args", []))
+        if script in self.scripts:
+            return self.wrap(self.scripts[script](args))
+        if script.startswith("/* getAttribute */"):
+            element, name = args[0], args[1]
+            return self.property(element, name) if name in ["value", "outerHTML"] else element.get(name)
+        if script.startswith("/* isDisplayed */"):
+            return "display: none" not in args[0].get("style", "")
+
+        match = ASSIGN_SCRIPT.match(script)
+        if match and args:
+            is_style, name, value = match.groups()
+            if is_style:
+                args[0].set("style", f"{args[0].get('style', '')}; {name}: {value}".strip("; "))
+            else:
+                args[0].set(name, value)
+            return None
+
+        with self.lock:
+            self.unsupported[f"script: {script.strip()[:40]}"] += 1
+        return None
+
+    def select(self, op):
+        nodes = self.tree.cssselect(op["css"]) if op["css"] else [node for node in self.tree.xpath(op["xpath"]) if isinstance(node, etree._Element)]
+        return nodes[op["index"]] if len(nodes) > op["index"] else None
+
+    def plan(self, args):
+        results = []
+        for op in args[0]:
+            element = self.select(op)
+            if element is None or "disabled" in element.attrib:
+                return {"error": f"Element not found: {op['css'] or op['xpath']}", "results": results}
+            if op["op"] == "value" and element.get("value", "").lstrip("#").lower() != op["value"].lstrip("#").lower():
+                return {"error": f"Value not set: {op['css'] or op['xpath']}", "results": results}
+            if op["op"] == "click":
+                self.event("click", element)
+            results.append(element.get("value", "") if op["op"] == "read" and is_input(element) else
+                           self.text(element) if op["op"] == "read" else element)
+        return {"results": results}
+
+    def inventory(self, args):
+        rows = self.tree.find_class("common-module_controlSectionRow_u6iL8")
+        tracks = self.tree.find_class("Track-module_container_mph21")
+        layers = []
+        for i, row in enumerate(rows):
+            track = tracks[i] if i < len(tracks) else None
+            layers.append({"index": i,
+                           "id": row.get("id") or str(i),
+                           "name": layer_name(row),
+                           "type": layer_type_hint(row),
+                           "left": style_pixels(track, "left") if track is not None else None,
+                           "width": style_pixels(track, "width") if track is not None else None,
+                           "element": row})
+        return layers
+
+    def probe(self, args):
+        """Clicks the rows and their edit tab. The fixture has one edit panel, whose title is read for every row."""
+
+        rows = self.tree.find_class("common-module_controlSectionRow_u6iL8")
+        titles = []
+        for index in args[0]:
+            self.event("click", rows[index])
+            self.event("click", self.tree.find_class("Tabs-module_tab_HQZWB")[1])
+            title = self.tree.find_class("common-module_controlSectionTitle_eK-7P")
+            titles.append(title[0].text_content().strip() if title else None)
+        return titles
+
+    def measure(self, args):
+        ticks = self.tree.find_class("TimeLabels-module_tick_fvLlX")
+        if len(ticks) < 2:
+            return None
+        return {"width": style_pixels(ticks[0], "width", 100), "label": ticks[1].text_content().strip()}
+
+    def seek(self, args):
+        slider = self.tree.find_class("Seeker-module_seekerContainer_HkUsQ")[0]
+        slider.set("style", f"transform: translateX({args[0]}px);")
+        return slider
+
+
+def create_fake_driver(url=None, latency=0.0):
+    """Returns a remote driver running on a FakeExecutor, on the url if given. The executor is driver.command_executor."""
+
+    driver = webdriver.Remote(command_executor=FakeExecutor(latency=latency), options=webdriver.ChromeOptions())
+    if url is not None:
+        driver.get(url)
+    return driver
+
+
+def count_commands(driver):
+    """Counts the commands driver sends, for a real browser on the fixture page. Returns the Counter."""
+
+    counter = Counter()
+    execute = driver.command_executor.execute
+
+    def counted_execute(command, params=None):
+        counter[command] += 1
+        return execute(command, params)
+
+    driver.command_executor.execute = counted_execute
+    return counter
@@ -0,0 +1,21 @@
+// Small behaviours of the editor the tools rely on in a real browser. Clicks are logged in window.__clicks,
+// and ArrowUp / ArrowDown step the focused time box like the Kapwing inputs.
+window.__clicks = [];
+
+document.addEventListener('click', function (event) {
+    var target = event.target;
+    window.__clicks.push(target.className || target.tagName);
+});
+
+document.addEventListener('keydown', function (event) {
+    var target = event.target;
+    if (target.classList && target.classList.contains('ExactInputBox-module_input_ezpNr')) {
+        var step = event.key === 'ArrowUp' ? 1 : (event.key === 'ArrowDown' ? -1 : 0);
+        if (step !== 0) {
+            var value = Math.max(0, parseInt(target.value || '0', 10) + step);
+            target.value = String(value).padStart(2, '0');
+            target.nextElementSibling.textContent = target.value;
+            event.preventDefault();
+        }
+    }
+});
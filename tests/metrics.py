@@ -1,19 +1,216 @@
+import re
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+
+"""Metrics of benchmark results. Every function takes a list of result dicts, a DataFrame, or the path of a
+.jsonl / .xlsx / .csv result file, and works on columns instead of looping over rows."""
+
+def to_frame(results):
+    if isinstance(results, pd.DataFrame):
+        return results
+    if isinstance(results, str):
+        if results.endswith(".jsonl"):
+            return pd.read_json(results, lines=True)
+        if results.endswith(".xlsx"):
+            return pd.read_excel(results)
+        return pd.read_csv(results)
+    return pd.DataFrame(list(results))
+
+
+def column(df, key):
+    """Returns the non missing values of a column as floats, empty if the column does not exist."""
+
+    if key not in df:
+        return np.array([], dtype=float)
+    values = pd.to_numeric(df[key], errors="coerce").to_numpy(dtype=float)
+    return values[~np.isnan(values)]
+
+
+def flag(df, key):
+    return df[key].fillna(False).astype(bool).to_numpy() if key in df else np.zeros(len(df), dtype=bool)
+
+
 def calculate_accuracy(result_dict_list):
-    count = 0
-    for result_dict in result_dict_list:
-        count += 1 if result_dict["done"] else 0
-    return count / len(result_dict_list)
+    df = to_frame(result_dict_list)
+    return float(flag(df, "done").mean()) if len(df) else 0.0
+
 
 def calculate_latency(result_dict_list):
-    lantency = [result_dict["time"] for result_dict in result_dict_list if result_dict["done"] != 0]
-    if "rec_time" in result_dict_list[0]:
-        rec_latency = [result_dict["rec_time"] for result_dict in result_dict_list if result_dict["done"] != 0]
-        return sum(lantency) / len(lantency), sum(rec_latency) / len(rec_latency)
-    else:
-        return sum(lantency) / len(lantency)
+    """Mean latency of the finished queries, and mean recommendation latency too when any row has rec_time."""
+
+    df = to_frame(result_dict_list)
+    done = df[flag(df, "done")]
+    latency = column(done, "time")
+    mean_latency = float(latency.mean()) if len(latency) else 0.0
+    if "rec_time" in df and df["rec_time"].notna().any():
+        rec_latency = column(done, "rec_time")
+        return mean_latency, float(rec_latency.mean()) if len(rec_latency) else 0.0
+    return mean_latency
+
 
 def calculate_topk(result_dict_list, k=3):
-    count = 0
-    for result_dict in result_dict_list:
-        count += 1 if result_dict[f"top@{k}"] else 0
-    return count / len(result_dict_list)
\ No newline at end of file
+    """Share of queries whose picked recommendation is within the first k. Uses the top@k column when recorded,
+    otherwise rec_picked (1-based, 0 when no option fit)."""
+
+    df = to_frame(result_dict_list)
+    if not len(df):
+        return 0.0
+    if f"top@{k}" in df:
+        return float(flag(df, f"top@{k}").mean())
+    picked = pd.to_numeric(df.get("rec_picked", pd.Series(0, index=df.index)), errors="coerce").fillna(0).to_numpy()
+    return float(((picked >= 1) & (picked <= k)).mean())
+
+
+def calculate_percentiles(result_dict_list, key="time", percentiles=(50, 90, 99)):
+    values = column(to_frame(result_dict_list), key)
+    if not len(values):
+        return {f"p{p}": None for p in percentiles}
+    return {f"p{p}": float(value) for p, value in zip(percentiles, np.percentile(values, percentiles, method="nearest"))}
+
+
+def bootstrap_ci(values, statistic=np.mean, n_boot=2000, confidence=0.95, seed=0):
+    """Percentile bootstrap confidence interval of statistic, resampling all n_boot samples at once.
+    statistic must take an axis argument, such as np.mean or np.median."""
+
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return (None, None)
+    rng = np.random.default_rng(seed)
+    samples = statistic(values[rng.integers(0, len(values), size=(n_boot, len(values)))], axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return (float(low), float(high))
+
+
+def summarize_latency(result_dict_list, key="time", percentiles=(50, 90, 99), n_boot=2000, confidence=0.95, seed=0):
+    """Returns count, mean, percentiles and the bootstrap CI of the mean and the median of a latency column."""
+
+    values = column(to_frame(result_dict_list), key)
+    summary = {"count": int(len(values)), "mean": float(values.mean()) if len(values) else None}
+    summary.update(calculate_percentiles(pd.DataFrame({key: values}), key=key, percentiles=percentiles))
+    summary["mean_ci"] = bootstrap_ci(values, np.mean, n_boot, confidence, seed)
+    summary["p50_ci"] = bootstrap_ci(values, np.median, n_boot, confidence, seed)
+    return summary
+
+
+def calculate_cache_hit_ratio(result_dict_list):
+    """Share of vectorstore queries answered from the semantic cache, from the cache_hits and cache_queries columns."""
+
+    df = to_frame(result_dict_list)
+    queries = column(df, "cache_queries").sum()
+    return float(column(df, "cache_hits").sum() / queries) if queries else None
+
+
+CALL_NAME = re.compile(r"([A-Za-z_]\w*)\(")
+
+def tool_names(df):
+    """The tool of each row, from the tool column or else the function name of the picked recommendation."""
+
+    if "tool" in df:
+        return df["tool"].fillna("none").astype(str)
+    picked = pd.to_numeric(df.get("rec_picked", pd.Series(0, index=df.index)), errors="coerce").fillna(0).astype(int)
+    names = pd.Series("none", index=df.index)
+    for k in range(1, 4):
+        if f"rec_list_{k}" in df:
+            called = df[f"rec_list_{k}"].astype(str).str.extract(CALL_NAME, expand=False)
+            names = names.mask((picked == k) & called.notna(), called)
+    return names
+
+
+def calculate_failure_rate(result_dict_list, by="tool"):
+    """Returns count and failure rate (not done) per tool, or per any other column given in by."""
+
+    df = to_frame(result_dict_list)
+    groups = tool_names(df) if by == "tool" else df[by].fillna("none")
+    failed = pd.Series(~flag(df, "done"), index=df.index)
+    return failed.groupby(groups).agg(count="size", failure_rate="mean").sort_values("failure_rate", ascending=False)
+
+
+def breakdown(result_dict_list, by="label", key="time", percentiles=(50, 90)):
+    """Returns count, accuracy, top@1, top@3, mean and percentile latency, and failure rate per value of by."""
+
+    df = to_frame(result_dict_list).copy()
+    df["_group"] = tool_names(df) if by == "tool" else df[by].fillna("none") if by in df else "all"
+    df["_done"] = flag(df, "done")
+    picked = pd.to_numeric(df.get("rec_picked", pd.Series(0, index=df.index)), errors="coerce").fillna(0)
+    df["_top1"] = picked == 1
+    df["_top3"] = flag(df, "top@3") if "top@3" in df else (picked >= 1) & (picked <= 3)
+    df["_latency"] = pd.to_numeric(df[key], errors="coerce") if key in df else np.nan
+
+    grouped = df.groupby("_group")
+    table = pd.DataFrame({"count": grouped.size(),
+                          "accuracy": grouped["_done"].mean(),
+                          "top@1": grouped["_top1"].mean(),
+                          "top@3": grouped["_top3"].mean(),
+                          "mean": grouped["_latency"].mean()})
+    for p in percentiles:
+        table[f"p{p}"] = grouped["_latency"].quantile(p / 100)
+    table["failure_rate"] = 1 - table["accuracy"]
+    table.index.name = by
+    return table
+
+
+def diff_results(baseline, candidate, key="time", by=None, n_boot=2000, confidence=0.95, min_effect=0.05, seed=0):
+    """Compares the latency of two result files, overall and per value of by.
+    The difference of means gets a bootstrap confidence interval, and a group is flagged as a regression
+    when the whole interval is above 0 and the mean grew by more than min_effect (relative)."""
+
+    base, cand = to_frame(baseline), to_frame(candidate)
+    groups = [("all", base, cand)]
+    if by is not None:
+        base_groups = tool_names(base) if by == "tool" else base[by].fillna("none")
+        cand_groups = tool_names(cand) if by == "tool" else cand[by].fillna("none")
+        for value in sorted(set(base_groups) & set(cand_groups)):
+            groups.append((value, base[base_groups == value], cand[cand_groups == value]))
+
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    rows = []
+    for group, base_df, cand_df in groups:
+        x, y = column(base_df, key), column(cand_df, key)
+        row = {"group": group, "n_baseline": len(x), "n_candidate": len(y),
+               "mean_baseline": float(x.mean()) if len(x) else None, "mean_candidate": float(y.mean()) if len(y) else None,
+               "delta": None, "ci_low": None, "ci_high": None, "regression": False}
+        if len(x) >= 2 and len(y) >= 2:
+            deltas = (y[rng.integers(0, len(y), size=(n_boot, len(y)))].mean(axis=1)
+                      - x[rng.integers(0, len(x), size=(n_boot, len(x)))].mean(axis=1))
+            low, high = np.quantile(deltas, [alpha, 1 - alpha])
+            row.update({"delta": float(y.mean() - x.mean()), "ci_low": float(low), "ci_high": float(high)})
+            row["regression"] = bool(low > 0 and y.mean() > x.mean() * (1 + min_effect))
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("group")
+
+
+def main(args):
+    df = to_frame(args.results)
+    summary = {"count": len(df),
+               "accuracy": calculate_accuracy(df),
+               "top@1": calculate_topk(df, k=1),
+               "top@3": calculate_topk(df, k=3),
+               "cache_hit_ratio": calculate_cache_hit_ratio(df),
+               args.key: summarize_latency(df, key=args.key)}
+    print(json.dumps(summary, indent=2, default=str))
+    print(breakdown(df, by=args.by, key=args.key).to_string())
+    print(calculate_failure_rate(df).to_string())
+
+    if args.diff:
+        diff = diff_results(df, args.diff, key=args.key, by=args.by, min_effect=args.min_effect)
+        print(diff.to_string())
+        return 1 if diff["regression"].any() else 0
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Metrics of benchmark result files, and latency diff of two of them.')
+    parser.add_argument('results', type=str) # .jsonl / .xlsx / .csv, the baseline with --diff
+    parser.add_argument('--diff', type=str, default=None) # candidate result file
+    parser.add_argument('--by', type=str, default='label') # label / tool / any column
+    parser.add_argument('--key', type=str, default='time')
+    parser.add_argument('--min_effect', type=float, default=0.05)
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from selenium import webdriver
+
+from fake_kapwing import FIXTURES_DIR, FixtureServer, create_fake_driver, count_commands
+import utils.tools as tools
+from utils.session import DriverSession, use_session
+from utils.tracing import instrument_driver
+from utils.waits import wait_records, get_wait_stats
+
+
+"""Arguments of every tool function on the fixture page. Setup tools run first in the same session without being measured,
+e.g. the caption tools need the tabs add_caption keeps."""
+
+CAPTION = [("add_caption", {"caption_text": "Hello"})]
+CLIP = os.path.abspath("data/assets/clips/bells-logo-140886.mp3")
+IMAGE = os.path.abspath("data/assets/clips/wallhaven-4vdl3m.jpg")
+
+TOOL_CASES = {
+    "create_new_project": ({"name": "My Vlog"}, []),
+    "open_project": ({"name": "Caption Test Project"}, []),
+    "upload_video": ({"local_dir": CLIP}, []),
+    "add_caption": ({"caption_text": "Coffee Time"}, []),
+    "change_caption_text": ({"caption_text": "Happy Life", "timestamp": 2}, []),
+    "change_caption_time": ({"start_time": 3, "end_time": 12}, CAPTION),
+    "change_caption_style": ({"style_name": "italic"}, []),
+    "change_caption_color": ({"color": "FF0000"}, []),
+    "change_caption_font_size": ({"font_size": 64}, CAPTION),
+    "change_caption_font_type": ({"font": "Times New Roman"}, CAPTION),
+    "change_caption_outline_color": ({"color": "FF0000"}, []),
+    "change_caption_background_color": ({"color": "0000FF"}, []),
+    "change_caption_opacity": ({"opacity": 70}, CAPTION),
+    "change_caption_position": ({"x_pos": 6, "y_pos": -4}, CAPTION),
+    "delete_row": ({"layer_id": 2}, []),
+    "add_row_above": ({"layer_id": 2}, []),
+    "detach_audio": ({}, []),
+    "show_layer_info": ({}, []),
+    "delete_layer": ({"layer_id": 2}, []),
+    "trim_video": ({"start_timestamp": 2.5, "end_timestamp": 6.5}, []),
+    "add_audio": ({"audio_path": CLIP, "timestamp": 4}, []),
+    "change_volume": ({"volume": 80}, []),
+    "add_image": ({"image_location": IMAGE, "start_timestamp": 2, "end_timestamp": 6}, []),
+    "zoom_image": ({"zoom_percentage": 120}, []),
+    "add_transition": ({"timestamp": 5, "transition": "drop", "speed": "fast"}, []),
+    "export_video": ({"video_end_time": 8}, []),
+    "add_text": ({"text": "Hello"}, []),
+    "change_text_color": ({"color": "red"}, []),
+    "change_specific_text_color": ({"text": "Sample text", "color": "red"}, []),
+    "change_text_content": ({"text": "Hello"}, []),
+    "change_specific_text_content": ({"text1": "Sample text", "text2": "Hello"}, []),
+    "adjust_text_start_end_time": ({"time1": 1, "time2": 4}, []),
+    "adjust_specific_text_start_end_time": ({"text": "Sample text", "time1": 1, "time2": 4}, []),
+    "adjust_text_duration": ({"time": 3}, []),
+    "adjust_specific_text_duration": ({"text": "Sample text", "time": 3}, []),
+    "add_text_style": ({"style_name": "bold"}, []),
+    "remove_text_style": ({"style_name": "bold"}, []),
+    "add_specific_text_style": ({"style_name": "bold", "text": "Sample text"}, []),
+    "remove_specific_text_style": ({"style_name": "bold", "text": "Sample text"}, []),
+    "adjust_text_size": ({"size": 64}, []),
+    "adjust_specific_text_size": ({"text": "Sample text", "size": 64}, []),
+    "increase_size": ({}, []),
+    "reduce_size": ({}, []),
+    "add_sound_effect": ({"keywords": "bell"}, []),
+}
+SKIPPED = {
+    "caption_spelling_correction": "calls the external spelling API and the clipboard",
+}
+BASELINE = os.path.join(FIXTURES_DIR, "tool_baseline.json")
+
+
+class ToolBenchmark:
+    """Runs each tool function on a fresh session of the fixture page and measures its WebDriver round trips,
+    commands, wall time and wait timeouts. backend is 'fake' (in-process FakeExecutor) or 'chrome' (headless Chrome).
+    With latency, every fake command sleeps that long, like a round trip to a remote browser."""
+
+    def __init__(self, url, backend="fake", latency=0.0, repeat=3):
+        self.url = url
+        self.backend = backend
+        self.latency = latency
+        self.repeat = repeat
+
+    def new_session(self):
+        if self.backend == "fake":
+            driver = create_fake_driver(self.url, latency=self.latency)
+            counter = driver.command_executor.commands
+        else:
+            options = webdriver.ChromeOptions()
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+            driver = webdriver.Chrome(options=options)
+            driver.get(self.url)
+            counter = count_commands(driver)
+
+        session = DriverSession(headless=True)
+        session._driver = instrument_driver(driver)
+        return session, counter
+
+    def run_once(self, name):
+        kwargs, setup = TOOL_CASES[name]
+        session, counter = self.new_session()
+        result = {"error": None}
+        with use_session(session):
+            for setup_name, setup_kwargs in setup:
+                getattr(tools, setup_name)(**setup_kwargs)
+
+            counter.clear()
+            wait_records.clear()
+            start_time = time.perf_counter()
+            try:
+                getattr(tools, name)(**kwargs)
+            except Exception as e:
+                result["error"] = repr(e)
+            result["seconds"] = time.perf_counter() - start_time
+            result["commands"] = dict(counter)
+            result["round_trips"] = sum(counter.values())
+            result["timeouts"] = sum(stat["timeouts"] for stat in get_wait_stats().values())
+        session.quit()
+        return result
+
+    def run_tool(self, name):
+        runs = [self.run_once(name) for _ in range(self.repeat)]
+        return {"round_trips": max(run["round_trips"] for run in runs),
+                "seconds": statistics.median(run["seconds"] for run in runs),
+                "commands": runs[-1]["commands"],
+                "timeouts": max(run["timeouts"] for run in runs),
+                "error": next((run["error"] for run in runs if run["error"]), None)}
+
+    def run(self, names=None):
+        return {name: self.run_tool(name) for name in names or TOOL_CASES}
+
+
+def load_baseline(filepath=BASELINE):
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(results, filepath=BASELINE):
+    baseline = {name: {"round_trips": result["round_trips"], "seconds": round(result["seconds"], 4)}
+                for name, result in results.items() if result["error"] is None}
+    with open(filepath, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return baseline
+
+
+def find_regressions(results, baseline, tolerance=0.5, slack=0.05):
+    """Returns the tools that newly fail, hit a wait timeout, make more round trips than the baseline,
+    or take longer than baseline seconds * (1 + tolerance) + slack."""
+
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if result["error"] is not None:
+            regressions.append((name, f"failed with {result['error']}"))
+        elif result["timeouts"]:
+            regressions.append((name, f"{result['timeouts']} wait timeouts"))
+        elif base is None:
+            continue
+        elif result["round_trips"] > base["round_trips"]:
+            regressions.append((name, f"{result['round_trips']} round trips, baseline {base['round_trips']}"))
+        elif result["seconds"] > base["seconds"] * (1 + tolerance) + slack:
+            regressions.append((name, f"{result['seconds']:.3f}s, baseline {base['seconds']:.3f}s"))
+    return regressions
+
+
+def main(args):
+    names = args.tools.split(",") if args.tools else list(TOOL_CASES)
+    with FixtureServer() as server:
+        benchmark = ToolBenchmark(server.url(), backend=args.backend, latency=args.latency, repeat=args.repeat)
+        results = benchmark.run(names)
+
+    print(f"{'TOOL':<40}{'ROUND TRIPS':>12}{'SECONDS':>10}  ERROR")
+    for name, result in results.items():
+        print(f"{name:<40}{result['round_trips']:>12}{result['seconds']:>10.3f}  {result['error'] or ''}")
+    print(f"TOTAL ROUND TRIPS {sum(result['round_trips'] for result in results.values())}, SKIPPED {list(SKIPPED)}.")
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"BASELINE SAVED TO {args.baseline}.")
+        return 0
+
+    regressions = find_regressions(results, load_baseline(args.baseline), tolerance=args.tolerance)
+    for name, reason in regressions:
+        print(f"REGRESSION {name}: {reason}.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Round trips and wall time of every tool function on the Kapwing fixture page.')
+    parser.add_argument('--backend', type=str, default='fake') # fake / chrome
+    parser.add_argument('--latency', type=float, default=0.0) # seconds per fake command
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tools', type=str, default=None) # comma separated, all by default
+    parser.add_argument('--baseline', type=str, default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--update_baseline', action='store_true')
+    args = parser.parse_args()
+
+    sys.exit(main(args))
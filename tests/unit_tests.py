@@ -9,14 +9,17 @@ from torch.utils.data import Dataset, DataLoader
 from metrics import calculate_accuracy, calculate_latency, calculate_topk
 from agents.selenium_agent import GPTScriptAgent, MemoryGPTScriptAgent, RecommendAgent, SimpleScriptAgent, FastAgent
 from utils.tools import close_driver
+from utils.registry import get_config
+from utils.replay import recorder, configure_replay
+from benchmark import ScriptedOracle, parse_latency
 
 
 class QueryDataset(Dataset):
     def __init__(self, xlsx_file, start_pos):
         self.start_pos = start_pos
         self.df = pd.read_excel(xlsx_file)
-        self.query = self.df['Query'][self.start_pos:1]
-        self.url = self.df['Link'][self.start_pos:1]
+        self.query = self.df['Query'][self.start_pos:]
+        self.url = self.df['Link'][self.start_pos:]
         # self.script = self.df['Script'][start_pos:]
         
     def __len__(self):
@@ -28,7 +31,7 @@ class QueryDataset(Dataset):
         # script = self.script[idx]
         return query, url
 
-def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_type, start_pos, use_chromedriver):
+def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_type, start_pos, use_chromedriver, input_fn=input):
     logger = logging.getLogger('AgentLogger')
     logger.setLevel(logging.DEBUG)
     
@@ -57,7 +60,7 @@ def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_ty
     
     logger.info("INITIALIZING AGENT.")
     if memory:
-        rec_agent = RecommendAgent(vectorstore_type=vectorstore_type)
+        rec_agent = RecommendAgent(vectorstore_type=vectorstore_type, input_fn=input_fn)
         agent = MemoryGPTScriptAgent(model_name=model_name, 
                                      temperature=temperature,
                                      vectorstore_type="faiss",
@@ -68,10 +71,11 @@ def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_ty
             agent = FastAgent(model_name=model_name, 
                                 temperature=temperature,
                                 vectorstore_type=vectorstore_type,
-                                use_chromedriver=use_chromedriver
+                                use_chromedriver=use_chromedriver,
+                                input_fn=input_fn
                             )
         else:
-            rec_agent = RecommendAgent(vectorstore_type=vectorstore_type)
+            rec_agent = RecommendAgent(vectorstore_type=vectorstore_type, input_fn=input_fn)
             agent = SimpleScriptAgent(model_name=model_name, 
                                       temperature=temperature,
                                       vectorstore_type="faiss",
@@ -140,6 +144,8 @@ def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_ty
             continue
     
     mean_acc = calculate_accuracy(result_dict_list)
+    if recorder.mode is not None:
+        logger.info(f"REPLAY CALLS ARE {recorder.get_stats()}.")
 
     if fast:
         mean_latency = calculate_latency(result_dict_list)
@@ -161,6 +167,14 @@ def evaluate_dataset(model_name, temperature, seed, memory, fast, vectorstore_ty
 
 
 def test(args):
+    # Record once against live OpenAI and Kapwing, then replay offline. Answers come from a scripted oracle in both,
+    # so a replayed run makes the same calls, and calls missed or repeated show added round trips.
+    input_fn = input
+    if args.replay_mode is not None:
+        configure_replay({**get_config(), "REPLAY_MODE": args.replay_mode, "REPLAY_FILE": args.replay_file,
+                          "REPLAY_LATENCY": parse_latency(args.replay_latency)})
+        input_fn = ScriptedOracle()
+
     acc, latency, rec_latency, mean_top3 = evaluate_dataset(model_name=args.model_name, 
                                                             temperature=args.temperature,
                                                             seed=args.seed,
@@ -168,7 +182,8 @@ def test(args):
                                                             fast=args.fast,
                                                             vectorstore_type=args.vectorstore_type,
                                                             start_pos=args.start_pos,
-                                                            use_chromedriver=args.use_chromedriver
+                                                            use_chromedriver=args.use_chromedriver,
+                                                            input_fn=input_fn
                                                         )
     close_driver()
     print('FINISH.')
@@ -183,6 +198,9 @@ if __name__ == '__main__':
     parser.add_argument('--vectorstore_type', type=str, default='gpt-index')
     parser.add_argument('--start_pos', type=int, default=0) # TODO: Use only shuffle=False
     parser.add_argument('--use_chromedriver', type=bool, default=True)
+    parser.add_argument('--replay_mode', type=str, default=None) # record / replay
+    parser.add_argument('--replay_file', type=str, default='logs/recording.jsonl')
+    parser.add_argument('--replay_latency', type=str, default=None) # e.g. '"recorded"' or '{"llm": ["lognormvariate", 0, 0.5]}'
     args = parser.parse_args()
 
     test(args)
@@ -0,0 +1,147 @@
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.action_chains import ActionChains
+
+from utils.session import current_session
+
+
+PLAN_SCRIPT = """
+var ops = arguments[0], done = arguments[arguments.length - 1];
+var results = [], i = 0, started = Date.now();
+
+function find(op) {
+    if (op.css) { return document.querySelectorAll(op.css)[op.index] || null; }
+    return document.evaluate(op.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotItem(op.index);
+}
+
+function press(el) {
+    ['pointerdown', 'mousedown', 'pointerup', 'mouseup'].forEach(function (type) {
+        var Event = type.indexOf('pointer') === 0 && window.PointerEvent ? PointerEvent : MouseEvent;
+        el.dispatchEvent(new Event(type, {bubbles: true, cancelable: true, view: window}));
+    });
+    el.click();
+}
+
+function normalize(value) {
+    return String(value).replace(/^#/, '').toLowerCase();
+}
+
+function step() {
+    while (i < ops.length) {
+        var op = ops[i], el = find(op);
+        if (!el || el.disabled || (op.op === 'value' && normalize(el.value) !== normalize(op.value))) {
+            if (Date.now() - started > op.timeout) {
+                done({error: (el ? 'Value not set: ' : 'Element not found: ') + (op.css || op.xpath), results: results});
+                return;
+            }
+            setTimeout(step, 50);
+            return;
+        }
+        results.push(op.op === 'read' ? (el.tagName === 'INPUT' ? el.value : el.innerText) : el);
+        i++;
+        started = Date.now();
+        if (op.op === 'click') {
+            press(el);
+            setTimeout(step, 0); // let the page re-render before the next element is looked up
+            return;
+        }
+    }
+    done({results: results});
+}
+step();
+"""
+
+
+class ActionPlan:
+    """Steps of a tool function compiled into as few WebDriver round trips as possible.
+    Consecutive clicks and reads run in one script call, elements are located once per plan,
+    and only typing or native clicks go through real input events.
+    For example, to click a button and type into a box: ActionPlan().click('.button').type('.box', 'hello').run()"""
+
+    def __init__(self, timeout=3):
+        self.timeout = int(timeout * 1000)
+        self.steps = []
+
+    def add(self, op, css=None, xpath=None, index=0, **kwargs):
+        self.steps.append(dict(op=op, css=css, xpath=xpath, index=index, **kwargs))
+        return self
+
+    def click(self, css, index=0, native=False):
+        return self.add("native_click" if native else "click", css=css, index=index)
+
+    def click_text(self, text, index=0):
+        return self.add("click", xpath=f'//*[contains(text(), "{text}")]', index=index)
+
+    def click_xpath(self, xpath, index=0, timeout=None):
+        return self.add("click", xpath=xpath, index=index, timeout=int(timeout * 1000) if timeout else None)
+
+    def read(self, css, name, index=0):
+        """Reads the text of the element into the result dict under name."""
+        return self.add("read", css=css, index=index, name=name)
+
+    def wait_value(self, css, value, index=0):
+        """Waits until the input holds value, ignoring case and a leading #."""
+        return self.add("value", css=css, index=index, value=value)
+
+    def clear(self, css, index=0):
+        return self.add("clear", css=css, index=index)
+
+    def type(self, css, *keys, index=0):
+        return self.add("type", css=css, index=index, keys=keys)
+
+    def run(self):
+        """Runs the plan and returns the dict of read values."""
+
+        driver = current_session().driver
+        elements, values, batch = {}, {}, []
+
+        def key(step):
+            return (step["css"], step["xpath"], step["index"])
+
+        def flush():
+            if not batch:
+                return
+            ops = [{"op": step["op"], "css": step["css"], "xpath": step["xpath"], "index": step["index"],
+                    "value": step.get("value"), "timeout": step.get("timeout") or self.timeout} for step in batch]
+            res = driver.execute_async_script(PLAN_SCRIPT, ops)
+            for step, value in zip(batch, res["results"]):
+                if step["op"] == "read":
+                    values[step["name"]] = value
+                else:
+                    elements[key(step)] = value
+            if "error" in res:
+                raise NoSuchElementException(res["error"])
+            del batch[:]
+
+        def locate(step):
+            if key(step) not in elements:
+                batch.append(dict(step, op="locate"))
+                flush()
+            return elements[key(step)]
+
+        def relocate(step):
+            by, value = (By.CSS_SELECTOR, step["css"]) if step["css"] else (By.XPATH, step["xpath"])
+            elements[key(step)] = driver.find_elements(by, value)[step["index"]]
+            return elements[key(step)]
+
+        for step in self.steps:
+            if step["op"] in ["click", "read", "value"]:
+                batch.append(step)
+                continue
+
+            flush()
+            for attempt in range(2):
+                element = locate(step) if attempt == 0 else relocate(step)
+                try:
+                    if step["op"] == "type":
+                        element.send_keys(*step["keys"])
+                    elif step["op"] == "clear":
+                        element.clear()
+                    elif step["op"] == "native_click":
+                        ActionChains(driver).move_to_element(element).click().perform()
+                    break
+                except StaleElementReferenceException:
+                    if attempt == 1:
+                        raise
+        flush()
+        return values
@@ -0,0 +1,118 @@
+import asyncio, contextvars, functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.session import current_session, use_session
+from utils.registry import get_config, get_resource
+
+
+"""Async helpers. LLM, embedding and vectorstore calls are blocking, so they run on a shared thread pool,
+while the selenium calls of each driver session run in order on a browser worker."""
+
+def get_executor():
+    return get_resource(("executor", "blocking"),
+                        lambda: ThreadPoolExecutor(max_workers=get_config().get('ASYNC_WORKERS', 8), thread_name_prefix="blocking"))
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking call on the shared thread pool, keeping the current driver session."""
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+class Prefetcher:
+    """Blocking calls started ahead of an agent, e.g. the retrievals of the query while its first LLM call runs.
+    A tool asking for the same call with the same input gets the prefetched result, any other input is run then.
+    For example:
+        prefetcher.start(vec.run, query)
+        tool = Tool(name="retriever", func=vec.run, coroutine=lambda q: prefetcher.run(vec.run, q), description=...)
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def start(self, func, arg):
+        if (func, arg) not in self.tasks:
+            self.tasks[(func, arg)] = asyncio.ensure_future(run_blocking(func, arg))
+
+    async def result(self, func, arg):
+        """Waits for the call and keeps its result for the tool."""
+
+        self.start(func, arg)
+        return await asyncio.shield(self.tasks[(func, arg)])
+
+    async def run(self, func, arg):
+        task = self.tasks.pop((func, arg), None)
+        if task is None:
+            return await run_blocking(func, arg)
+        return await task
+
+    def clear(self):
+        """Drops the results no tool asked for."""
+
+        tasks, self.tasks = self.tasks, {}
+        for task in tasks.values():
+            task.cancel()
+
+
+class BrowserWorker:
+    """Runs the selenium calls of one driver session in order, on its own task and thread.
+    While the browser works through the queue, LLM and retrieval stages keep running on the event loop."""
+
+    def __init__(self, session=None):
+        self.session = session or current_session()
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser")
+        self.task = self.loop.create_task(self.work())
+
+    async def work(self):
+        while True:
+            func, args, kwargs, future = await self.queue.get()
+            try:
+                if not future.done():
+                    res = await self.loop.run_in_executor(self.executor, functools.partial(self.call, func, args, kwargs))
+                    if not future.done():
+                        future.set_result(res)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def call(self, func, args, kwargs):
+        with use_session(self.session):
+            return func(*args, **kwargs)
+
+    def put(self, func, *args, **kwargs):
+        future = self.loop.create_future()
+        self.queue.put_nowait((func, args, kwargs, future))
+        return future
+
+    async def submit(self, func, *args, **kwargs):
+        """Queues func and waits for its result."""
+        return await self.put(func, *args, **kwargs)
+
+    def prefetch(self, func, *args, **kwargs):
+        """Queues func without waiting for it, e.g. prefetch(get_layers) to read the next page state ahead of time.
+        Errors of prefetches are dropped."""
+
+        future = self.put(func, *args, **kwargs)
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def stop(self):
+        await self.queue.join()
+        self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+
+def browser_worker(session=None):
+    """Returns the browser worker of the session (current one by default) for the running event loop."""
+
+    session = session or current_session()
+    worker = session.cache.get("browser_worker")
+    if worker is None or worker.loop is not asyncio.get_running_loop() or worker.task.done():
+        worker = session.cache["browser_worker"] = BrowserWorker(session)
+    return worker
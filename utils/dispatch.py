@@ -0,0 +1,141 @@
+import ast, functools, inspect, re, threading, time
+from collections import deque
+
+import utils.tools as tools
+from utils.registry import get_resource
+
+
+PLACEHOLDER = re.compile(r'"<NULL>"|\'<NULL>\'|<NULL>')
+CALL = re.compile(r"[A-Za-z_]\w*\(.*\)")
+
+
+class ToolError(ValueError):
+    """Raised when a tool call names an unknown function or its arguments do not match the signature."""
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_call(call):
+    """Parses a call string such as 'change_text_color(color="<NULL>")' into (function, ((arg, value), ...)).
+    Text around the call, such as list numbering, is dropped. Positional arguments come back as (None, value).
+    <NULL> and empty string placeholders become None."""
+
+    match = CALL.search(call)
+    try:
+        node = ast.parse(PLACEHOLDER.sub("None", match.group(0) if match else call.strip()), mode="eval").body
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+            raise ToolError(f"Not a function call: {call}")
+        args = [(None, ast.literal_eval(arg)) for arg in node.args]
+        args += [(kw.arg, ast.literal_eval(kw.value)) for kw in node.keywords]
+    except (SyntaxError, ValueError) as e:
+        if isinstance(e, ToolError):
+            raise
+        raise ToolError(f"Can not parse {call}: {e}")
+    return node.func.id, tuple((name, None if value == "" else value) for name, value in args)
+
+
+class ToolDispatcher:
+    """Calls the selenium functions directly, from a table built from their signatures.
+    Arguments are checked and coerced against the annotations (text: str, time1: int) before the call,
+    and every call is kept in history for batching and replay."""
+
+    COERCE = {str: str, int: lambda value: int(float(value)), float: float,
+              bool: lambda value: value if isinstance(value, bool) else str(value).lower() in ["true", "1", "yes"]}
+
+    def __init__(self, namespace=None, names=None, max_history=1000):
+        namespace = vars(tools) if namespace is None else namespace
+        self.table = {}
+        for name in names or tools.TOOL_FUNCTIONS:
+            func = namespace[name]
+            params = [(param.name, None if param.annotation is param.empty else param.annotation)
+                      for param in inspect.signature(func).parameters.values()]
+            self.table[name] = {"func": func, "params": params}
+        self.history = deque(maxlen=max_history)
+        self.lock = threading.Lock()
+
+    def parse(self, call):
+        """Returns (function, {arg: value}) of a call string, positional arguments mapped to their names.
+        Values of unfilled placeholders are None."""
+
+        name, args = parse_call(call)
+        if name not in self.table:
+            raise ToolError(f"Unknown function: {name}")
+
+        params = [param for param, _ in self.table[name]["params"]]
+        positional = [value for arg, value in args if arg is None]
+        if len(positional) > len(params):
+            raise ToolError(f"{name} takes {len(params)} arguments but {len(positional)} were given.")
+        kwargs = dict(zip(params, positional))
+        for arg, value in args:
+            if arg is not None:
+                if arg not in params:
+                    raise ToolError(f"{name} has no argument {arg}.")
+                kwargs[arg] = value
+        return name, kwargs
+
+    def missing(self, name, kwargs):
+        """Returns the [(arg, type)] of name not filled in kwargs."""
+        return [(param, annotation) for param, annotation in self.table[name]["params"] if kwargs.get(param) is None]
+
+    def validate(self, name, kwargs):
+        """Returns kwargs coerced to the annotated types, or raises ToolError."""
+
+        if name not in self.table:
+            raise ToolError(f"Unknown function: {name}")
+        missing = self.missing(name, kwargs)
+        if missing:
+            raise ToolError(f"{name} misses arguments: {', '.join(param for param, _ in missing)}.")
+
+        coerced = {}
+        for param, annotation in self.table[name]["params"]:
+            value = kwargs[param]
+            try:
+                coerced[param] = self.COERCE[annotation](value) if annotation in self.COERCE else value
+            except (TypeError, ValueError):
+                raise ToolError(f"{name} argument {param} should be {annotation.__name__}, got {value!r}.")
+        return coerced
+
+    def format(self, name, kwargs):
+        return f"{name}({', '.join(f'{param}={value!r}' for param, value in kwargs.items())})"
+
+    def call(self, name, kwargs, dry_run=False):
+        """Validates and calls the function. With dry_run the call is only printed. Returns the history entry."""
+
+        kwargs = self.validate(name, kwargs)
+        entry = {"function": name, "args": kwargs, "result": None, "seconds": 0.0, "error": None}
+        if dry_run:
+            print(self.format(name, kwargs))
+            return entry
+
+        start_time = time.time()
+        try:
+            entry["result"] = self.table[name]["func"](**kwargs)
+        except Exception as e:
+            entry["error"] = e
+        entry["seconds"] = time.time() - start_time
+        with self.lock:
+            self.history.append(entry)
+        if entry["error"] is not None:
+            raise entry["error"]
+        return entry
+
+    def run(self, call, dry_run=False):
+        """Parses and calls a call string such as 'change_text_color(color="red")'."""
+        return self.call(*self.parse(call), dry_run=dry_run)
+
+    def batch(self, calls, dry_run=False):
+        """Validates all (function, kwargs) calls first and then runs them in order, stopping at the first error."""
+
+        calls = [(name, self.validate(name, kwargs)) for name, kwargs in calls]
+        return [self.call(name, kwargs, dry_run=dry_run) for name, kwargs in calls]
+
+    def replay(self, entries=None, dry_run=False):
+        """Runs the successful calls of entries (the whole history by default) again."""
+
+        with self.lock:
+            entries = list(self.history if entries is None else entries)
+        return self.batch([(entry["function"], entry["args"]) for entry in entries if entry["error"] is None], dry_run=dry_run)
+
+
+def get_dispatcher():
+    """Returns the tool dispatcher shared by the agents."""
+    return get_resource(("dispatcher",), ToolDispatcher)
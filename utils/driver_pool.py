@@ -0,0 +1,160 @@
+import os, shutil, tempfile, threading, time
+from contextlib import contextmanager
+from selenium.common.exceptions import WebDriverException
+
+from utils.session import DriverSession, load_config, use_session
+
+
+class DriverPool:
+    """Pool of Chrome sessions, each with its own copy of the logged in user data dir.
+    For example, to run a tool function on a leased browser:
+        pool = DriverPool(size=4)
+        with pool.lease():
+            change_text_color("red")
+    """
+
+    def __init__(self, size=2,
+                       user_data_dir=None,
+                       max_uses=50,
+                       max_waiting=8,
+                       timeout=60,
+                       headless=None):
+
+        self.size = size
+        self.user_data_dir = user_data_dir or load_config()['USER_DATA_DIR']
+        self.max_uses = max_uses
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.headless = headless
+
+        self.profiles_dir = tempfile.mkdtemp(prefix="permian_profiles_")
+        self.condition = threading.Condition()
+        self.idle = []
+        self.uses = {}
+        self.waiting = 0
+        self.created = 0
+        self.next_idx = 0
+        self.closed = False
+
+    def copy_profile(self, idx):
+        profile_dir = os.path.join(self.profiles_dir, f"session_{idx}")
+        if not os.path.exists(profile_dir):
+            ignore = shutil.ignore_patterns("Singleton*", "*.lock", "Cache", "Code Cache", "GPUCache")
+            if os.path.exists(self.user_data_dir):
+                shutil.copytree(self.user_data_dir, profile_dir, ignore=ignore)
+            else:
+                os.makedirs(profile_dir)
+        return profile_dir
+
+    def new_session(self, idx):
+        """Builds the session of slot idx. Copying the profile is slow, so it runs outside the lock."""
+
+        session = DriverSession(user_data_dir=self.copy_profile(idx), headless=self.headless)
+        session.pool_idx = idx
+        return session
+
+    def is_healthy(self, session):
+        if not session.started:
+            return True
+        try:
+            session.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def recycle(self, session):
+        try:
+            session.quit()
+        except WebDriverException:
+            pass
+        session = self.new_session(session.pool_idx)
+        with self.condition:
+            self.uses[session.pool_idx] = 0
+        return session
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Driver pool is closed.")
+            if not self.idle and self.created >= self.size and self.waiting >= self.max_waiting:
+                raise RuntimeError(f"Driver pool is busy, {self.waiting} requests are already waiting.")
+
+            self.waiting += 1
+            try:
+                while not self.idle and self.created >= self.size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser session available after {timeout} seconds.")
+                    self.condition.wait(remaining)
+
+                session, idx = None, None
+                if self.idle:
+                    session = self.idle.pop()
+                else:
+                    # Reserve the slot, the session is built after releasing the lock.
+                    idx = self.next_idx
+                    self.next_idx += 1
+                    self.created += 1
+            finally:
+                self.waiting -= 1
+
+        if session is None:
+            try:
+                session = self.new_session(idx)
+            except BaseException:
+                with self.condition:
+                    self.created -= 1
+                    self.condition.notify()
+                raise
+            with self.condition:
+                self.uses[idx] = 0
+
+        with self.condition:
+            worn_out = self.uses[session.pool_idx] >= self.max_uses
+        if worn_out or not self.is_healthy(session):
+            session = self.recycle(session)
+        with self.condition:
+            self.uses[session.pool_idx] += 1
+        return session
+
+    def release(self, session, failed=False):
+        if failed and not self.is_healthy(session):
+            session = self.recycle(session)
+
+        with self.condition:
+            if self.closed:
+                session.quit()
+            else:
+                self.idle.append(session)
+            self.condition.notify()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """Leases one session and makes it the current session of utils.tools inside the block."""
+
+        session = self.acquire(timeout)
+        failed = False
+        try:
+            with use_session(session):
+                yield session
+        except WebDriverException:
+            failed = True
+            raise
+        finally:
+            self.release(session, failed=failed)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            sessions, self.idle = self.idle, []
+            self.condition.notify_all()
+
+        for session in sessions:
+            try:
+                session.quit()
+            except WebDriverException:
+                pass
+        shutil.rmtree(self.profiles_dir, ignore_errors=True)
@@ -0,0 +1,86 @@
+import re, hashlib
+import numpy as np
+from typing import List
+from langchain.embeddings.base import Embeddings
+from langchain.embeddings.openai import OpenAIEmbeddings
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic offline embedder. Hashes word unigrams and bigrams into a fixed size vector."""
+
+    def __init__(self, n_features=1024, batch_size=256):
+        self.model = f"hashing-{n_features}"
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.token_pattern = re.compile(r"[a-z0-9_]+")
+        self.buckets = {}
+
+    def bucket(self, token):
+        if token not in self.buckets:
+            digest = int(hashlib.md5(token.encode("utf-8")).hexdigest()[:8], 16)
+            self.buckets[token] = (digest % self.n_features, 1.0 if digest & 1 << 31 else -1.0)
+        return self.buckets[token]
+
+    def features(self, text):
+        words = self.token_pattern.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def encode(self, texts):
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in self.features(text):
+                col, sign = self.bucket(token)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+
+        vectors = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        np.add.at(vectors, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), np.array(signs, dtype=np.float32))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [self.encode(texts[i:i+self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(batches).tolist() if batches else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class LocalEmbeddings(Embeddings):
+    """Local CPU embedder based on sentence-transformers."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64, device="cpu"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("Local embeddings need sentence-transformers. Please install it with `pip install sentence-transformers`.")
+
+        self.model = model_name
+        self.batch_size = batch_size
+        self.encoder = SentenceTransformer(model_name, device=device)
+
+    def encode(self, texts):
+        return self.encoder.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist() if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+EMBEDDING_TYPES = {
+    "openai": OpenAIEmbeddings,
+    "local": LocalEmbeddings,
+    "hashing": HashingEmbeddings,
+}
+
+
+def get_embeddings(embedding_type="openai", **kwargs):
+    """Returns the embedding provider given its type. Types are 'openai', 'local' and 'hashing'."""
+
+    if embedding_type not in EMBEDDING_TYPES:
+        raise ValueError(f"Unknown embedding type `{embedding_type}`, should be one of {list(EMBEDDING_TYPES)}.")
+    return EMBEDDING_TYPES[embedding_type](**kwargs)
@@ -0,0 +1,146 @@
+import re
+import fnmatch
+from html import escape
+from lxml import etree
+
+
+"""Single pass HTML cleaning shared by the KG building and the element finding code.
+The lxml parser calls a target for every tag and text instead of building a tree, so dropped elements are skipped as
+they are read, the page is fed in slices, and no node is serialized twice."""
+
+DROP_TAGS = frozenset(["script", "style", "noscript", "template", "meta", "link", "svg", "path", "circle"])
+DROP_ATTRIBUTES = ("style", "on*", "ping", "srcset", "js*")
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"])
+FEED_SIZE = 1 << 16
+SIMPLE_XPATH = re.compile(r"^(\*|[A-Za-z][\w-]*)$")
+SPACES = re.compile(r"\s+")
+
+
+class AttributeFilter(dict):
+    """Whether to drop an attribute name, matched once per name against glob patterns such as 'data-*'."""
+
+    def __init__(self, patterns):
+        super().__init__()
+        self.pattern = re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns) or r"(?!)")
+
+    def __missing__(self, name):
+        self[name] = drop = self.pattern.match(name) is not None
+        return drop
+
+
+def start_tag(tag, attrs):
+    return "<" + tag + "".join(f' {name}="{escape(value)}"' for name, value in attrs) + ">"
+
+
+class CleaningTarget:
+    """Parser target writing the cleaned HTML, and with records, the record of every kept element:
+    its start tag and own text without its children, e.g. <button aria-label="help">Help</button>."""
+
+    def __init__(self, drop_tags, drop_attributes, records=False, tags=None, require_attributes=False):
+        self.drop_tags = drop_tags
+        self.drop_attributes = drop_attributes
+        self.records = [] if records else None
+        self.tags = tags
+        self.require_attributes = require_attributes
+
+        self.pieces = []
+        self.skip = 0
+        self.stack = []
+
+    def start(self, tag, attrib):
+        if self.skip or tag in self.drop_tags:
+            self.skip += 1
+            return
+        attrs = [(name, value) for name, value in attrib.items() if not self.drop_attributes[name]]
+        self.pieces.append(start_tag(tag, attrs))
+        if self.records is not None:
+            keep = (self.tags is None or tag in self.tags) and (attrs or not self.require_attributes)
+            self.stack.append((tag, attrs, [], len(self.records) if keep else None))
+            if keep:
+                self.records.append(None)
+
+    def end(self, tag):
+        if self.skip:
+            self.skip -= 1
+            return
+        if tag not in VOID_TAGS:
+            self.pieces.append(f"</{tag}>")
+        if self.records is not None and self.stack:
+            tag, attrs, texts, position = self.stack.pop()
+            if position is not None:
+                text = SPACES.sub(" ", " ".join(texts)).strip()
+                self.records[position] = start_tag(tag, attrs) + escape(text, quote=False) + ("" if tag in VOID_TAGS else f"</{tag}>")
+
+    def data(self, text):
+        if self.skip:
+            return
+        self.pieces.append(escape(SPACES.sub(" ", text), quote=False))
+        if self.stack:
+            self.stack[-1][2].append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return "".join(self.pieces)
+
+
+class HTMLCleaner:
+    """Strips the drop_tags elements with their content and the attributes matching drop_attributes (glob patterns).
+    For example:
+        html = HTMLCleaner().clean(driver.page_source)
+        buttons = HTMLCleaner().elements(driver.page_source, xpath="button")
+    """
+
+    def __init__(self, drop_tags=DROP_TAGS, drop_attributes=DROP_ATTRIBUTES):
+        self.drop_tags = frozenset(drop_tags)
+        self.drop_attributes = AttributeFilter(drop_attributes)
+
+    def parse(self, html, target):
+        parser = etree.HTMLParser(target=target, remove_comments=True, remove_pis=True)
+        for i in range(0, len(html), FEED_SIZE):
+            parser.feed(html[i:i+FEED_SIZE])
+        return parser.close()
+
+    def clean(self, html):
+        """Returns the cleaned HTML, compact rather than pretty printed."""
+
+        if not html.strip():
+            return ""
+        return self.parse(html, CleaningTarget(self.drop_tags, self.drop_attributes))
+
+    def elements(self, html, xpath="*", require_attributes=False):
+        """Returns the records of the elements matching xpath, in document order. A tag name or '*' is matched while
+        streaming, other XPath expressions on a tree of the raw page, so positions and attribute tests see the dropped
+        elements and attributes too. The elements inside the drop_tags are left out."""
+
+        if not html.strip():
+            return []
+        if SIMPLE_XPATH.match(xpath):
+            target = CleaningTarget(self.drop_tags, self.drop_attributes, records=True,
+                                    tags=None if xpath == "*" else {xpath}, require_attributes=require_attributes)
+            self.parse(html, target)
+            return [record for record in target.records if record is not None]
+
+        records = []
+        for node in etree.HTML(html).xpath(f"//{xpath}"):
+            if not isinstance(node, etree._Element) or not isinstance(node.tag, str) or node.tag in self.drop_tags \
+                    or next(node.iterancestors(*self.drop_tags), None) is not None:
+                continue
+            attrs = [(name, value) for name, value in node.attrib.items() if not self.drop_attributes[name]]
+            if attrs or not require_attributes:
+                texts = [node.text or ""] + [child.tail or "" for child in node]
+                text = SPACES.sub(" ", " ".join(texts)).strip()
+                end_tag = "" if node.tag in VOID_TAGS else f"</{node.tag}>"
+                records.append(start_tag(node.tag, attrs) + escape(text, quote=False) + end_tag)
+        return records
+
+
+_cleaner = HTMLCleaner()
+
+def clean_html(html):
+    return _cleaner.clean(html)
+
+
+def element_records(html, xpath="*", require_attributes=False):
+    return _cleaner.elements(html, xpath=xpath, require_attributes=require_attributes)
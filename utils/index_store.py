@@ -0,0 +1,95 @@
+import os, hashlib, tempfile, threading
+import numpy as np
+from typing import List
+from langchain.embeddings.base import Embeddings
+
+from utils.tracing import tracer
+
+
+def text_digest(text):
+    """Returns the content hash used as the key of an embedded chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingIndexStore:
+    """Content-hash keyed embedding matrix persisted next to the source text file.
+    For example, the vectors of 'data/functions.txt' are stored in 'data/functions.index/'.
+    A save keeps only the chunks looked up by this process, so the chunks of old versions of the file are dropped."""
+
+    def __init__(self, filepath, model_name, chunk_size=10000):
+        self.index_dir = os.path.splitext(filepath)[0] + ".index"
+        tag = f"{model_name}_{chunk_size}".replace("/", "_")
+        self.index_path = os.path.join(self.index_dir, f"{tag}.npz")
+
+        self.keys = []
+        self.positions = {}
+        self.vectors = None
+        self.live = set()
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+
+        with np.load(self.index_path, allow_pickle=False) as index:
+            self.set(index["keys"].tolist(), index["vectors"])
+
+    def set(self, keys, vectors):
+        self.keys, self.vectors = keys, vectors
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def save(self, keys, vectors):
+        """Writes keys and vectors into one file, replaced in a single step, so processes saving at the same time
+        cannot leave the vectors of one save next to the keys of another."""
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=self.index_dir)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, keys=np.array(keys), vectors=vectors)
+        os.replace(tmp_path, self.index_path)
+        self.set(keys, vectors)
+
+    def lookup(self, texts, embed_fn):
+        """Returns the vectors of given texts, only embedding the chunks not stored yet."""
+
+        digests = [text_digest(text) for text in texts]
+        with self.lock:
+            self.live.update(digests)
+            missing = list(dict.fromkeys(d for d in digests if d not in self.positions))
+
+            if missing:
+                missing_texts = {d: text for d, text in zip(digests, texts)}
+                new_vectors = np.asarray(embed_fn([missing_texts[d] for d in missing]), dtype=np.float32)
+
+                keys = [key for key in self.keys if key in self.live]
+                if keys:
+                    vectors = np.vstack([np.asarray(self.vectors[[self.positions[key] for key in keys]]), new_vectors])
+                else:
+                    vectors = new_vectors
+                self.save(keys + missing, vectors)
+
+            return np.asarray(self.vectors[[self.positions[d] for d in digests]])
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper reading document vectors from an EmbeddingIndexStore."""
+
+    def __init__(self, embeddings, filepath, chunk_size=10000):
+        self.embeddings = embeddings
+        model_name = getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.store = EmbeddingIndexStore(filepath, model_name=model_name, chunk_size=chunk_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        with tracer.span("embedding.documents", "embedding", texts=len(texts)):
+            return self.store.lookup(texts, self.traced_embed_documents).tolist()
+
+    def traced_embed_documents(self, texts):
+        with tracer.span("embedding.model", "embedding", texts=len(texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with tracer.span("embedding.query", "embedding"):
+            return self.embeddings.embed_query(text)
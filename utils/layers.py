@@ -0,0 +1,141 @@
+import functools
+
+from utils.session import current_session
+from utils.timeline import current_timeline
+
+
+INVENTORY_SCRIPT = """
+var rows = document.getElementsByClassName('common-module_controlSectionRow_u6iL8');
+var tracks = document.getElementsByClassName('Track-module_container_mph21');
+var kinds = ['video', 'image', 'audio', 'text'];
+var extensions = {
+    video: ['mp4', 'mov', 'webm', 'm4v', 'avi', 'mkv'],
+    image: ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp', 'heic'],
+    audio: ['mp3', 'wav', 'm4a', 'aac', 'ogg', 'flac']
+};
+var layers = [];
+for (var i = 0; i < rows.length; i++) {
+    var row = rows[i];
+    var name = Array.from(row.childNodes).filter(function (node) {
+        return !(node.classList && node.classList.contains('Controls-module_layerControlRight_p7h1D'));
+    }).map(function (node) { return node.textContent; }).join('').trim();
+    var type = row.querySelector('video') ? 'video' : (row.querySelector('audio') ? 'audio' : null);
+    if (type === null) {
+        // Media layers are named after their file, so the extension tells the type.
+        var match = /\\.([a-z0-9]+)$/i.exec(name);
+        for (var kind in extensions) {
+            if (match && extensions[kind].indexOf(match[1].toLowerCase()) >= 0) { type = kind; }
+        }
+    }
+    if (type === null) {
+        // Whole words of the hints only, and no type when they name several kinds, so the caller probes the edit tab.
+        var hints = [];
+        [row].concat(Array.from(row.querySelectorAll('[data-testid], [alt], [title], [aria-label]'))).forEach(function (e) {
+            hints.push(e.getAttribute('data-testid'), e.getAttribute('alt'), e.getAttribute('title'), e.getAttribute('aria-label'));
+        });
+        var words = hints.filter(Boolean).join(' ').toLowerCase().split(/[^a-z]+/);
+        var found = kinds.filter(function (kind) { return words.indexOf(kind) >= 0; });
+        type = found.length === 1 ? found[0] : null;
+    }
+    var track = tracks[i];
+    layers.push({
+        index: i,
+        id: row.id || String(i),
+        name: name,
+        type: type,
+        left: track ? track.offsetLeft : null,
+        width: track ? track.offsetWidth : null,
+        element: row
+    });
+}
+return layers;
+"""
+
+PROBE_SCRIPT = """
+var rows = document.getElementsByClassName('common-module_controlSectionRow_u6iL8');
+var indexes = arguments[0], done = arguments[arguments.length - 1], titles = [];
+function later(step) { setTimeout(step, 50); }
+function probe(k) {
+    if (k >= indexes.length) { done(titles); return; }
+    rows[indexes[k]].click();
+    later(function () {
+        var tab = document.getElementsByClassName('Tabs-module_tab_HQZWB')[1];
+        if (tab) { tab.click(); }
+        later(function () {
+            var title = document.getElementsByClassName('common-module_controlSectionTitle_eK-7P')[0];
+            titles.push(title ? title.textContent.trim() : null);
+            probe(k + 1);
+        });
+    });
+}
+probe(0);
+"""
+
+TIME_BOXES_SCRIPT = """
+return Array.from(document.getElementsByClassName('ExactInputBox-module_containerTimeBox_4sHbQ')).map(function (e) { return e.textContent.trim(); });
+"""
+
+SECTION_TYPES = {"Video": "video", "Image": "image", "Audio": "audio", "Font": "text"}
+
+
+def get_layers(refresh=False):
+    """Returns all layers as a list of {index, id, name, type, start, end, element} in one script call.
+    The list is cached until a mutating tool function finishes. Type is None if it cannot be told from the DOM.
+    With refresh, the list is read again, and the types probed by layer_type are kept by layer id."""
+
+    session = current_session()
+    if refresh or "layers" not in session.cache:
+        probed = {layer["id"]: layer["type"] for layer in session.cache.get("layers", [])}
+        layers = session.driver.execute_script(INVENTORY_SCRIPT)
+        timeline = current_timeline()
+        for layer in layers:
+            if layer["type"] is None:
+                layer["type"] = probed.get(layer["id"])
+            left, width = layer.pop("left"), layer.pop("width")
+            try:
+                layer["start"] = timeline.time_at(left) if left is not None else None
+                layer["end"] = timeline.time_at(left + width) if left is not None else None
+            except ValueError:
+                layer["start"], layer["end"] = None, None
+        session.cache["layers"] = layers
+    return session.cache["layers"]
+
+
+def layer_type(layer):
+    """Returns the type of the layer. Media layers are told from the file extension of their name. The others, such as
+    text layers, are probed: their rows are clicked and the titles of their edit tabs read, for all the untyped layers
+    of the cached inventory at once, in one async script call taking about 0.1 second per row in the page.
+    The probed types are kept in the cached inventory."""
+
+    if layer["type"] is None:
+        cached = current_session().cache.get("layers") or []
+        untyped = [other for other in cached if other["type"] is None] if any(other is layer for other in cached) else [layer]
+        titles = current_session().driver.execute_async_script(PROBE_SCRIPT, [other["index"] for other in untyped])
+        for other, title in zip(untyped, titles):
+            if title is not None:
+                other["type"] = SECTION_TYPES.get(title, title.lower())
+    return layer["type"]
+
+
+def read_time_boxes():
+    """Returns the texts of the start and end time boxes of the selected layer in one script call."""
+    return current_session().driver.execute_script(TIME_BOXES_SCRIPT)
+
+
+def invalidate_layers():
+    session = current_session()
+    session.cache.pop("layers", None)
+    if "timeline" in session.cache:
+        session.cache["timeline"].invalidate()
+
+
+def mutating(func):
+    """Drops the cached layer inventory and timeline scale after the tool function runs."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate_layers()
+    return wrapper
@@ -0,0 +1,113 @@
+import os, threading
+from langchain.llms import OpenAI, OpenAIChat
+from langchain.chat_models import ChatOpenAI
+
+from utils.session import load_config
+from utils.tracing import tracer, configure_tracing, TracingCallbackHandler
+from utils.replay import recorder, configure_replay, RecordingCallbackHandler, ReplayLLM, ReplayChatModel, RecordingEmbeddings, ReplayEmbeddings
+
+
+"""Process wide registry sharing config, prompts, LLM clients, embeddings and vectorstores between agents."""
+
+_lock = threading.Lock()
+_resources = {}
+_building = {}
+
+
+def get_resource(key, factory):
+    """Returns the resource registered under key, building it with factory on first use.
+    Only the callers of the same key wait for a build, so a slow factory does not hold up the other resources."""
+
+    with _lock:
+        if key in _resources:
+            return _resources[key]
+        key_lock = _building.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _lock:
+            if key in _resources:
+                return _resources[key]
+        resource = factory()
+        with _lock:
+            _resources[key] = resource
+            _building.pop(key, None)
+        return resource
+
+
+def clear_registry():
+    with _lock:
+        _resources.clear()
+
+
+def get_config(filepath="config/config.yaml"):
+    def factory():
+        with tracer.span("config.load", filepath=filepath):
+            config = load_config(filepath)
+        configure_tracing(config)
+        configure_replay(config)
+        if config.get('OPENAI_API_KEY'):
+            os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        return config
+    return get_resource(("config", filepath), factory)
+
+
+def get_prompts(filepath="config/prompts.yaml"):
+    def factory():
+        with tracer.span("config.load", filepath=filepath):
+            return load_config(filepath)
+    return get_resource(("prompts", filepath), factory)
+
+
+LLM_TYPES = {
+    "chat": ChatOpenAI,
+    "openai_chat": OpenAIChat,
+    "completion": OpenAI,
+}
+
+
+def get_llm(model_name="gpt-4", temperature=0, llm_type="chat", streaming=False):
+    """Returns a shared LLM client. Types are 'chat' (ChatOpenAI), 'openai_chat' (OpenAIChat) and 'completion' (OpenAI).
+    A streaming client sends its tokens to the callbacks passed to each run.
+    With REPLAY_MODE 'record' its calls are recorded, with 'replay' they are served from the recording."""
+
+    get_config()
+
+    def factory():
+        callbacks = [TracingCallbackHandler(model_name)]
+        if recorder.replaying:
+            llm_class = ReplayChatModel if llm_type == "chat" else ReplayLLM
+            return llm_class(model_name=model_name, streaming=streaming, callbacks=callbacks)
+        if recorder.recording:
+            callbacks.append(RecordingCallbackHandler(model_name))
+        return LLM_TYPES[llm_type](model_name=model_name, temperature=temperature, streaming=streaming, callbacks=callbacks)
+
+    return get_resource(("llm", llm_type, model_name, temperature, streaming, recorder.mode), factory)
+
+
+def get_shared_embeddings(embedding_type):
+    from utils.embeddings import get_embeddings
+
+    get_config()
+
+    def factory():
+        if recorder.replaying:
+            return ReplayEmbeddings(embedding_type)
+        embeddings = get_embeddings(embedding_type)
+        return RecordingEmbeddings(embeddings, embedding_type) if recorder.recording else embeddings
+
+    return get_resource(("embeddings", embedding_type, recorder.mode), factory)
+
+
+def get_vectorstore(filepath, model_name="gpt-4", temperature=0, chunk_size=10000, embedding_type=None):
+    """Returns a shared KapwingVectorStore keyed by file, embedding type, chunk size and LLM.
+    Indexes built on it with get_faiss / set_gpt_index / set_func_index are shared too."""
+
+    from utils.vecs import KapwingVectorStore
+
+    embedding_type = embedding_type or get_config().get('EMBEDDING_TYPE', 'openai')
+    key = ("vectorstore", filepath, embedding_type, chunk_size, model_name, temperature)
+    return get_resource(key, lambda: KapwingVectorStore(chunk_size=chunk_size,
+                                                        model_name=model_name,
+                                                        temperature=temperature,
+                                                        filepath=filepath,
+                                                        embedding_type=embedding_type))
@@ -0,0 +1,346 @@
+import hashlib, json, os, random, re, threading, time
+from collections import defaultdict, deque, Counter
+from typing import List, Optional
+
+from selenium import webdriver
+from selenium.webdriver.remote.command import Command
+
+try:
+    from langchain.callbacks.base import BaseCallbackHandler
+    from langchain.chat_models.base import BaseChatModel
+    from langchain.embeddings.base import Embeddings
+    from langchain.llms.base import LLM
+    from langchain.schema import AIMessage, ChatGeneration, ChatResult, get_buffer_string
+except ImportError:
+    BaseCallbackHandler = BaseChatModel = Embeddings = LLM = object
+
+
+"""Record and replay of LLM, embedding and WebDriver calls. With REPLAY_MODE 'record' a live run appends every call
+and its result to REPLAY_FILE. With 'replay' the same calls are served from that file without network or browser,
+optionally after a latency drawn from REPLAY_LATENCY, so benchmarks run offline and deterministically."""
+
+KINDS = ["llm", "embedding", "webdriver"]
+TOKEN = re.compile(r"\s*\S+|\s+")
+
+
+class ReplayMiss(KeyError):
+    """Raised in strict replay when a call was not in the recording, e.g. a round trip added since it was made."""
+
+
+def request_key(kind, request):
+    return hashlib.sha256(json.dumps([kind, request], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Recorder:
+    """Keeps the recorded calls of each kind and request in order. A request made more often than recorded
+    gets its last response again, counted as repeated.
+    Latency per kind is None (no wait), 'recorded' (the recorded seconds), a number of seconds,
+    or [method, *args] of random.Random, e.g. ['lognormvariate', -2.5, 0.4]."""
+
+    def __init__(self):
+        self.mode = None
+        self.filepath = None
+        self.latency = {}
+        self.strict = True
+        self.random = random.Random(0)
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.entries = defaultdict(deque)
+        self.last = {}
+        self.sessions = deque()
+        self.models = {}
+        self.stats = defaultdict(Counter)
+
+    def configure(self, mode=None, filepath=None, latency=None, strict=True, seed=0):
+        if mode not in [None, "record", "replay"]:
+            raise ValueError(f"Unknown replay mode `{mode}`, should be one of None, 'record' or 'replay'.")
+
+        with self.lock:
+            self.mode = mode
+            self.filepath = filepath
+            self.latency = latency if isinstance(latency, dict) else {kind: latency for kind in KINDS}
+            self.strict = strict
+            self.random = random.Random(seed)
+            self.clear()
+
+        if mode == "replay":
+            self.load()
+        elif mode == "record" and filepath:
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def load(self):
+        if not self.filepath or not os.path.exists(self.filepath):
+            raise FileNotFoundError(f"No recording at {self.filepath}, run once with REPLAY_MODE 'record' first.")
+
+        with open(self.filepath, 'r') as f, self.lock:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["kind"] == "session":
+                    self.sessions.append(entry["response"])
+                    continue
+                if entry["kind"] == "embedding":
+                    self.models[entry["request"]["type"]] = entry["request"]["model"]
+                self.entries[request_key(entry["kind"], entry["request"])].append(entry)
+                self.stats[entry["kind"]]["recorded"] += 1
+
+    def record(self, kind, request, response, seconds):
+        entry = {"kind": kind, "request": request, "response": response, "seconds": seconds}
+        with self.lock:
+            self.stats[kind]["recorded"] += 1
+            if self.filepath:
+                with open(self.filepath, 'a') as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+    def serve_entry(self, kind, request):
+        """Returns the next recorded entry of the request, or None when it is missing and not strict."""
+
+        key = request_key(kind, request)
+        with self.lock:
+            if self.entries[key]:
+                entry = self.last[key] = self.entries[key].popleft()
+                self.stats[kind]["served"] += 1
+            elif key in self.last:
+                entry = self.last[key]
+                self.stats[kind]["repeated"] += 1
+            else:
+                self.stats[kind]["missed"] += 1
+                if self.strict:
+                    raise ReplayMiss(f"{kind} call not in recording {self.filepath}: {json.dumps(request, default=str)[:300]}")
+                return None
+        return entry
+
+    def serve(self, kind, request, default=None):
+        """Returns the next recorded response of the request after the injected latency."""
+
+        entry = self.serve_entry(kind, request)
+        if entry is None:
+            return default
+        self.wait(kind, entry["seconds"])
+        return entry["response"]
+
+    def delay(self, kind, seconds):
+        latency = self.latency.get(kind)
+        if latency is None:
+            return 0.0
+        if latency == "recorded":
+            return seconds
+        if isinstance(latency, (int, float)):
+            return float(latency)
+        method, *args = latency
+        with self.lock:
+            return max(0.0, getattr(self.random, method)(*args))
+
+    def wait(self, kind, seconds):
+        delay = self.delay(kind, seconds)
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_stats(self):
+        """Returns recorded, served, repeated, missed and unused calls per kind.
+        With a replay of an unchanged agent, served equals recorded and the other counts are 0."""
+
+        with self.lock:
+            stats = {kind: dict(self.stats[kind]) for kind in KINDS if self.stats[kind]}
+            for kind, counts in stats.items():
+                counts["unused"] = sum(len(entries) for entries in self.entries.values()
+                                       if entries and entries[0]["kind"] == kind)
+            return stats
+
+
+recorder = Recorder()
+
+
+def configure_replay(config):
+    """Sets up the recorder from config keys REPLAY_MODE, REPLAY_FILE, REPLAY_LATENCY, REPLAY_STRICT and REPLAY_SEED."""
+    recorder.configure(mode=config.get('REPLAY_MODE'),
+                       filepath=config.get('REPLAY_FILE', 'logs/recording.jsonl'),
+                       latency=config.get('REPLAY_LATENCY'),
+                       strict=config.get('REPLAY_STRICT', True),
+                       seed=config.get('REPLAY_SEED', 0))
+
+
+"""LLM"""
+
+class RecordingCallbackHandler(BaseCallbackHandler):
+    """Records the prompt and completion of every LLM call. A generation stopped early by a callback,
+    such as StreamingParserHandler, is recorded with the text it had then."""
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+        self.runs = {}
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.runs[kwargs.get("run_id") or threading.get_ident()] = (prompts, time.time())
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, [get_buffer_string(message_list) for message_list in messages], **kwargs)
+
+    def on_llm_end(self, response, **kwargs):
+        prompts, start_time = self.runs.pop(kwargs.get("run_id") or threading.get_ident(), ([], 0.0))
+        seconds = (time.time() - start_time) / max(len(prompts), 1)
+        for prompt, generations in zip(prompts, response.generations):
+            recorder.record("llm", {"model_name": self.model_name, "prompt": prompt}, generations[0].text, seconds)
+
+    def on_llm_error(self, error, **kwargs):
+        prompts, start_time = self.runs.pop(kwargs.get("run_id") or threading.get_ident(), ([], 0.0))
+        text = getattr(error, "text", None)
+        if text is not None and len(prompts) == 1:
+            recorder.record("llm", {"model_name": self.model_name, "prompt": prompts[0]}, text, time.time() - start_time)
+
+
+def replay_completion(model_name, prompt, streaming, run_manager):
+    """Serves a recorded completion. A streaming model sends it to the callbacks in word tokens,
+    with the injected latency spread over the tokens."""
+
+    request = {"model_name": model_name, "prompt": prompt}
+    if not streaming or run_manager is None:
+        return recorder.serve("llm", request, default="")
+
+    entry = recorder.serve_entry("llm", request)
+    if entry is None:
+        return ""
+    tokens = TOKEN.findall(entry["response"])
+    delay = recorder.delay("llm", entry["seconds"]) / max(len(tokens), 1)
+    for token in tokens:
+        if delay > 0:
+            time.sleep(delay)
+        run_manager.on_llm_new_token(token)
+    return entry["response"]
+
+
+class ReplayLLM(LLM):
+    """Completion LLM serving the recorded completions of model_name."""
+
+    model_name: str = "gpt-4"
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> str:
+        return replay_completion(self.model_name, prompt, self.streaming, run_manager)
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> str:
+        return replay_completion(self.model_name, prompt, False, None)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model serving the recorded completions of model_name."""
+
+    model_name: str = "gpt-4"
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = replay_completion(self.model_name, get_buffer_string(messages), self.streaming, run_manager)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop=stop)
+
+
+"""Embeddings"""
+
+class RecordingEmbeddings(Embeddings):
+    """Embeddings wrapper recording the vector of every text it embeds."""
+
+    def __init__(self, embeddings, embedding_type):
+        self.embeddings = embeddings
+        self.embedding_type = embedding_type
+        self.model = getattr(embeddings, "model", None) or type(embeddings).__name__
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start_time = time.time()
+        vectors = self.embeddings.embed_documents(texts)
+        seconds = (time.time() - start_time) / max(len(texts), 1)
+        for text, vector in zip(texts, vectors):
+            recorder.record("embedding", {"type": self.embedding_type, "model": self.model, "text": text}, list(vector), seconds)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        start_time = time.time()
+        vector = self.embeddings.embed_query(text)
+        recorder.record("embedding", {"type": self.embedding_type, "model": self.model, "text": text}, list(vector), time.time() - start_time)
+        return vector
+
+
+class ReplayEmbeddings(Embeddings):
+    """Embeddings serving recorded vectors by text, so documents can be embedded in other batches than recorded.
+    The model name is the recorded one, so the embedding index stores of the recording run are reused."""
+
+    def __init__(self, embedding_type):
+        self.embedding_type = embedding_type
+        self.model = recorder.models.get(embedding_type, embedding_type)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [recorder.serve("embedding", {"type": self.embedding_type, "model": self.model, "text": text}) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return recorder.serve("embedding", {"type": self.embedding_type, "model": self.model, "text": text})
+
+
+"""WebDriver"""
+
+def command_request(command, params):
+    # Session ids differ between runs and pooled browsers, element ids come from recorded responses.
+    return {"command": command, "params": {key: value for key, value in (params or {}).items() if key != "sessionId"}}
+
+
+def record_driver(driver):
+    """Records every command the driver sends to the browser with its raw response, errors included."""
+
+    recorder.record("session", None, {"sessionId": driver.session_id, "capabilities": driver.caps}, 0.0)
+    execute = driver.command_executor.execute
+
+    def recorded_execute(command, params=None):
+        start_time = time.time()
+        response = execute(command, params)
+        recorder.record("webdriver", command_request(command, params), response, time.time() - start_time)
+        return response
+
+    driver.command_executor.execute = recorded_execute
+    return driver
+
+
+class ReplayExecutor:
+    """Command executor of a remote driver answering from the recording instead of a browser."""
+
+    def execute(self, command, params=None):
+        if command == Command.NEW_SESSION:
+            with recorder.lock:
+                session = recorder.sessions[0] if recorder.sessions else {"sessionId": "replay", "capabilities": {}}
+                recorder.sessions.rotate(-1)
+            return {"value": session}
+        return recorder.serve("webdriver", command_request(command, params), default={"value": None})
+
+    def close(self):
+        pass
+
+
+def create_driver(options):
+    """Returns a Chrome driver, recorded with REPLAY_MODE 'record', or served from the recording with 'replay'."""
+
+    if recorder.replaying:
+        return webdriver.Remote(command_executor=ReplayExecutor(), options=options)
+
+    driver = webdriver.Chrome(options=options)
+    if recorder.recording:
+        record_driver(driver)
+    return driver
@@ -0,0 +1,160 @@
+import ast, builtins, textwrap, threading, time
+from collections import OrderedDict
+
+import utils.tools as tools
+from utils.registry import get_resource
+
+
+"""Names generated scripts can use. Calls by name must go to one of these, methods can be called on any value."""
+
+SCRIPT_GLOBALS = [
+    "driver", "actions", "By", "Keys", "ActionChains", "time", "name_to_hex", "WAIT_TIME",
+    "get_elements_by_class", "get_elements_by_text", "select_project_button", "get_correct_caption", "highlight_element",
+]
+SAFE_BUILTINS = [
+    "int", "float", "str", "bool", "len", "range", "min", "max", "abs", "round", "list", "dict", "tuple",
+    "enumerate", "zip", "sorted", "print", "Exception",
+]
+FORBIDDEN_NODES = (
+    ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+    ast.Global, ast.Nonlocal, ast.Delete, ast.With, ast.AsyncWith, ast.Await, ast.Yield, ast.YieldFrom,
+)
+
+
+class ScriptError(ValueError):
+    """Raised when a script can not be parsed or uses something outside of the whitelist."""
+
+
+class ScriptResult:
+    """Per statement results of a script run. Each call is {line, source, result, seconds, error}."""
+
+    def __init__(self, source, calls, error=None, cached=False):
+        self.source = source
+        self.calls = calls
+        self.error = error
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def seconds(self):
+        return sum(call["seconds"] for call in self.calls)
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"ScriptResult(ok={self.ok}, calls={len(self.calls)}, seconds={self.seconds:.3f}, error={self.error!r})"
+
+
+def normalize(source):
+    """Drops markdown code fences, common indentation and blank lines, the cache key of a script."""
+
+    lines = [line.rstrip() for line in source.split("\n") if not line.strip().startswith("```")]
+    return textwrap.dedent("\n".join(line for line in lines if line.strip()))
+
+
+class ScriptEngine:
+    """Runs generated selenium scripts. A script is parsed and checked once, and its statements are compiled
+    into code objects cached by normalized source, so a repeated script only runs."""
+
+    def __init__(self, namespace=None, allowed_names=None, max_size=512):
+        namespace = vars(tools) if namespace is None else namespace
+        self.allowed_names = set(allowed_names or tools.TOOL_FUNCTIONS + SCRIPT_GLOBALS)
+        self.globals = {name: namespace[name] for name in self.allowed_names if name in namespace}
+        self.globals["__builtins__"] = {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+        self.allowed_names |= set(SAFE_BUILTINS)
+
+        self.max_size = max_size
+        self.compiled = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+
+    def check(self, tree):
+        assigned = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+        for node in ast.walk(tree):
+            line = getattr(node, "lineno", 0)
+            if isinstance(node, FORBIDDEN_NODES):
+                raise ScriptError(f"Line {line}: {type(node).__name__} is not allowed in scripts.")
+            if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+                raise ScriptError(f"Line {line}: private attribute {node.attr} is not allowed in scripts.")
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id not in self.allowed_names:
+                raise ScriptError(f"Line {line}: {node.func.id} is not an allowed function.")
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in self.allowed_names | assigned:
+                raise ScriptError(f"Line {line}: name {node.id} is not defined.")
+
+    def compile(self, source):
+        """Returns the [(line, source, code, is_expression)] of the statements of the script, and whether it was cached."""
+
+        key = normalize(source)
+        with self.lock:
+            if key in self.compiled:
+                self.compiled.move_to_end(key)
+                self.hits += 1
+                return self.compiled[key], True
+
+        try:
+            tree = ast.parse(key)
+        except SyntaxError as e:
+            raise ScriptError(f"Line {e.lineno}: {e.msg}.")
+        self.check(tree)
+
+        statements = []
+        for stmt in tree.body:
+            segment = ast.get_source_segment(key, stmt)
+            if isinstance(stmt, ast.Expr):
+                code = compile(ast.Expression(body=stmt.value), "<script>", "eval")
+            else:
+                code = compile(ast.Module(body=[stmt], type_ignores=[]), "<script>", "exec")
+            statements.append((stmt.lineno, segment, code, isinstance(stmt, ast.Expr)))
+
+        with self.lock:
+            self.misses += 1
+            self.compiled[key] = statements
+            while len(self.compiled) > self.max_size:
+                self.compiled.popitem(last=False)
+        return statements, False
+
+    def run(self, source, dry_run=False):
+        """Runs the script statement by statement and stops at the first error.
+        With dry_run the statements are only printed. Returns a ScriptResult."""
+
+        try:
+            statements, cached = self.compile(source)
+        except ScriptError as e:
+            return ScriptResult(source, [], error=e)
+
+        scope = dict(self.globals)
+        calls = []
+        for line, segment, code, is_expression in statements:
+            call = {"line": line, "source": segment, "result": None, "seconds": 0.0, "error": None}
+            calls.append(call)
+            if dry_run:
+                print(segment)
+                continue
+
+            start_time = time.time()
+            try:
+                if is_expression:
+                    call["result"] = eval(code, scope)
+                else:
+                    exec(code, scope)
+            except Exception as e:
+                call["error"] = e
+            call["seconds"] = time.time() - start_time
+            if call["error"] is not None:
+                return ScriptResult(source, calls, error=call["error"], cached=cached)
+        return ScriptResult(source, calls, cached=cached)
+
+    def get_stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.compiled),
+                    "hit_ratio": self.hits / total if total else 0.0}
+
+
+def get_script_engine():
+    """Returns the script engine shared by the agents."""
+    return get_resource(("script_engine",), ScriptEngine)
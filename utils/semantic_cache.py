@@ -0,0 +1,113 @@
+import os, time, atexit, pickle, threading
+import numpy as np
+from collections import OrderedDict
+
+
+class SemanticCache:
+    """Query result cache keyed on prompt template and query embedding.
+    A cached result is returned when a query of the same template has cosine similarity over threshold.
+    New entries are written to filepath at most every save_interval seconds, and at exit."""
+
+    def __init__(self, embeddings, threshold=0.97, max_size=1024, ttl=7*24*3600, filepath=None, save_interval=60):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.filepath = filepath
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.saved_at = time.time()
+
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "exact_hits": 0, "misses": 0, "evictions": 0}
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        if self.filepath and os.path.exists(self.filepath):
+            with open(self.filepath, 'rb') as f:
+                self.entries = pickle.load(f)
+            self.evict()
+
+    def save(self):
+        """Writes a snapshot of the entries. The pickling runs outside of the lock, so lookups do not wait for it."""
+
+        if not self.filepath:
+            return
+        with self.save_lock:
+            with self.lock:
+                entries = OrderedDict(self.entries)
+                self.dirty = False
+                self.saved_at = time.time()
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            with open(self.filepath + ".tmp", 'wb') as f:
+                pickle.dump(entries, f)
+            os.replace(self.filepath + ".tmp", self.filepath)
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def evict(self):
+        now = time.time()
+        for key in [key for key, entry in self.entries.items() if now - entry["time"] > self.ttl]:
+            del self.entries[key]
+            self.stats["evictions"] += 1
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def lookup(self, template, query, semantic=True):
+        """Returns (result, query_vector). Result is None when missed.
+        Without semantic, only the same query hits and no embedding is computed, the vector is None then."""
+
+        with self.lock:
+            self.evict()
+            entry = self.entries.get((template, query))
+            if entry is not None:
+                self.entries.move_to_end((template, query))
+                self.stats["hits"] += 1
+                self.stats["exact_hits"] += 1
+                return entry["result"], entry["vector"]
+            if not semantic:
+                self.stats["misses"] += 1
+                return None, None
+
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vector = vector / max(np.linalg.norm(vector), 1e-12)
+
+        with self.lock:
+            keys = [key for key, entry in self.entries.items() if key[0] == template and entry["vector"] is not None]
+            if keys:
+                scores = np.stack([self.entries[key]["vector"] for key in keys]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.stats["hits"] += 1
+                    return self.entries[keys[best]]["result"], vector
+
+            self.stats["misses"] += 1
+            return None, vector
+
+    def insert(self, template, query, result, vector):
+        with self.lock:
+            self.entries[(template, query)] = {"result": result, "vector": vector, "time": time.time()}
+            self.entries.move_to_end((template, query))
+            self.evict()
+            self.dirty = True
+            due = time.time() - self.saved_at >= self.save_interval
+        if due:
+            self.save()
+
+    def get_stats(self):
+        with self.lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self.entries), hit_ratio=self.stats["hits"] / total if total else 0.0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.save()
@@ -0,0 +1,103 @@
+import yaml, contextvars
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.common.action_chains import ActionChains
+
+from utils.tracing import instrument_driver
+from utils.replay import create_driver
+
+
+def load_config(filepath="config/config.yaml"):
+    with open(filepath, 'r') as stream:
+        return yaml.safe_load(stream)
+
+
+class DriverSession:
+    """Chrome session that is only launched when the driver is first used."""
+
+    def __init__(self, user_data_dir=None, headless=None):
+        self.user_data_dir = user_data_dir
+        self.headless = headless
+        self._driver = None
+        self._actions = None
+        self.cache = {}
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self.start()
+        return self._driver
+
+    @property
+    def actions(self):
+        if self._actions is None:
+            self._actions = ActionChains(self.driver)
+        return self._actions
+
+    def start(self):
+        config = load_config()
+        user_data_dir = self.user_data_dir or config['USER_DATA_DIR']
+        headless = config.get('HEADLESS', False) if self.headless is None else self.headless
+
+        options = webdriver.ChromeOptions()
+        options.add_argument(f"user-data-dir={user_data_dir}")
+        if headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+
+        self._driver = instrument_driver(create_driver(options))
+        if not headless:
+            self._driver.maximize_window()
+
+    def quit(self):
+        """Quits the browser if launched and returns its last url."""
+
+        if self._driver is None:
+            return None
+
+        try:
+            current_url = self._driver.current_url
+        except Exception:
+            # A crashed or unreachable browser, the driver still has to quit.
+            current_url = None
+        try:
+            self._driver.quit()
+        finally:
+            self._driver = None
+            self._actions = None
+            self.cache.clear()
+        return current_url
+
+
+class SessionHandle:
+    """Forwards attribute access to the driver or actions of the current session."""
+
+    def __init__(self, attr):
+        self._attr = attr
+
+    def __getattr__(self, name):
+        return getattr(getattr(current_session(), self._attr), name)
+
+
+default_session = DriverSession()
+_current_session = contextvars.ContextVar("current_session", default=None)
+
+
+def current_session():
+    """Returns the session leased by the running thread or task, otherwise the default session."""
+    return _current_session.get() or default_session
+
+
+@contextmanager
+def use_session(session):
+    """Routes driver and actions of utils.tools to the given session inside the block."""
+
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
@@ -0,0 +1,211 @@
+import ast, re, time
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import AgentAction, AgentFinish
+
+from utils.tracing import traced
+
+
+"""Parsers fed with LLM tokens as they arrive. feed(token) returns the records completed by the token,
+close() finishes the text, and parse(text) runs both on a whole completion."""
+
+class StopGeneration(Exception):
+    """Raised by StreamingParserHandler to stop the LLM once its parser has all records. Keeps the text until then."""
+
+    def __init__(self, text=""):
+        super().__init__()
+        self.text = text
+
+
+class ActionParser:
+    """Parses a ReAct completion into one AgentAction or AgentFinish.
+    The action is complete once a new Observation or Thought starts after its Action Input."""
+
+    ACTION = re.compile(r"Action\s*\d*\s*:(.*?)\nAction\s*\d*\s*Input\s*\d*\s*:[\s]*(.*)", re.DOTALL)
+    INPUT_END = re.compile(r"\n(Observation|Thought)\s*\d*\s*:")
+
+    def __init__(self):
+        self.text = ""
+        self.record = None
+
+    @property
+    def done(self):
+        return self.record is not None
+
+    def feed(self, token):
+        if self.done:
+            return []
+        self.text += token
+        return self.check(final=False) if "\n" in token or ":" in token else []
+
+    def check(self, final):
+        if "Final Answer:" in self.text:
+            if final:
+                self.record = AgentFinish(return_values={"output": self.text.split("Final Answer:")[-1].strip()}, log=self.text)
+            return [self.record] if self.done else []
+
+        match = self.ACTION.search(self.text)
+        if not match:
+            return []
+        action_input = match.group(2)
+        end = self.INPUT_END.search(action_input)
+        if end is None and not final:
+            return []
+        if end is not None:
+            action_input = action_input[:end.start()]
+        self.record = AgentAction(tool=match.group(1).strip(), tool_input=action_input.strip(" ").strip('"'), log=self.text)
+        return [self.record]
+
+    def close(self):
+        if not self.done:
+            self.check(final=True)
+        if self.record is None:
+            raise ValueError(f"Could not parse LLM output: `{self.text}`")
+        return self.record
+
+    @traced("parse.action", "parse")
+    def parse(self, text):
+        self.feed(text)
+        return self.close()
+
+
+class CandidateListParser:
+    """Parses a list literal, such as ["a", "b"] or [{"USER_QUERY": "...", "MASK": [...]}], item by item without eval.
+    Text before the list is skipped, and with limit the parser is done after that many items."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.text = ""
+        self.items = []
+        self.pos, self.depth, self.start = 0, 0, None
+        self.quote, self.escape, self.closed = None, False, False
+
+    @property
+    def done(self):
+        return self.closed or (self.limit is not None and len(self.items) >= self.limit)
+
+    def add(self, end):
+        item = self.text[self.start:end].strip()
+        self.start = None
+        if not item:
+            return []
+        try:
+            value = ast.literal_eval(item)
+        except (SyntaxError, ValueError):
+            value = item.strip("'\"")
+        self.items.append(value)
+        return [value]
+
+    def feed(self, token):
+        if self.done:
+            return []
+        self.text += token
+
+        new = []
+        while self.pos < len(self.text) and not self.done:
+            c = self.text[self.pos]
+            if self.quote:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == self.quote:
+                    self.quote = None
+            elif self.depth == 0:
+                if c == "[":
+                    self.depth = 1
+            elif c in "'\"":
+                self.quote = c
+                self.start = self.pos if self.start is None else self.start
+            elif c in "[{(":
+                self.depth += 1
+                self.start = self.pos if self.start is None else self.start
+            elif c in "]})":
+                self.depth -= 1
+                if self.depth == 0:
+                    if self.start is not None:
+                        new += self.add(self.pos)
+                    self.closed = True
+            elif c == "," and self.depth == 1:
+                if self.start is not None:
+                    new += self.add(self.pos)
+            elif self.start is None and not c.isspace():
+                self.start = self.pos
+            self.pos += 1
+        return new
+
+    def close(self):
+        if not self.done and self.start is not None:
+            self.add(len(self.text))
+        return self.items[:self.limit] if self.limit is not None else self.items
+
+    @traced("parse.candidates", "parse")
+    def parse(self, text):
+        self.feed(text)
+        return self.close()
+
+
+class LineParser:
+    """Emits the non-empty lines of a completion as they complete, skipping lines starting with one of skip."""
+
+    def __init__(self, limit=None, skip=()):
+        self.limit = limit
+        self.skip = tuple(skip)
+        self.text = ""
+        self.pending = ""
+        self.items = []
+
+    @property
+    def done(self):
+        return self.limit is not None and len(self.items) >= self.limit
+
+    def add(self, line):
+        line = line.strip()
+        if not line or line.startswith(self.skip) or self.done:
+            return []
+        self.items.append(line)
+        return [line]
+
+    def feed(self, token):
+        if self.done:
+            return []
+        self.text += token
+        self.pending += token
+
+        new = []
+        while "\n" in self.pending and not self.done:
+            line, self.pending = self.pending.split("\n", 1)
+            new += self.add(line)
+        return new
+
+    def close(self):
+        self.add(self.pending)
+        self.pending = ""
+        return self.items
+
+    @traced("parse.lines", "parse")
+    def parse(self, text):
+        self.feed(text)
+        return self.close()
+
+
+class StreamingParserHandler(BaseCallbackHandler):
+    """Feeds the tokens of a streaming LLM into parser. With stop_early, raises StopGeneration once the parser is done,
+    so the caller can act on the records while the model would still be writing trailing text."""
+
+    raise_error = True
+
+    def __init__(self, parser, stop_early=True, on_record=None):
+        self.parser = parser
+        self.stop_early = stop_early
+        self.on_record = on_record
+        self.start_time = time.time()
+        self.first_record_time = None
+
+    def on_llm_new_token(self, token, **kwargs):
+        for record in self.parser.feed(token):
+            if self.first_record_time is None:
+                self.first_record_time = time.time() - self.start_time
+            if self.on_record is not None:
+                self.on_record(record)
+        if self.stop_early and self.parser.done:
+            raise StopGeneration(self.parser.text)
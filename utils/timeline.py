@@ -0,0 +1,71 @@
+from selenium.webdriver.common.by import By
+
+from utils.session import current_session
+from utils.waits import wait_until, text_present
+
+
+MEASURE_SCRIPT = """
+var ticks = document.getElementsByClassName('TimeLabels-module_tick_fvLlX');
+if (ticks.length < 2) { return null; }
+return {width: ticks[0].getBoundingClientRect().width, label: ticks[1].textContent.trim()};
+"""
+
+SEEK_SCRIPT = """
+var slider = document.getElementsByClassName('Seeker-module_seekerContainer_HkUsQ')[0];
+slider.style.transform = 'translateX(' + arguments[0] + 'px)';
+return slider;
+"""
+
+
+class Timeline:
+    """Kapwing timeline geometry. The seconds to pixels scale is measured once per zoom state.
+    Call invalidate() after anything that changes zoom or the length of the timeline."""
+
+    GAP_PIXELS = 15
+
+    def __init__(self, session):
+        self.session = session
+        self.is_fit = False
+        self.pixels_per_second = None
+
+    def invalidate(self):
+        self.is_fit = False
+        self.pixels_per_second = None
+
+    def fit(self):
+        """Clicks 'Fit' unless the timeline is known to be fit already."""
+
+        if not self.is_fit:
+            wait_until(text_present("Fit"), name="timeline")[0].click()
+            self.pixels_per_second = None
+            self.is_fit = True
+
+    def scale(self):
+        if self.pixels_per_second is None:
+            ticks = self.session.driver.execute_script(MEASURE_SCRIPT)
+            if ticks is None:
+                raise ValueError("Timeline labels are not found, is the project opened?")
+            self.pixels_per_second = ticks["width"] / int(ticks["label"][-1])
+        return self.pixels_per_second
+
+    def pixels_at(self, t):
+        return self.GAP_PIXELS + t * self.scale()
+
+    def time_at(self, px):
+        return (px - self.GAP_PIXELS) / self.scale()
+
+    def seek(self, t):
+        """Moves the seeker to t seconds and clicks it."""
+
+        slider = self.session.driver.execute_script(SEEK_SCRIPT, self.pixels_at(t))
+        slider.click()
+        return slider
+
+
+def current_timeline():
+    """Returns the timeline of the current driver session."""
+
+    session = current_session()
+    if "timeline" not in session.cache:
+        session.cache["timeline"] = Timeline(session)
+    return session.cache["timeline"]
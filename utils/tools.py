@@ -3,56 +3,50 @@ import requests
 import time
 import yaml
 import pyperclip
-from lxml import etree
 from webcolors import name_to_hex
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 
+from utils.session import DriverSession, SessionHandle, current_session, load_config
+from utils.timeline import current_timeline
+from utils.layers import get_layers, layer_type, read_time_boxes, mutating
+from utils.action_plan import ActionPlan
+from utils.html_cleaner import element_records
+from utils.tracing import traced
+from utils.waits import WAIT_TIMEOUTS, wait_until, element_clickable, elements_present, text_present, dom_quiet, network_idle, url_changed, any_of
 
-"""Chromedriver Initialization."""
 
-with open("config/config.yaml", 'r') as stream:
-    config = yaml.safe_load(stream)
-user_data_dir = config['USER_DATA_DIR']
+"""Chromedriver Initialization. Chrome is launched lazily on the first driver call."""
 
 WAIT_TIME = 2
-options = webdriver.ChromeOptions()
-options.add_argument(f"user-data-dir={user_data_dir}")
-driver = webdriver.Chrome(chrome_options=options)
-driver.maximize_window()
-actions = ActionChains(driver)
+driver = SessionHandle("driver")
+actions = SessionHandle("actions")
 
 
 """Utility Functions Definition."""
 
-def start_driver(main_url):
+def start_driver(main_url, user_data_dir=None):
+    session = current_session()
+    if user_data_dir and not session.started:
+        session.user_data_dir = user_data_dir
+
     driver.get(main_url)
     driver.implicitly_wait(2)
 
 
 def close_driver():
-    current_url = driver.current_url
-    driver.quit()
-    return current_url
+    return current_session().quit()
 
 
 def get_html_elements(xpath_="*"):
-    """Returns list of web elements given xpath. Overwrite based on browserpilot."""
+    """Returns the records of the elements matching xpath, each a start tag with its own text without the scripts,
+    styles and style attributes, e.g. <button class="btn">Save</button>. Overwrite based on browserpilot.
+    The xpath is evaluated on the page as loaded, as before."""
 
-    elements = []
     html = driver.find_element(By.TAG_NAME, "html")
-    html_string = html.get_attribute("outerHTML")
-
-    object = etree.HTML(html_string)
-    nodes = object.xpath(f"//{xpath_}")
-
-    for node in nodes:
-        element = etree.tostring(node).decode("utf-8")
-        elements.append(element)
-
-    return elements
+    return element_records(html.get_attribute("outerHTML"), xpath=xpath_)
 
 
 def highlight_element(element):
@@ -62,50 +56,34 @@ def highlight_element(element):
     driver.execute_script("arguments[0].style.border = 'none'", element)
 
 
-def get_elements_by_class(class_name):
-    for _ in range(3):
-        try:
-            class_elements = driver.find_elements(By.CLASS_NAME, class_name)
-            if not class_elements:
-                print(f'RETRY -> get_elements_by_class EMPTY {class_name}')
-                continue
-            return class_elements
-            break
-        except:
-            time.sleep(1)
-            print(f'RETRY -> get_elements_by_class {class_name}')
-            continue
+def get_elements_by_class(class_name, timeout=None):
+    """Waits up to timeout seconds for the elements, WAIT_TIMEOUTS by default. A timeout of 0 looks once,
+    where the elements are often absent."""
+
+    class_elements = wait_until(elements_present(By.CLASS_NAME, class_name), name="get_elements_by_class", timeout=timeout,
+                                raise_on_timeout=False)
+    if not class_elements:
+        print(f'TIMEOUT -> get_elements_by_class EMPTY {class_name}')
+        return []
     return class_elements
 
 
-def get_elements_by_text(text):
-    for _ in range(3):
-        try:
-            text_elements = driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
-            if not text_elements:
-                print(f'RETRY -> get_elements_by_text EMPTY {text}')
-                continue
-            return text_elements
-            break
-        except:
-            time.sleep(1)
-            print(f'RETRY -> get_elements_by_text {text}')
-            continue
+def get_elements_by_text(text, timeout=None):
+    """Waits up to timeout seconds for the elements containing text, like get_elements_by_class."""
+
+    text_elements = wait_until(text_present(text), name="get_elements_by_text", timeout=timeout, raise_on_timeout=False)
+    if not text_elements:
+        print(f'TIMEOUT -> get_elements_by_text EMPTY {text}')
+        return []
     return text_elements
 
 
 def select_project_button(project_name):
-    for _ in range(3):
-        try:
-            project_text = driver.find_elements(By.XPATH, f"//*[contains(text(), '{project_name}')]")[1]
-            project_button = project_text.find_elements(By.XPATH, "../../../../..")[0]
-            return project_button
-            break
-        except:
-            time.sleep(1)
-            print('RETRY -> select_project_button')
-            continue
-        print('FAILED after 3 retry -> select_project_button')
+    project_texts = wait_until(text_present(project_name, min_count=2), name="select_project_button", raise_on_timeout=False)
+    if not project_texts:
+        print('FAILED -> select_project_button')
+        return None
+    return project_texts[1].find_elements(By.XPATH, "../../../../..")[0]
 
 
 def get_correct_caption(caption_text):
@@ -146,7 +124,9 @@ def open_project(name):
 
     project_button = select_project_button(name)
     project_button.click()
-    time.sleep(15)
+    wait_until(element_clickable('.MediaSidebar-module_mediaSidebarIcon_cxxy2'), name="open_project")
+    # A project keeps loading media while previews play, so the editor is used once loads pause or the wait ends.
+    wait_until(network_idle(), name="open_project", raise_on_timeout=False)
 
 
 def upload_video(local_dir):
@@ -194,28 +174,19 @@ def change_caption_text(caption_text, timestamp):
 
     layers = get_elements_by_class("common-module_controlSectionRow_u6iL8")
 
-    fit_to_screen = get_elements_by_text("Fit")[0]
-    fit_to_screen.click()
-
-    gap_pixels = 15
-    multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-    factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-    pixels = gap_pixels + (timestamp) * (multiplier_pixels / factor)
-
-    slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-    driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-    slider.click()
+    timeline = current_timeline()
+    timeline.fit()
+    timeline.seek(timestamp)
 
     elements = get_elements_by_class("Transformer-module_transformer_AgKxF")
     for ele in elements:
         try:
             ele.click()
 
-            edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[1]
+            edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB", timeout=WAIT_TIMEOUTS["probe"])[1]
             edit_tab.click()
 
-            if get_elements_by_class("common-module_controlSectionTitle_eK-7P")[0].text == "Font":
+            if get_elements_by_class("common-module_controlSectionTitle_eK-7P", timeout=WAIT_TIMEOUTS["probe"])[0].text == "Font":
                 actions.move_to_element(ele).click().send_keys([Keys.BACK_SPACE]*100, caption_text).perform()
         except:
             pass
@@ -446,10 +417,8 @@ def show_layer_info():
     layers_button = get_elements_by_text("Layers")[0]
     layers_button.click()
 
-    layer_elements = get_elements_by_class("common-module_controlSectionRow_u6iL8")
-
-    for layer in layer_elements:
-        print(layer.text)
+    for layer in get_layers():
+        print(layer["name"])
 
 
 def delete_layer(layer_id):
@@ -464,21 +433,12 @@ def trim_video(start_timestamp, end_timestamp):
     """Trim the video clip given start timestamp and end timestamp.
     For example, to trim the video starting from 2 and ending at 6, should use: trim_video(2, 6)"""
 
-    time.sleep(WAIT_TIME)
-    layers_button = driver.find_elements(By.XPATH, "//*[contains(text(), 'Layers')]")[0]
+    timeline = current_timeline()
+    layers_button = get_elements_by_text("Layers")[0]
     layers_button.click()
 
-    video_layers = {}
-    idx = 0 
-    layers = get_elements_by_class("common-module_controlSectionRow_u6iL8")
-
-    for layer in layers:
-        layer.click()
-        edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[1]
-        edit_tab.click()
-        if get_elements_by_class("common-module_controlSectionTitle_eK-7P")[0].text == "Video":
-            video_layers[idx]  = layer
-            idx += 1  
+    layers = get_layers()
+    video_layers = dict(enumerate(layer["element"] for layer in layers if layer_type(layer) == "video"))
             
     l = len(video_layers) - 1 
     start_sec = int(str(start_timestamp).split(".")[0])
@@ -493,34 +453,31 @@ def trim_video(start_timestamp, end_timestamp):
         trim_button.click()
         
         
-        layer_start_sec = get_elements_by_class("ExactInputBox-module_input_ezpNr")[1].get_attribute("value")
-        layer_start_mili = get_elements_by_class("ExactInputBox-module_input_ezpNr")[2].get_attribute("value")
-        layer_start = float(f"{int(layer_start_sec)}.{int(layer_start_mili)}")
-        
-        
-        layer_end_sec = get_elements_by_class("ExactInputBox-module_input_ezpNr")[4].get_attribute("value")
-        layer_end_mili = get_elements_by_class("ExactInputBox-module_input_ezpNr")[5].get_attribute("value")
-        layer_end = float(f"{int(layer_end_sec)}.{int(layer_end_mili)}")
-        
+        time_boxes = read_time_boxes()
+        layer_start = float(f"{int(time_boxes[1])}.{int(time_boxes[2])}")
+        layer_end = float(f"{int(time_boxes[4])}.{int(time_boxes[5])}")
 
         if start_timestamp > layer_start:
-            get_elements_by_class("ExactInputBox-module_input_ezpNr")[1].send_keys(start_sec)
-            get_elements_by_class("ExactInputBox-module_input_ezpNr")[2].send_keys(start_mili_sec)
+            time_inputs = get_elements_by_class("ExactInputBox-module_input_ezpNr")
+            time_inputs[1].send_keys(start_sec)
+            time_inputs[2].send_keys(start_mili_sec)
         elif end_timestamp < layer_end: 
-            get_elements_by_class("ExactInputBox-module_input_ezpNr")[4].send_keys(end_sec)
-            get_elements_by_class("ExactInputBox-module_input_ezpNr")[5].send_keys(end_mili_sec)
+            time_inputs = get_elements_by_class("ExactInputBox-module_input_ezpNr")
+            time_inputs[4].send_keys(end_sec)
+            time_inputs[5].send_keys(end_mili_sec)
 
         trim_button = get_elements_by_text("Trim")[-1]
         trim_button.click()
+        timeline.invalidate()
         
     video_layers[len(video_layers) -1 ].click()
     time_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[4]
     time_tab.click()
 
-    time_buttons = get_elements_by_class("ExactInputBox-module_containerTimeBox_4sHbQ")
+    time_buttons = read_time_boxes()
             
-    end_time_sec = int(time_buttons[4].text)
-    end_time_mili = int(time_buttons[5].text)
+    end_time_sec = int(time_buttons[4])
+    end_time_mili = int(time_buttons[5])
 
     layer_end_time= float(f"{end_time_sec}.{end_time_mili}")
 
@@ -528,14 +485,14 @@ def trim_video(start_timestamp, end_timestamp):
         video_layers[l - i].click()
         time_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[4]
         time_tab.click()
-        time_buttons = get_elements_by_class("ExactInputBox-module_containerTimeBox_4sHbQ")
+        time_buttons = read_time_boxes()
         
-        start_time_sec = int(time_buttons[1].text)
-        start_time_mili = int(time_buttons[2].text)
+        start_time_sec = int(time_buttons[1])
+        start_time_mili = int(time_buttons[2])
 
         start_time = float(f"{start_time_sec}.{start_time_mili}")
-        end_time_sec = int(time_buttons[4].text)
-        end_time_mili = int(time_buttons[5].text)
+        end_time_sec = int(time_buttons[4])
+        end_time_mili = int(time_buttons[5])
 
         end_time= float(f"{end_time_sec}.{end_time_mili}")
         
@@ -544,147 +501,75 @@ def trim_video(start_timestamp, end_timestamp):
         layer_end_time = layer_start_time + layer_length
 
         
-        fit_to_screen = get_elements_by_text("Fit")[0]
-        fit_to_screen.click()
-
-        gap_pixels = 15
-        multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-        factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-        pixels = gap_pixels + (layer_start_time)*(multiplier_pixels/ factor)
-
-        slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-        driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-        slider.click()
+        timeline.fit()
+        timeline.seek(layer_start_time)
         
         start_set = get_elements_by_text("Set to")[0]
-        start_set.click()  
-
-        fit_to_screen = get_elements_by_text("Fit")[0]
-        fit_to_screen.click()
+        start_set.click()
+        timeline.invalidate()
 
-        gap_pixels = 15
-        multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-        factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-        pixels = gap_pixels + (layer_end_time)*(multiplier_pixels/ factor)
-
-        slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-        driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-        slider.click()
+        timeline.fit()
+        timeline.seek(layer_end_time)
         
         end_set = get_elements_by_text("Set to")[1]
         end_set.click()
+        timeline.invalidate()
         
-    remaining_layers = {}
-    idx = 0 
-    layers = get_elements_by_class("common-module_controlSectionRow_u6iL8")
-
-    for layer in layers:
-        layer.click()
-        edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[1]
-        edit_tab.click()
-        if get_elements_by_class("common-module_controlSectionTitle_eK-7P")[0].text != "Video":
-            remaining_layers[idx]  = layer
-            idx += 1  
+    # The trims moved the layers, so the inventory is read again, keeping the probed types.
+    layers = get_layers(refresh=True)
+    remaining_layers = dict(enumerate(layer["element"] for layer in layers if layer_type(layer) != "video"))
             
     for i in range(len(remaining_layers)):
         remaining_layers[i].click()
         time_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[4]
         time_tab.click()
-        time_buttons = get_elements_by_class("ExactInputBox-module_containerTimeBox_4sHbQ")
+        time_buttons = read_time_boxes()
         
-        start_time_sec = int(time_buttons[1].text)
-        start_time_mili = int(time_buttons[2].text)
+        start_time_sec = int(time_buttons[1])
+        start_time_mili = int(time_buttons[2])
 
         start_time = float(f"{start_time_sec}.{start_time_mili}")
-        end_time_sec = int(time_buttons[4].text)
-        end_time_mili = int(time_buttons[5].text)
+        end_time_sec = int(time_buttons[4])
+        end_time_mili = int(time_buttons[5])
 
         end_time= float(f"{end_time_sec}.{end_time_mili}")
 
         if start_time < start_timestamp:
-            fit_to_screen = get_elements_by_text("Fit")[0]
-            fit_to_screen.click()
-
-            gap_pixels = 15
-            multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-            factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-            pixels = gap_pixels + (end_time - start_timestamp)*(multiplier_pixels/ factor)
-
-            slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-            driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-            slider.click()
+            timeline.fit()
+            timeline.seek(end_time - start_timestamp)
             end_set = get_elements_by_text("Set to")[1]
             end_set.click()
+            timeline.invalidate()
             break
-            time.sleep(WAIT_TIME)
 
         elif end_time > end_timestamp:
-            fit_to_screen = get_elements_by_text("Fit")[0]
-            fit_to_screen.click()
-
-            gap_pixels = 15
-            multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-            factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-            pixels = gap_pixels + (start_time -start_timestamp)*(multiplier_pixels/ factor)
-
-            slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-            driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-            slider.click()
+            timeline.fit()
+            timeline.seek(start_time - start_timestamp)
 
             start_set = get_elements_by_text("Set to")[0]
-            start_set.click()  
-
-            fit_to_screen = get_elements_by_text("Fit")[0]
-            fit_to_screen.click()
+            start_set.click()
+            timeline.invalidate()
 
-            gap_pixels = 15
-            multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-            factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-            pixels = gap_pixels + (end_timestamp - start_timestamp)*(multiplier_pixels/ factor)
-
-            slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-            driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-            slider.click()
+            timeline.fit()
+            timeline.seek(end_timestamp - start_timestamp)
 
             end_set = get_elements_by_text("Set to")[1]
             end_set.click()
+            timeline.invalidate()
         else:
-            fit_to_screen = get_elements_by_text("Fit")[0]
-            fit_to_screen.click()
-
-            gap_pixels = 15
-            multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-            factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-            pixels = gap_pixels + (start_time -start_timestamp)*(multiplier_pixels/ factor)
-
-            slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-            driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-            slider.click()
+            timeline.fit()
+            timeline.seek(start_time - start_timestamp)
 
             start_set = get_elements_by_text("Set to")[0]
-            start_set.click()  
-
-            fit_to_screen = get_elements_by_text("Fit")[0]
-            fit_to_screen.click()
+            start_set.click()
+            timeline.invalidate()
 
-            gap_pixels = 15
-            multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-            factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-            pixels = gap_pixels + (end_time -start_timestamp)*(multiplier_pixels/ factor)
-
-            slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-            driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-            slider.click()
+            timeline.fit()
+            timeline.seek(end_time - start_timestamp)
 
             end_set = get_elements_by_text("Set to")[1]
             end_set.click()
+            timeline.invalidate()
 
 
 def add_audio(audio_path, timestamp):
@@ -729,22 +614,12 @@ def add_image(image_location, start_timestamp, end_timestamp):
     """Add an image banner at given start and end timestamp with audio path.
     For example, to add an image file '/User/Downloads/pic.jpg' at 7 second, should use: add_image('/User/Downloads/pic.jpg', 7)"""
     
-    time.sleep(WAIT_TIME)
     layers_button = get_elements_by_text('Layers')[0]
     layers_button.click()
 
-    fit_to_screen = get_elements_by_text("Fit")[0]
-    fit_to_screen.click()
-
-    gap_pixels = 15
-    multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-    factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-    pixels = gap_pixels + (start_timestamp)*(multiplier_pixels/ factor)
-
-    slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-    driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-    slider.click()
+    timeline = current_timeline()
+    timeline.fit()
+    timeline.seek(start_timestamp)
 
     media_tab = get_elements_by_text("Media")[0]
     media_tab.click()
@@ -771,21 +646,14 @@ def add_image(image_location, start_timestamp, end_timestamp):
     actions.move_by_offset(0, 0).perform()
     actions.release().perform()
 
-    gap_pixels = 15
-    multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-    factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-    pixels = gap_pixels + (end_timestamp)*(multiplier_pixels/ factor)
-
-    slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-    driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-    slider.click()
+    timeline.invalidate()
+    timeline.seek(end_timestamp)
 
     time_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[4]
     time_tab.click()
-    time.sleep(WAIT_TIME)
-    end_set = get_elements_by_text("Set to")[1]
+    end_set = wait_until(text_present("Set to", min_count=2), name="add_image")[1]
     end_set.click()
+    timeline.invalidate()
 
 
 def zoom_image(zoom_percentage):
@@ -793,7 +661,6 @@ def zoom_image(zoom_percentage):
     For example, to zoom the image to 120% of its original size, should use: zoom_image(120)
     """
 
-    time.sleep(WAIT_TIME)
     layers_button = get_elements_by_text('Layers')[0]
     layers_button.click()
 
@@ -828,24 +695,14 @@ def add_transition(timestamp, transition, speed):
     If speed is not mentioned, should set speed = 'default'.
     For example, to add a 'drop' transition with fast speed at 10 sec, should use: add_transition(10, 'drop', 'fast')"""
 
-    time.sleep(WAIT_TIME)  
-    layers_button = driver.find_elements(By.XPATH, "//*[contains(text(), 'Layers')]")[0]
+    layers_button = get_elements_by_text("Layers")[0]
     layers_button.click()
 
     video_layer = layers = get_elements_by_class("common-module_controlSectionRow_u6iL8")[-1]
     video_layer.click() 
-    fit_to_screen = get_elements_by_text("Fit")[0]
-    fit_to_screen.click()
-
-    gap_pixels = 15
-    multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-    factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-    pixels = gap_pixels + (timestamp)*(multiplier_pixels/ factor)
-
-    slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-    driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-    slider.click()
+    timeline = current_timeline()
+    timeline.fit()
+    timeline.seek(timestamp)
 
     layer_objects = get_elements_by_class("Track-module_container_mph21")
     layer_objects[0].click()
@@ -908,16 +765,18 @@ def export_video(video_end_time):
     end_keys = end_time - video_end_time
     if end_keys> 0 :
         end_seconds_box.click()
-        time.sleep(WAIT_TIME)
+        wait_until(dom_quiet(), name="export_video", raise_on_timeout=False)
         actions.send_keys([Keys.ARROW_DOWN]*end_keys).perform()
         
     export_button = get_elements_by_text("Export")[0]
     export_button.click()
 
+    editor_url = driver.current_url
     export_as_mp4 = get_elements_by_text("Export")[2]
     export_as_mp4.click()
 
-    time.sleep(WAIT_TIME)
+    # The export progress keeps changing the page, so the wait ends on the export page too, and never raises.
+    wait_until(any_of(dom_quiet(), url_changed(editor_url)), name="export_video", raise_on_timeout=False)
     export_url = driver.current_url
     print(export_url)
 
@@ -931,28 +790,19 @@ def caption_spelling_correction(timestamp):
 
     layers = get_elements_by_class("common-module_controlSectionRow_u6iL8")
 
-    fit_to_screen = get_elements_by_text("Fit")[0]
-    fit_to_screen.click()
-
-    gap_pixels = 15
-    multiplier_pixels = get_elements_by_class("TimeLabels-module_tick_fvLlX")[0].size['width']
-    factor = int(get_elements_by_class("TimeLabels-module_tick_fvLlX")[1].text[-1])
-
-    pixels = gap_pixels + (timestamp)*(multiplier_pixels/ factor)
-
-    slider = get_elements_by_class("Seeker-module_seekerContainer_HkUsQ")[0]
-    driver.execute_script(f"arguments[0].style.transform = 'translateX({pixels}px)';", slider)
-    slider.click()
+    timeline = current_timeline()
+    timeline.fit()
+    timeline.seek(timestamp)
 
     elements = get_elements_by_class("Transformer-module_transformer_AgKxF")
     for ele in elements:
         try:
             ele.click()
 
-            edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB")[1]
+            edit_tab = get_elements_by_class("Tabs-module_tab_HQZWB", timeout=WAIT_TIMEOUTS["probe"])[1]
             edit_tab.click()
 
-            if get_elements_by_class("common-module_controlSectionTitle_eK-7P")[0].text == "Font":
+            if get_elements_by_class("common-module_controlSectionTitle_eK-7P", timeout=WAIT_TIMEOUTS["probe"])[0].text == "Font":
                 actions.move_to_element(ele).click().key_down(Keys.COMMAND).send_keys("a", "c").perform()
                 caption_text = pyperclip.paste()
 
@@ -968,149 +818,193 @@ def caption_spelling_correction(timestamp):
     layers_button.click()
 
 
-"""New selenium functions designed with selenium ide."""
+"""New selenium functions designed with selenium ide. Steps run as action plans to save round trips."""
+
+SIDEBAR_TAB = '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child({}) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ'
+SELECTED_LAYER = '.Transformer-module_selectedLayer_wuDY5'
+TEXT_EDITOR = '.DraftEditor-editorContainer > .notranslate'
+COLOR_BUTTON = '.common-module_controlSectionContainer_7gwIs:nth-child(3) .common-module_smallControlButton_66vuT'
+COLOR_INPUT = '.ColorInput-module_colorInput_u7idt'
+COLOR_SELECT_BUTTON = '.LayerColorSelector-module_selectButton_xHU7A'
+TIMING_TAB = '.Tabs-module_tab_HQZWB:nth-child(4)'
+TIME_INPUT = '.ExactInputBox-module_container_8ySEv:nth-child({}) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr'
+TEXT_STYLE_BUTTON = '.Text-module_textStyleControlsContainer_kkXjZ > .common-module_smallControlButton_66vuT:nth-child({})'
+FONT_SIZE_INPUT = '.common-module_dropdownDirectInput_m4-FD'
+TEXT_STYLES = {'bold': '1', 'italic': '2', 'underline': '3'}
 
 def add_text(text: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(3) .MediaSidebar-module_mediaIcon_aF-LX').click()
-    driver.find_element(By.CSS_SELECTOR, ".AddTextButton-module_addTextButton_oXsr8").click()
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.DraftEditor-editorContainer > .notranslate').send_keys([Keys.BACK_SPACE]*15, text)
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click('.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(3) .MediaSidebar-module_mediaIcon_aF-LX') \
+                .click(".AddTextButton-module_addTextButton_oXsr8") \
+                .click(SELECTED_LAYER) \
+                .type(TEXT_EDITOR, [Keys.BACK_SPACE]*15, text) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def change_text_color(color: str):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_controlSectionContainer_7gwIs:nth-child(3) .common-module_smallControlButton_66vuT').click()
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').click()
     color_hex_code = name_to_hex(color)
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').send_keys([Keys.BACK_SPACE]*6)
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').send_keys(color_hex_code)
-    time.sleep(1)
-    driver.find_element(By.CSS_SELECTOR, '.LayerColorSelector-module_selectButton_xHU7A').click()
+    ActionPlan().click(SELECTED_LAYER) \
+                .click(COLOR_BUTTON) \
+                .click(COLOR_INPUT) \
+                .type(COLOR_INPUT, [Keys.BACK_SPACE]*6) \
+                .type(COLOR_INPUT, color_hex_code) \
+                .wait_value(COLOR_INPUT, color_hex_code) \
+                .click(COLOR_SELECT_BUTTON) \
+                .run()
 
 def change_specific_text_color(text: str, color: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_controlSectionContainer_7gwIs:nth-child(3) .common-module_smallControlButton_66vuT').click()
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').click()
     color_hex_code = name_to_hex(color)
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').send_keys([Keys.BACK_SPACE]*6)
-    driver.find_element(By.CSS_SELECTOR, '.ColorInput-module_colorInput_u7idt').send_keys(color_hex_code)
-    time.sleep(1)
-    driver.find_element(By.CSS_SELECTOR, '.LayerColorSelector-module_selectButton_xHU7A').click()
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text) \
+                .click(COLOR_BUTTON) \
+                .click(COLOR_INPUT) \
+                .type(COLOR_INPUT, [Keys.BACK_SPACE]*6) \
+                .type(COLOR_INPUT, color_hex_code) \
+                .wait_value(COLOR_INPUT, color_hex_code) \
+                .click(COLOR_SELECT_BUTTON) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def change_text_content(text: str):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    # driver.find_element(By.CSS_SELECTOR, '.DraftEditor-editorContainer > .notranslate').clear()
-    driver.find_element(By.CSS_SELECTOR, '.notranslate').clear()
-    driver.find_element(By.CSS_SELECTOR, '.notranslate').send_keys(text)
+    ActionPlan().click(SELECTED_LAYER) \
+                .clear('.notranslate') \
+                .type('.notranslate', text) \
+                .run()
 
 def change_specific_text_content(text1: str, text2: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text1}")]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.DraftEditor-editorContainer > .notranslate').clear()
-    driver.find_element(By.CSS_SELECTOR, '.DraftEditor-editorContainer > .notranslate').send_keys(text2)
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text1) \
+                .click(SELECTED_LAYER) \
+                .clear(TEXT_EDITOR) \
+                .type(TEXT_EDITOR, text2) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def adjust_text_start_end_time(time1: int, time2: int):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.Tabs-module_tab_HQZWB:nth-child(4)').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(str(time1))
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(str(time2))
+    ActionPlan().click(SELECTED_LAYER) \
+                .click(TIMING_TAB) \
+                .click(TIME_INPUT.format(1)) \
+                .type(TIME_INPUT.format(1), str(time1)) \
+                .click(TIME_INPUT.format(2)) \
+                .type(TIME_INPUT.format(2), str(time2)) \
+                .run()
 
 def adjust_specific_text_start_end_time(text: str, time1: int, time2: int):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.Tabs-module_tab_HQZWB:nth-child(4)').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(str(time1))
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(str(time2))
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text) \
+                .click(TIMING_TAB) \
+                .click(TIME_INPUT.format(1)) \
+                .type(TIME_INPUT.format(1), str(time1)) \
+                .click(TIME_INPUT.format(2)) \
+                .type(TIME_INPUT.format(2), str(time2)) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def adjust_text_duration(time: int):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.Tabs-module_tab_HQZWB:nth-child(4)').click()
-    start_second = int(driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').text)
-    end_second = time + start_second
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(f'{end_second}')
+    values = ActionPlan().click(SELECTED_LAYER) \
+                         .click(TIMING_TAB) \
+                         .read(TIME_INPUT.format(1), "start_second") \
+                         .run()
+    end_second = time + int(values["start_second"])
+    ActionPlan().click(TIME_INPUT.format(2)) \
+                .type(TIME_INPUT.format(2), f'{end_second}') \
+                .run()
 
 def adjust_specific_text_duration(text: str, time: int):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.Tabs-module_tab_HQZWB:nth-child(4)').click()
-    start_second = int(driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(1) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').text)
-    end_second = time + start_second
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').click()
-    driver.find_element(By.CSS_SELECTOR, '.ExactInputBox-module_container_8ySEv:nth-child(2) .ExactInputBox-module_containerTimeBox_4sHbQ:nth-child(3) > .ExactInputBox-module_input_ezpNr').send_keys(f'{end_second}')
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    values = ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                         .click_text(text) \
+                         .click(TIMING_TAB) \
+                         .read(TIME_INPUT.format(1), "start_second") \
+                         .run()
+    end_second = time + int(values["start_second"])
+    ActionPlan().click(TIME_INPUT.format(2)) \
+                .type(TIME_INPUT.format(2), f'{end_second}') \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def add_text_style(style_name: str):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    dict = {'bold': '1', 'italic': '2', 'underline': '3'}
-    driver.find_element(By.CSS_SELECTOR, f'.Text-module_textStyleControlsContainer_kkXjZ > .common-module_smallControlButton_66vuT:nth-child({dict[style_name]})').click()
+    ActionPlan().click(SELECTED_LAYER) \
+                .click(TEXT_STYLE_BUTTON.format(TEXT_STYLES[style_name])) \
+                .run()
 
 def remove_text_style(style_name: str):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    dict = {'bold': '1', 'italic': '2', 'underline': '3'}
-    driver.find_element(By.CSS_SELECTOR, f'.Text-module_textStyleControlsContainer_kkXjZ > .common-module_smallControlButton_66vuT:nth-child({dict[style_name]})').click()
+    ActionPlan().click(SELECTED_LAYER) \
+                .click(TEXT_STYLE_BUTTON.format(TEXT_STYLES[style_name])) \
+                .run()
 
 def add_specific_text_style(style_name: str, text: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    dict = {'bold': '1', 'italic': '2', 'underline': '3'}
-    driver.find_element(By.CSS_SELECTOR, f'.Text-module_textStyleControlsContainer_kkXjZ > .common-module_smallControlButton_66vuT:nth-child({dict[style_name]})').click()
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text) \
+                .click(TEXT_STYLE_BUTTON.format(TEXT_STYLES[style_name])) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def remove_specific_text_style(style_name: str, text: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    dict = {'bold': '1', 'italic': '2', 'underline': '3'}
-    driver.find_element(By.CSS_SELECTOR, f'.Text-module_textStyleControlsContainer_kkXjZ > .common-module_smallControlButton_66vuT:nth-child({dict[style_name]})').click()
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text) \
+                .click(TEXT_STYLE_BUTTON.format(TEXT_STYLES[style_name])) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def adjust_text_size(size: int):
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').send_keys(str(size))
+    ActionPlan().click(SELECTED_LAYER) \
+                .click(FONT_SIZE_INPUT) \
+                .type(FONT_SIZE_INPUT, str(size)) \
+                .run()
 
 def adjust_specific_text_size(text: str, size: int):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(2) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_elements(By.XPATH, f'//*[contains(text(), "{text}")]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').send_keys(str(size))
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(2)) \
+                .click_text(text) \
+                .click(FONT_SIZE_INPUT) \
+                .type(FONT_SIZE_INPUT, str(size)) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
 
 def increase_size():
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    font_size = int(driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').text)
-    new_font_size = font_size + 10
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').send_keys(f'{new_font_size}')
+    values = ActionPlan().click(SELECTED_LAYER).read(FONT_SIZE_INPUT, "font_size").run()
+    new_font_size = int(values["font_size"]) + 10
+    ActionPlan().click(FONT_SIZE_INPUT).type(FONT_SIZE_INPUT, f'{new_font_size}').run()
 
 def reduce_size():
-    driver.find_element(By.CSS_SELECTOR, '.Transformer-module_selectedLayer_wuDY5').click()
-    font_size = int(driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').text)
-    new_font_size = font_size - 10
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').click()
-    driver.find_element(By.CSS_SELECTOR, '.common-module_dropdownDirectInput_m4-FD').send_keys(f'{new_font_size}')
+    values = ActionPlan().click(SELECTED_LAYER).read(FONT_SIZE_INPUT, "font_size").run()
+    new_font_size = int(values["font_size"]) - 10
+    ActionPlan().click(FONT_SIZE_INPUT).type(FONT_SIZE_INPUT, f'{new_font_size}').run()
 
 def add_sound_effect(keywords: str):
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(8) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
-    driver.find_element(By.CSS_SELECTOR, '.Search-module_tab_057MX:nth-child(2)').click()
-    driver.find_element(By.CSS_SELECTOR, '.UploadSearchbar-module_darkThemeSearchBar_RBfE0').click()
-    driver.find_element(By.CSS_SELECTOR, '.UploadSearchbar-module_darkThemeSearchBar_RBfE0').send_keys(keywords)
-    driver.find_element(By.CSS_SELECTOR, '.UploadSearchbar-module_goButton_9BUyo').click()
-    time.sleep(5)
-    driver.find_elements(By.XPATH, '//div[@id=\'mediaSidebarControls\']/div/div/div[2]/div[2]/div[6]')[0].click()
-    driver.find_element(By.CSS_SELECTOR, '.MediaSidebar-module_mediaSidebarIcon_cxxy2:nth-child(1) > .MediaSidebar-module_mediaSidebarIconSubheader_9EpxJ').click()
+    ActionPlan().click(SIDEBAR_TAB.format(8)) \
+                .click('.Search-module_tab_057MX:nth-child(2)') \
+                .click('.UploadSearchbar-module_darkThemeSearchBar_RBfE0') \
+                .type('.UploadSearchbar-module_darkThemeSearchBar_RBfE0', keywords) \
+                .click('.UploadSearchbar-module_goButton_9BUyo') \
+                .click_xpath('//div[@id=\'mediaSidebarControls\']/div/div/div[2]/div[2]/div[6]', timeout=WAIT_TIMEOUTS["add_sound_effect"]) \
+                .click(SIDEBAR_TAB.format(1)) \
+                .run()
+
+
+"""Tool functions registry. Every tool but the read only ones may change the layers or the timeline."""
+
+TOOL_FUNCTIONS = [
+    "create_new_project", "open_project", "upload_video", "add_caption", "change_caption_text",
+    "change_caption_time", "change_caption_style", "change_caption_color", "change_caption_font_size",
+    "change_caption_font_type", "change_caption_outline_color", "change_caption_background_color",
+    "change_caption_opacity", "change_caption_position", "delete_row", "add_row_above", "detach_audio",
+    "show_layer_info", "delete_layer", "trim_video", "add_audio", "change_volume", "add_image", "zoom_image",
+    "add_transition", "export_video", "caption_spelling_correction", "add_text", "change_text_color",
+    "change_specific_text_color", "change_text_content", "change_specific_text_content",
+    "adjust_text_start_end_time", "adjust_specific_text_start_end_time", "adjust_text_duration",
+    "adjust_specific_text_duration", "add_text_style", "remove_text_style", "add_specific_text_style",
+    "remove_specific_text_style", "adjust_text_size", "adjust_specific_text_size", "increase_size",
+    "reduce_size", "add_sound_effect"
+]
+READ_ONLY_TOOLS = ["show_layer_info"]
+
+for _name in TOOL_FUNCTIONS:
+    if _name not in READ_ONLY_TOOLS:
+        globals()[_name] = mutating(globals()[_name])
+    globals()[_name] = traced(f"tool.{_name}", "tool")(globals()[_name])
+
 
 def test():
-    start_driver(main_url=config['KAPWING_URL'])
+    start_driver(main_url=load_config()['KAPWING_URL'])
     driver.implicitly_wait(2)
     open_project('Caption Test Project')
     time.sleep(5)
@@ -0,0 +1,237 @@
+import atexit, bisect, contextvars, functools, itertools, json, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    from langchain.callbacks.base import BaseCallbackHandler
+except ImportError:
+    BaseCallbackHandler = object
+
+
+"""Tracing. Spans of config load, index build, embedding, vector search, LLM calls, parsing, tool functions
+and WebDriver commands are kept in memory, written to a JSONL file every second and at exit if TRACE_FILE is set,
+and summed up in one histogram per span name."""
+
+_span_stack = contextvars.ContextVar("span_stack", default=())
+_span_ids = itertools.count(1)
+
+
+class Histogram:
+    """Bucketed seconds of one span name. Percentiles are estimated as the upper bound of their bucket."""
+
+    BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, float("inf")]
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        rank, seen = p / 100 * self.count, 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and seen > 0:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "total": self.total, "mean": self.total / self.count if self.count else 0.0,
+                "max": self.max, "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99)}
+
+
+class Tracer:
+    """Records spans. Use tracer.span(name) as a context manager, or the traced(name) decorator.
+    Each record has name, cat, start, duration, self time (duration minus child spans), thread, parent and attrs."""
+
+    FLUSH_INTERVAL = 1.0
+    FLUSH_RECORDS = 1000
+
+    def __init__(self, max_records=100000):
+        self.enabled = True
+        self.records = deque(maxlen=max_records)
+        self.histograms = {}
+        self.filepath = None
+        self.lock = threading.Lock()
+
+        self.file = None
+        self.file_lock = threading.Lock()
+        self.pending = []
+        self.flushed_at = time.time()
+
+    def configure(self, enabled=True, filepath=None):
+        self.enabled = enabled
+        if filepath != self.filepath:
+            self.flush()
+            with self.file_lock:
+                if self.file is not None:
+                    self.file.close()
+                self.file = None
+        self.filepath = filepath
+
+    def flush(self):
+        """Appends the pending records to the trace file, kept open between flushes."""
+
+        with self.file_lock:
+            with self.lock:
+                lines, self.pending = self.pending, []
+                self.flushed_at = time.time()
+            if not lines or not self.filepath:
+                return
+            if self.file is None:
+                self.file = open(self.filepath, 'a')
+            self.file.write("".join(lines))
+            self.file.flush()
+
+    def start_span(self, name, cat="app", **attrs):
+        stack = _span_stack.get()
+        span = {"id": next(_span_ids), "name": name, "cat": cat, "attrs": attrs, "children": 0.0,
+                "parent": stack[-1]["id"] if stack else None, "start": time.time(), "perf": time.perf_counter()}
+        span["token"] = _span_stack.set(stack + (span,))
+        return span
+
+    def end_span(self, span, error=None):
+        duration = time.perf_counter() - span["perf"]
+        try:
+            _span_stack.reset(span.pop("token"))
+        except ValueError:
+            # Ended in another context, such as a callback of another thread.
+            pass
+        stack = _span_stack.get()
+        if stack and stack[-1]["id"] == span["parent"]:
+            stack[-1]["children"] += duration
+        if error is not None:
+            span["attrs"]["error"] = repr(error)
+
+        record = {"id": span["id"], "name": span["name"], "cat": span["cat"], "start": span["start"],
+                  "duration": duration, "self": max(0.0, duration - span["children"]), "parent": span["parent"],
+                  "thread": threading.get_ident(), "attrs": span["attrs"]}
+        line = json.dumps(record, default=str) + "\n" if self.filepath else None
+        with self.lock:
+            self.records.append(record)
+            self.histograms.setdefault(span["name"], Histogram()).observe(duration)
+            if line is not None:
+                self.pending.append(line)
+            due = len(self.pending) >= self.FLUSH_RECORDS or (self.pending and time.time() - self.flushed_at >= self.FLUSH_INTERVAL)
+        if due:
+            self.flush()
+        return record
+
+    @contextmanager
+    def span(self, name, cat="app", **attrs):
+        if not self.enabled:
+            yield None
+            return
+
+        span = self.start_span(name, cat, **attrs)
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.end_span(span, error)
+
+    def get_histograms(self, prefix=""):
+        """Returns the histogram summary of every span name starting with prefix."""
+
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items()) if name.startswith(prefix)}
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.histograms.clear()
+
+    def export_jsonl(self, filepath):
+        with self.lock:
+            records = list(self.records)
+        with open(filepath, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def export_chrome_trace(self, filepath):
+        """Writes the spans in the Chrome trace event format, to be opened in chrome://tracing or Perfetto."""
+
+        with self.lock:
+            records = list(self.records)
+        events = [{"name": record["name"], "cat": record["cat"], "ph": "X", "ts": record["start"] * 1e6,
+                   "dur": record["duration"] * 1e6, "pid": os.getpid(), "tid": record["thread"], "args": record["attrs"]}
+                  for record in records]
+        with open(filepath, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+def configure_tracing(config):
+    """Sets up the tracer from config keys TRACING and TRACE_FILE."""
+    tracer.configure(enabled=config.get('TRACING', True), filepath=config.get('TRACE_FILE'))
+
+
+def traced(name=None, cat="app"):
+    """Decorator running the function in a span, named after the function by default."""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_driver(driver):
+    """Runs every WebDriver command of driver, also those of its elements, in a webdriver.<command> span."""
+
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        with tracer.span(f"webdriver.{driver_command}", "webdriver"):
+            return execute(driver_command, params)
+
+    driver.execute = traced_execute
+    return driver
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Runs each LLM call in an llm span with the model name and token counts."""
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+        self.spans = {}
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        if not tracer.enabled:
+            return
+        span = tracer.start_span("llm", "llm", model_name=self.model_name, prompts=len(prompts),
+                                 prompt_chars=sum(len(prompt) for prompt in prompts))
+        self.spans[kwargs.get("run_id") or threading.get_ident()] = span
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, [str(message) for message in messages], **kwargs)
+
+    def end(self, error=None, response=None, **kwargs):
+        span = self.spans.pop(kwargs.get("run_id") or threading.get_ident(), None)
+        if span is None:
+            return
+        usage = ((getattr(response, "llm_output", None) or {}).get("token_usage") or {}) if response is not None else {}
+        span["attrs"].update({key: usage[key] for key in ["prompt_tokens", "completion_tokens", "total_tokens"] if key in usage})
+        tracer.end_span(span, error)
+
+    def on_llm_end(self, response, **kwargs):
+        self.end(response=response, **kwargs)
+
+    def on_llm_error(self, error, **kwargs):
+        self.end(error=error, **kwargs)
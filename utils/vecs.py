@@ -6,44 +6,88 @@ from langchain.vectorstores import Qdrant, Chroma, Pinecone, FAISS
 from langchain.text_splitter import CharacterTextSplitter
 from langchain.document_loaders import TextLoader
 from langchain.chains import RetrievalQA
-from llama_index import GPTSimpleVectorIndex, SimpleDirectoryReader, Document
+from llama_index import GPTSimpleVectorIndex, SimpleDirectoryReader, Document, ServiceContext, LangchainEmbedding, LLMPredictor
 from llama_index.readers.qdrant import QdrantReader
 from llama_index.optimization.optimizer import SentenceEmbeddingOptimizer
 
-from gptcache import cache
-from gptcache.adapter import openai
-import pinecone, warnings, yaml, os
+import pinecone, warnings, yaml, os, re, threading
+import numpy as np
+
+from utils.index_store import CachedEmbeddings
+from utils.registry import get_config, get_prompts, get_llm, get_shared_embeddings, get_resource
+from utils.semantic_cache import SemanticCache
+from utils.async_runner import run_blocking
+from utils.stream_parser import StreamingParserHandler, StopGeneration
+from utils.tracing import tracer
 warnings.filterwarnings("ignore")
 
+# Templates whose answers hold no values of the query, such as the <NULL> slots of gpt_index_funcs.
+SEMANTIC_TEMPLATES = {"gpt_index_funcs"}
+
+
+def parse_function_blocks(text):
+    """Parses the FUNCTION_NAME blocks of a functions file, such as data/functions.txt."""
+
+    funcs = []
+    for block in text.split("FUNCTION_NAME:")[1:]:
+        block = block.strip()
+        signature = block.split("\n")[0].strip()
+        match = re.match(r"(\w+)\((.*)\)", signature)
+        if not match:
+            continue
+
+        args = []
+        for arg in filter(bool, [a.strip() for a in match.group(2).split(",")]):
+            arg_name, _, arg_type = arg.partition(":")
+            args.append((arg_name.strip(), arg_type.strip() or "str"))
+
+        slots = [f'{name}="<NULL>"' if arg_type == "str" else f"{name}=<NULL>" for name, arg_type in args]
+        funcs.append({"function": match.group(1),
+                      "signature": signature,
+                      "args": args,
+                      "call": f"{match.group(1)}({', '.join(slots)})",
+                      "text": "FUNCTION_NAME: \n" + block})
+    return funcs
+
 
 class KapwingVectorStore:
     def __init__(self, chunk_size=10000,
                        model_name="gpt-4",
                        temperature=0,
-                       filepath='data/query_instructions.txt'):
-
-        cache.init()
-        cache.set_openai_key()
-        
-        with open("config/config.yaml", 'r') as stream:
-            config = yaml.safe_load(stream)
+                       filepath='data/query_instructions.txt',
+                       embedding_type=None):
 
-        os.environ["OPENAI_API_KEY"] = config['OPENAI_API_KEY']
+        config = get_config()
         self.qdrant_host = config['QDRANT_HOST']
         self.qdrant_api_key = config['QDRANT_API_KEY']
         self.pcone_api_key = config['PINECONE_API_KEY']
         self.pcone_env = config['PINECONE_HOST']
 
         self.text_splitter = CharacterTextSplitter(separator="\n\n\n", chunk_size=chunk_size, chunk_overlap=0)
+        self.filepath = filepath
         self.loader = TextLoader(filepath)
         self.docs = self.text_splitter.split_documents(self.loader.load())
 
-        self.embeddings = OpenAIEmbeddings()
-        self.llm_ = OpenAIChat(model_name=model_name, temperature=temperature)
+        self.embedding_type = embedding_type or config.get('EMBEDDING_TYPE', 'openai')
+        self.embeddings = get_resource(("cached_embeddings", filepath, self.embedding_type, chunk_size),
+                                       lambda: CachedEmbeddings(get_shared_embeddings(self.embedding_type), filepath=filepath, chunk_size=chunk_size))
+        self.llm_ = get_llm(model_name, temperature, llm_type="openai_chat")
+        self.stream_llm_ = get_llm(model_name, temperature, llm_type="openai_chat", streaming=True)
+        self.llm_name = f"{model_name}_{temperature}"
+        cache_filepath = os.path.join(self.embeddings.store.index_dir, "semantic_cache.pkl")
+        self.cache = get_resource(("semantic_cache", cache_filepath),
+                                  lambda: SemanticCache(self.embeddings,
+                                                        threshold=config.get('CACHE_SIMILARITY_THRESHOLD', 0.97),
+                                                        max_size=config.get('CACHE_MAX_SIZE', 1024),
+                                                        ttl=config.get('CACHE_TTL', 7*24*3600),
+                                                        save_interval=config.get('CACHE_SAVE_INTERVAL', 60),
+                                                        filepath=cache_filepath))
+        self.lock = threading.RLock()
+        self.faiss_tool_db, self.faiss_tool_vec = None, None
+        self.tool_index = None
+        self.funcs, self.func_vectors = None, None
         
-        with open("config/prompts.yaml", 'r') as stream:
-            prompts = yaml.safe_load(stream)
-
+        prompts = get_prompts()
         self.prefix = prompts['vectorstore_prefix']
         self.suffix = prompts['vectorstore_suffix']
         self.simple_scripts_prompt = prompts['simple_scripts_prompt']
@@ -56,8 +100,12 @@ class KapwingVectorStore:
         return self.qdrant_tool_db, self.qdrant_tool_vec
 
     def get_faiss(self):
-        self.faiss_tool_db = FAISS.from_documents(self.docs, self.embeddings).as_retriever()
-        self.faiss_tool_vec = RetrievalQA.from_llm(llm=self.llm_, retriever=self.faiss_tool_db)
+        with self.lock:
+            if self.faiss_tool_db is None:
+                with tracer.span("index.build", "index", kind="faiss", filepath=self.filepath):
+                    self.faiss_tool_db = FAISS.from_documents(self.docs, self.embeddings).as_retriever()
+                self.faiss_tool_vec = RetrievalQA.from_llm(llm=self.llm_, retriever=self.faiss_tool_db)
+                self.faiss_stream_vec = RetrievalQA.from_llm(llm=self.stream_llm_, retriever=self.faiss_tool_db)
         return self.faiss_tool_db, self.faiss_tool_vec
 
     def get_chroma(self):
@@ -72,45 +120,107 @@ class KapwingVectorStore:
         return self.pcone_tool_db, self.pcone_tool_vec
 
     def set_gpt_index(self):
-        self.gpt_docs = [Document(doc.page_content) for doc in self.docs]
-        self.tool_index = GPTSimpleVectorIndex.from_documents(self.gpt_docs)
+        with self.lock:
+            if self.tool_index is None:
+                with tracer.span("index.build", "index", kind="gpt-index", filepath=self.filepath):
+                    self.gpt_docs = [Document(doc.page_content) for doc in self.docs]
+                    # The default LLM of GPT-Index, taken from the registry so it is traced and recorded.
+                    llm_predictor = LLMPredictor(llm=get_llm("text-davinci-003", 0, llm_type="completion"))
+                    service_context = ServiceContext.from_defaults(llm_predictor=llm_predictor, embed_model=LangchainEmbedding(self.embeddings))
+                    self.tool_index = GPTSimpleVectorIndex.from_documents(self.gpt_docs, service_context=service_context)
+
+    def set_func_index(self):
+        with self.lock:
+            if self.func_vectors is None:
+                with tracer.span("index.build", "index", kind="functions", filepath=self.filepath):
+                    funcs = parse_function_blocks(self.loader.load()[0].page_content)
+                    func_vectors = np.asarray(self.embeddings.embed_documents([func["text"] for func in funcs]), dtype=np.float32)
+                    self.funcs = funcs
+                    self.func_vectors = func_vectors / np.maximum(np.linalg.norm(func_vectors, axis=1, keepdims=True), 1e-12)
+
+    def rank_funcs(self, query, k=3):
+        """Returns top k functions ranked by cosine similarity to the query, without calling LLM."""
+
+        with tracer.span("vector.search", "retrieval", k=k):
+            query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            scores = self.func_vectors @ (query_vector / max(np.linalg.norm(query_vector), 1e-12))
+            top_k = np.argsort(-scores)[:k]
+        return [dict(self.funcs[i], score=float(scores[i])) for i in top_k]
+
+    def cached_query(self, template, query, query_fn):
+        """Returns the cached answer of the query, otherwise runs query_fn and caches its answer.
+        Only the templates of SEMANTIC_TEMPLATES reuse the answer of a similar query, the others answer with the values
+        of the query, e.g. the text and color of a script, and need the same query."""
+
+        with tracer.span("vector.query", "retrieval", template=template) as span:
+            semantic = template in SEMANTIC_TEMPLATES
+            template = f"{template}_{self.llm_name}"
+            res, vector = self.cache.lookup(template, query, semantic=semantic)
+            if span is not None:
+                span["attrs"]["cache_hit"] = res is not None
+            if res is None:
+                res = str(query_fn())
+                self.cache.insert(template, query, res, vector)
+        return res
+
+    async def arun(self, query, query_type="faiss_query"):
+        """Async version of the query methods, e.g. await vectorstore.arun(query, "gpt_index_funcs").
+        Several queries, also on different vectorstores, can be awaited together with asyncio.gather."""
+
+        return await run_blocking(getattr(self, query_type), query)
+
+    async def arank_funcs(self, query, k=3):
+        return await run_blocking(self.rank_funcs, query, k)
 
     def gpt_index_query(self, query):
-        res = self.tool_index.query(self.prefix.format(query=query) + self.mask_prompt + self.suffix,
-                                    similarity_top_k=3
-                                    # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
-                                )
-        return res
+        return self.cached_query("gpt_index_query", query, 
+                                 lambda: self.tool_index.query(self.prefix.format(query=query) + self.mask_prompt + self.suffix,
+                                                               similarity_top_k=3
+                                                               # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
+                                                            ))
         
     def gpt_index_funcs(self, query):
-        res = self.tool_index.query(self.fast_func_prompt.format(query=query),
-                                    similarity_top_k=3
-                                    # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
-                                )
-        return res
+        return self.cached_query("gpt_index_funcs", query, 
+                                 lambda: self.tool_index.query(self.fast_func_prompt.format(query=query),
+                                                               similarity_top_k=3
+                                                               # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
+                                                            ))
 
     def gpt_index_scripts_query(self, query):
-        res = self.tool_index.query(self.simple_scripts_prompt.format(query=query) + self.mask_prompt, 
-                                    # similarity_top_k=3,
-                                    # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
-                                )
-        return res
+        return self.cached_query("gpt_index_scripts_query", query, 
+                                 lambda: self.tool_index.query(self.simple_scripts_prompt.format(query=query) + self.mask_prompt, 
+                                                               # similarity_top_k=3,
+                                                               # optimizer=SentenceEmbeddingOptimizer(percentile_cutoff=0.3)
+                                                            ))
 
     def qdrant_query(self, query):
-        res = self.qdrant_tool_vec.run(self.prefix.format(query=query) + self.suffix)
-        return res
+        return self.cached_query("qdrant_query", query, lambda: self.qdrant_tool_vec.run(self.prefix.format(query=query) + self.suffix))
 
     def pcone_query(self, query):
-        res = self.pcone_tool_vec.run(self.prefix.format(query=query) + self.suffix)
-        return res
-
-    def faiss_query(self, query):
-        res = self.faiss_tool_vec.run(self.prefix.format(query=query) + self.suffix)
-        return res
+        return self.cached_query("pcone_query", query, lambda: self.pcone_tool_vec.run(self.prefix.format(query=query) + self.suffix))
+
+    def stream_run(self, chain, chain_input, parser):
+        """Runs chain with a streaming LLM feeding parser, and stops it as soon as the parser is done.
+        Returns the text generated until then."""
+
+        try:
+            chain.run(chain_input, callbacks=[StreamingParserHandler(parser)])
+        except StopGeneration:
+            pass
+        return parser.text
+
+    def faiss_query(self, query, parser=None):
+        """With parser, e.g. CandidateListParser(limit=3), the answer is streamed and cut once the parser has all records."""
+
+        chain_input = self.prefix.format(query=query) + self.suffix
+        if parser is None:
+            return self.cached_query("faiss_query", query, lambda: self.faiss_tool_vec.run(chain_input))
+        # A streamed answer is cut by the parser, so it is only reused with a parser alike.
+        template = f"faiss_query_{type(parser).__name__}_{getattr(parser, 'limit', None)}"
+        return self.cached_query(template, query, lambda: self.stream_run(self.faiss_stream_vec, chain_input, parser))
     
     def faiss_scripts_query(self, query):
-        res = self.faiss_tool_vec.run(self.simple_scripts_prompt.format(query=query) + self.mask_prompt)
-        return res
+        return self.cached_query("faiss_scripts_query", query, lambda: self.faiss_tool_vec.run(self.simple_scripts_prompt.format(query=query) + self.mask_prompt))
 
 
 def main():
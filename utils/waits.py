@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from utils.session import current_session
+from utils.tracing import tracer
+
+
+"""Per tool timeouts in seconds, and how long each wait actually took."""
+
+WAIT_TIMEOUTS = {
+    "default": 10,
+    "open_project": 30,
+    "add_sound_effect": 15,
+    "export_video": 20,
+    "get_elements_by_class": 3,
+    "get_elements_by_text": 3,
+    "probe": 0.5,  # lookups of elements that are often absent, such as the panel of a layer in the caption loops
+    "select_project_button": 10,
+}
+POLL_INTERVAL = 0.1
+wait_records = deque(maxlen=10000)
+
+
+def wait_until(condition, name="default", timeout=None, poll=POLL_INTERVAL, raise_on_timeout=True):
+    """Polls condition(driver) until it returns a truthy value, and records the waiting time under name.
+    Returns the condition value, or None when timed out and raise_on_timeout is False."""
+
+    timeout = WAIT_TIMEOUTS.get(name, WAIT_TIMEOUTS["default"]) if timeout is None else timeout
+    start_time = time.time()
+    with tracer.span(f"wait.{name}", "wait", timeout=timeout) as span:
+        try:
+            res = WebDriverWait(current_session().driver, timeout, poll_frequency=poll).until(condition)
+            wait_records.append({"name": name, "seconds": time.time() - start_time, "done": True})
+            return res
+        except TimeoutException:
+            wait_records.append({"name": name, "seconds": time.time() - start_time, "done": False})
+            if span is not None:
+                span["attrs"]["timed_out"] = True
+            if raise_on_timeout:
+                raise
+            return None
+
+
+def get_wait_stats():
+    """Returns count, total, max seconds and timeouts of the recorded waits per name."""
+
+    stats = {}
+    for record in wait_records:
+        stat = stats.setdefault(record["name"], {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+        stat["count"] += 1
+        stat["total"] += record["seconds"]
+        stat["max"] = max(stat["max"], record["seconds"])
+        stat["timeouts"] += 0 if record["done"] else 1
+    return stats
+
+
+"""Expected conditions."""
+
+def element_present(css):
+    return EC.presence_of_element_located((By.CSS_SELECTOR, css))
+
+
+def element_clickable(css):
+    return EC.element_to_be_clickable((By.CSS_SELECTOR, css))
+
+
+def element_stale(element):
+    return EC.staleness_of(element)
+
+
+def elements_present(by, value, min_count=1):
+    def condition(driver):
+        elements = driver.find_elements(by, value)
+        return elements if len(elements) >= min_count else False
+    return condition
+
+
+def text_present(text, min_count=1):
+    return elements_present(By.XPATH, f"//*[contains(text(), '{text}')]", min_count=min_count)
+
+
+def url_changed(url):
+    return EC.url_changes(url)
+
+
+def any_of(*conditions):
+    return EC.any_of(*conditions)
+
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+NETWORK_OBSERVER_SCRIPT = """
+if (!window.__networkIdleObserver) {
+    window.__lastResourceLoad = performance.now();
+    window.__networkIdleObserver = new PerformanceObserver(() => { window.__lastResourceLoad = performance.now(); });
+    window.__networkIdleObserver.observe({type: 'resource'});
+}
+return performance.now() - window.__lastResourceLoad;
+"""
+
+def network_idle(idle_time=0.5):
+    """No new resource has been loaded by the page for idle_time seconds.
+    The loads are observed rather than counted, as the resource timing buffer stops at 250 entries."""
+
+    def condition(driver):
+        return driver.execute_script(NETWORK_OBSERVER_SCRIPT) >= idle_time * 1000
+    return condition
+
+
+DOM_OBSERVER_SCRIPT = """
+if (!window.__domQuietObserver) {
+    window.__lastDomMutation = performance.now();
+    window.__domQuietObserver = new MutationObserver(() => { window.__lastDomMutation = performance.now(); });
+    window.__domQuietObserver.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return performance.now() - window.__lastDomMutation;
+"""
+
+def dom_quiet(quiet_time=0.3):
+    """The DOM has not mutated for quiet_time seconds."""
+
+    def condition(driver):
+        return driver.execute_script(DOM_OBSERVER_SCRIPT) >= quiet_time * 1000
+    return condition